@@ -6,10 +6,11 @@ Handles communication with backend API for real data sources
 import requests
 import json
 import time
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Any
 from datetime import datetime
 import os
 from config import get_config
+from country_registry import CountryRegistry
 
 class APIService:
     """Service class for communicating with the backend API"""
@@ -20,6 +21,9 @@ class APIService:
         self.timeout = self.config['API_TIMEOUT']
         self.poll_interval = self.config['POLL_INTERVAL']
         self.use_mock = self.config['USE_MOCK_DATA']
+        self.long_poll_seconds = self.config['STATUS_LONG_POLL_SECONDS']
+        # Fetched once per process (not on every Streamlit rerun) and refreshed after a TTL
+        self.countries = CountryRegistry(self.fetch_countries)
         
     def fetch_countries(self) -> List[Dict[str, str]]:
         """
@@ -43,46 +47,60 @@ class APIService:
             # Fallback to mock data on error
             return self._get_mock_countries()
     
-    def generate_report(self, country: Dict[str, str], date_range: Dict[str, str]) -> Dict[str, Any]:
+    def generate_report(self, country: Dict[str, str], date_range: Dict[str, str],
+                        language: str = "en", session_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Start report generation process
         
         Args:
             country: Country dict with 'code' and 'name'
             date_range: Date range dict with 'start_date' and 'end_date'
+            language: UI language code of the requesting user
+            session_id: Identity the backend rate-limits by (X-Session-ID)
             
         Returns:
-            Dict containing report_id and initial status
+            Dict containing report_id and initial status (plus queue_position and
+            estimated_wait_seconds while queued), or 'error' (with 'retry_after'
+            when rate limited or the queue is full)
         """
-        # if self.use_mock:
-        #     return self._generate_mock_report(country, date_range)
+        if self.use_mock:
+            return self._generate_mock_report(country, date_range)
         
-        # try:
-        #     payload = {
-        #         "country": country,
-        #         "date_range": date_range,
-        #         "language": "en"  # Will be updated to use current language
-        #     }
+        try:
+            payload = {
+                "country": country,
+                "date_range": date_range,
+                "language": language
+            }
             
-        #     response = requests.post(
-        #         f"{self.base_url}/api/reports",
-        #         json=payload,
-        #         timeout=self.timeout
-        #     )
-        #     response.raise_for_status()
-        #     return response.json()
-        # except requests.exceptions.RequestException as e:
-        #     print(f"Error starting report generation: {e}")
-        #     # Fallback to mock data on error
-        #     return self._generate_mock_report(country, date_range)
-        return llama_service.generate_report(country['name'], date_range)
+            response = requests.post(
+                f"{self.base_url}/api/reports",
+                json=payload,
+                headers={"X-Session-ID": session_id} if session_id else None,
+                timeout=self.timeout
+            )
+            if response.status_code == 400:
+                return {"error": response.json().get("error", {}).get("message", "Invalid request")}
+            if response.status_code in (429, 503):
+                return {
+                    "error": response.json().get("error", {}).get("message", "Backend is busy"),
+                    "retry_after": int(response.headers.get("Retry-After") or 0)
+                }
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            print(f"Error starting report generation: {e}")
+            return {"error": f"Backend unavailable: {e}"}
     
-    def check_report_status(self, report_id: str) -> Dict[str, Any]:
+    def check_report_status(self, report_id: str, wait: float = 0,
+                            since: Optional[int] = None) -> Dict[str, Any]:
         """
         Check the status of a report generation
         
         Args:
             report_id: Unique identifier for the report
+            wait: Long-poll for up to this many seconds until the status changes
+            since: Status 'version' already seen; the server answers as soon as it is exceeded
             
         Returns:
             Dict containing status, progress, and current step
@@ -90,10 +108,14 @@ class APIService:
         if self.use_mock:
             return self._get_mock_status(report_id)
         
+        params = {}
+        if wait > 0:
+            params = {"wait": wait, "since": since if since is not None else -1}
         try:
             response = requests.get(
                 f"{self.base_url}/api/reports/{report_id}/status",
-                timeout=self.timeout
+                params=params,
+                timeout=self.timeout + wait
             )
             response.raise_for_status()
             return response.json()
@@ -125,13 +147,20 @@ class APIService:
             print(f"Error fetching report data: {e}")
             return None
     
-    def download_report(self, report_id: str, format: str) -> bool:
+    def download_report(self, report_id: str, format: str, destination: Optional[str] = None) -> bool:
         """
         Download report in specified format
         
+        The file is streamed in chunks to '<destination>.part' and renamed into place
+        once complete, so it is never held in memory and a partial file is never
+        visible under the final name. A dropped connection resumes from the bytes
+        already written using an HTTP Range request (up to DOWNLOAD_RETRIES attempts).
+        Files larger than MAX_REPORT_SIZE_MB are rejected.
+        
         Args:
             report_id: Unique identifier for the report
             format: 'pdf' or 'docx'
+            destination: Output path (default report_<report_id>.<format>)
             
         Returns:
             True if download successful, False otherwise
@@ -139,48 +168,142 @@ class APIService:
         if self.use_mock:
             return self._mock_download(format)
         
-        try:
-            response = requests.get(
-                f"{self.base_url}/api/reports/{report_id}/download",
-                params={"format": format},
-                timeout=self.timeout
-            )
+        filename = destination or f"report_{report_id}.{format}"
+        part_path = f"{filename}.part"
+        max_bytes = self.config['MAX_REPORT_SIZE_MB'] * 1024 * 1024
+        
+        for attempt in range(1, self.config['DOWNLOAD_RETRIES'] + 1):
+            try:
+                if self._download_to_part(report_id, format, part_path, max_bytes):
+                    os.replace(part_path, filename)
+                    print(f"Report downloaded as {filename}")
+                    return True
+            except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError,
+                    requests.exceptions.Timeout) as e:
+                print(f"Download of {report_id} interrupted (attempt {attempt}): {e}")
+                continue
+            except (requests.exceptions.RequestException, ValueError, OSError) as e:
+                print(f"Error downloading report: {e}")
+                break
+        
+        if os.path.exists(part_path) and os.path.getsize(part_path) > max_bytes:
+            os.remove(part_path)
+        return False
+    
+    def _download_to_part(self, report_id: str, format: str, part_path: str, max_bytes: int) -> bool:
+        """
+        Append the missing bytes of a report to part_path
+        
+        Returns:
+            True once part_path holds the complete file
+        
+        Raises:
+            ValueError: If the report exceeds max_bytes
+        """
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        with requests.get(
+            f"{self.base_url}/api/reports/{report_id}/download",
+            params={"format": format},
+            headers=headers,
+            stream=True,
+            timeout=self.timeout
+        ) as response:
+            if response.status_code == 416:
+                # Nothing left to fetch for this offset; start over
+                os.remove(part_path)
+                return False
             response.raise_for_status()
+            if response.status_code != 206:
+                # Server ignored the Range header and sent the whole file
+                offset = 0
             
-            # Save file locally
-            filename = f"report_{report_id}.{format}"
-            with open(filename, 'wb') as f:
-                f.write(response.content)
+            total = None
+            content_range = response.headers.get("Content-Range", "")
+            if "/" in content_range and not content_range.endswith("/*"):
+                total = int(content_range.rsplit("/", 1)[1])
+            elif response.headers.get("Content-Length"):
+                total = offset + int(response.headers["Content-Length"])
+            if total is not None and total > max_bytes:
+                raise ValueError(f"Report is {total / 1024 / 1024:.1f} MB, over the "
+                                 f"{self.config['MAX_REPORT_SIZE_MB']} MB limit")
             
-            print(f"Report downloaded as {filename}")
-            return True
-        except requests.exceptions.RequestException as e:
-            print(f"Error downloading report: {e}")
-            return False
+            written = offset
+            with open(part_path, "ab" if offset else "wb") as f:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    written += len(chunk)
+                    if written > max_bytes:
+                        raise ValueError(f"Report exceeds the {self.config['MAX_REPORT_SIZE_MB']} MB limit")
+                    f.write(chunk)
+        return total is None or written == total
     
-    def poll_report_completion(self, report_id: str, max_wait_time: int = 300) -> Dict[str, Any]:
+    def report_file(self, report_id: str, format: str, download: bool = True) -> Optional[str]:
         """
-        Poll for report completion with progress updates
+        Local path of a backend-rendered report, downloading it on first use
+        
+        Files are kept under REPORTS_DIRECTORY so repeated downloads (and Streamlit
+        reruns) read from disk instead of the network.
+        
+        Args:
+            report_id: Unique identifier for the report
+            format: 'pdf' or 'docx'
+            download: Fetch the file if it is not on disk yet (False only checks)
+            
+        Returns:
+            Path of the downloaded file, or None if it is not available
+        """
+        directory = self.config['REPORTS_DIRECTORY']
+        path = os.path.join(directory, f"{report_id}.{format}")
+        if os.path.exists(path):
+            return path
+        if not download:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        if self.download_report(report_id, format, destination=path):
+            return path
+        return None
+    
+    def poll_report_completion(self, report_id: str, max_wait_time: int = 300,
+                               on_status: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Wait for report completion with progress updates
+        
+        Status changes are pushed through long polling: each request is held by the
+        backend until the status version changes, so completion is seen immediately
+        and an idle wait costs one open request. Backends without long polling (no
+        'version' in the response) are polled with exponential backoff from 0.25 s
+        up to POLL_INTERVAL.
         
         Args:
             report_id: Unique identifier for the report
             max_wait_time: Maximum time to wait in seconds
+            on_status: Called with every status response (progress, current_step, message)
             
         Returns:
             Final report data when complete
         """
-        start_time = time.time()
+        deadline = time.time() + max_wait_time
+        version = None
+        delay = 0.25
         
-        while time.time() - start_time < max_wait_time:
-            status = self.check_report_status(report_id)
+        while time.time() < deadline:
+            wait = min(self.long_poll_seconds, max(deadline - time.time(), 0))
+            status = self.check_report_status(report_id, wait=wait, since=version)
+            if on_status is not None:
+                on_status(status)
             
             if status.get("status") == "completed":
                 return self.get_report_data(report_id)
             elif status.get("status") == "error":
                 return {"error": status.get("message", "Unknown error")}
             
-            # Yield control for UI updates
-            time.sleep(self.poll_interval)
+            if "version" in status:
+                version = status["version"]
+                continue
+            
+            # Fallback polling for backends without long polling
+            time.sleep(min(delay, max(deadline - time.time(), 0)))
+            delay = min(delay * 2, self.poll_interval)
         
         return {"error": "Report generation timed out"}
     
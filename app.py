@@ -7,10 +7,14 @@ import json
 import os
 from typing import Dict, List, Optional, Tuple
 import random
+import uuid
 from translations import get_translation, get_supported_languages
 from api_service import api_service
-from config import get_config
+from config import get_config, config
+from rate_limiter import rate_limiter
 from report_generator import download_pdf_report, download_docx_report
+from bulk_export import EXPORT_FORMATS, write_zip, export_path
+from report_history import report_history
 
 # Page configuration
 st.set_page_config(
@@ -86,11 +90,14 @@ if 'error_message' not in st.session_state:
     st.session_state.error_message = None
 if 'current_language' not in st.session_state:
     st.session_state.current_language = 'en'
-if 'saved_reports' not in st.session_state:
-    st.session_state.saved_reports = []
+if 'history_page' not in st.session_state:
+    st.session_state.history_page = 1
+if 'session_id' not in st.session_state:
+    # Identity for per-user rate limits
+    st.session_state.session_id = uuid.uuid4().hex
 
-# Get countries from API service
-COUNTRIES = api_service.fetch_countries()
+# Countries from the API service, cached across reruns
+COUNTRIES = api_service.countries.all()
 
 # Apply CSS after session state is initialized
 st.markdown(get_css(), unsafe_allow_html=True)
@@ -247,29 +254,67 @@ def build_report():
     progress_bar = st.progress(0)
     status_text = st.empty()
     
-    steps = ['step_collecting', 'step_processing', 'step_summarizing', 'step_ready']
-    
-    for i, step in enumerate(steps):
-        status_text.text(f"Status: {get_translation(st.session_state.current_language, step)}")
-        progress_bar.progress((i + 1) / len(steps))
-        
-        # Update progress steps
+    def show_progress(event: Dict):
+        """Render a progress event from the report pipeline or the backend status endpoint"""
+        step_ids = [step['id'] for step in st.session_state.progress_steps]
+        # Error statuses from the backend carry no current_step
+        step = event.get('current_step')
+        current = step_ids.index(step) if step in step_ids else 0
         for j, progress_step in enumerate(st.session_state.progress_steps):
-            progress_step['completed'] = j <= i
-            progress_step['active'] = j == i + 1
-        
-        st.session_state.current_step = i + 1
+            progress_step['completed'] = j < current or step == 'ready'
+            progress_step['active'] = j == current and step != 'ready'
+        st.session_state.current_step = current
         
-        # Simulate processing time (or remove if you want real-time)
-        import time
-        time.sleep(1)
+        step_label = get_translation(st.session_state.current_language, f"step_{step_ids[current]}")
+        message = event.get('message')
+        if event.get('queue_position'):
+            message = get_translation(st.session_state.current_language, 'status_queued').format(
+                position=event['queue_position'],
+                seconds=round(event.get('estimated_wait', event.get('estimated_wait_seconds', 0)))
+            )
+        status_text.text(f"Status: {step_label}" + (f" - {message}" if message else ""))
+        progress_bar.progress(min(max(event.get('progress', 0), 0), 100) / 100)
     
-    # Get REAL report data from Llama service
     try:
-        report_data = llama_service.generate_report(
-            st.session_state.selected_country['name'],
-            st.session_state.date_range
-        )
+        if config['USE_MOCK_DATA']:
+            # No backend server: generate in this process with the Llama service, which
+            # queues reports behind its admission controller; the backend rate-limits itself
+            limit = rate_limiter.check(st.session_state.session_id, 'reports')
+            if not limit['allowed']:
+                show_error(get_translation(st.session_state.current_language, 'error_rate_limited').format(
+                    minutes=max(round(limit['retry_after'] / 60), 1)))
+                st.session_state.is_loading = False
+                return
+            from llama_service import llama_service
+            from llm_backends import CancellationToken
+            cancel_token = CancellationToken()
+            try:
+                report_data = llama_service.generate_report(
+                    st.session_state.selected_country['name'],
+                    st.session_state.date_range,
+                    language=st.session_state.current_language,
+                    cancel_token=cancel_token,
+                    progress=lambda event: show_progress({**event, 'current_step': event.get('step')})
+                )
+            except BaseException:
+                # Streamlit stops or reruns the script (user navigated away) by raising from
+                # the progress callback; stop decoding instead of holding the model
+                cancel_token.cancel()
+                raise
+        else:
+            # Thin client: queue the report on the backend and wait for its workers
+            report_data = api_service.generate_report(
+                st.session_state.selected_country,
+                st.session_state.date_range,
+                st.session_state.current_language,
+                st.session_state.session_id
+            )
+            if 'error' not in report_data:
+                report_data = api_service.poll_report_completion(
+                    report_data['report_id'],
+                    max_wait_time=config['REPORT_MAX_WAIT_SECONDS'],
+                    on_status=show_progress
+                ) or {"error": "Report data could not be retrieved from the backend"}
         
         if 'error' in report_data:
             show_error(report_data['error'])
@@ -284,17 +329,14 @@ def build_report():
         return
     
     # Save to history
-    report_id = str(datetime.now().timestamp())
-    saved_report = {
-        'id': report_id,
-        'country': st.session_state.selected_country,
-        'date_range': st.session_state.date_range,
-        'report_data': st.session_state.report_data,
-        'created_at': datetime.now().isoformat(),
-        'title': f"{st.session_state.selected_country['name']} Report - {st.session_state.date_range['start_date']} to {st.session_state.date_range['end_date']}"
-    }
-    
-    st.session_state.saved_reports.append(saved_report)
+    try:
+        report_history.add(
+            st.session_state.selected_country,
+            st.session_state.date_range,
+            st.session_state.report_data
+        )
+    except Exception as e:
+        print(f"Error saving report to history: {e}")
     
     st.session_state.is_loading = False
     st.session_state.current_page = 'preview'
@@ -415,6 +457,9 @@ def render_report_preview():
     
     report = st.session_state.report_data
     
+    if report.get('truncated'):
+        st.warning(get_translation(st.session_state.current_language, "report_truncated"))
+    
     # Executive Summary
     st.markdown(f'<h2 class="section-header">📋 {get_translation(st.session_state.current_language, "executive_summary")}</h2>', unsafe_allow_html=True)
     st.markdown(f'<div class="metric-card">{report["summary"]}</div>', unsafe_allow_html=True)
@@ -458,6 +503,40 @@ def render_report_preview():
     
     col1, col2 = st.columns(2)
     
+    if not config['USE_MOCK_DATA'] and report.get('report_id'):
+        # Backend-rendered files, fetched only once the user asks for them (as with
+        # report_generator's downloads) and streamed to disk once; Streamlit still reads each
+        # file into memory for its download button
+        downloads = [
+            (col1, 'pdf', "📄 Prepare PDF Report", "📄 Download PDF Report", "application/pdf"),
+            (col2, 'docx', "📝 Prepare DOCX Report", "📝 Download DOCX Report",
+             "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+        ]
+        requested = st.session_state.setdefault('requested_downloads', set())
+        for column, format, prepare_label, label, mime in downloads:
+            with column:
+                key = f"{report['report_id']}.{format}"
+                path = api_service.report_file(report['report_id'], format, download=False)
+                if path is None and key not in requested:
+                    if not st.button(prepare_label, key=f"prepare_{format}", type="primary" if format == 'pdf' else "secondary"):
+                        continue
+                    requested.add(key)
+                if path is None:
+                    with st.spinner(f"Downloading {format.upper()}..."):
+                        path = api_service.report_file(report['report_id'], format)
+                if path is None:
+                    st.error(f"Error downloading {format.upper()} from the backend")
+                    continue
+                with open(path, 'rb') as report_file:
+                    st.download_button(
+                        label=label,
+                        data=report_file,
+                        file_name=os.path.basename(path),
+                        mime=mime,
+                        type="primary" if format == 'pdf' else "secondary"
+                    )
+        return
+    
     with col1:
         # Generate and download PDF
         download_pdf_report(
@@ -560,7 +639,8 @@ def render_history_page():
     """Render the history page"""
     st.markdown(f'<h1 class="main-header">📚 {get_translation(st.session_state.current_language, "history_title")}</h1>', unsafe_allow_html=True)
     
-    if not st.session_state.saved_reports:
+    stats = report_history.stats()
+    if not stats['total']:
         st.markdown(f'<div class="metric-card" style="text-align: center; padding: 3rem;"><h3 style="color: #6b7280;">{get_translation(st.session_state.current_language, "no_reports")}</h3><p style="color: #9ca3af;">{get_translation(st.session_state.current_language, "no_reports_desc")}</p></div>', unsafe_allow_html=True)
         if st.button(f"← {get_translation(st.session_state.current_language, 'back_to_home')}"):
             st.session_state.current_page = 'home'
@@ -569,24 +649,21 @@ def render_history_page():
     
     # Search functionality
     search_term = st.text_input(f"🔍 {get_translation(st.session_state.current_language, 'search_reports')}", placeholder=get_translation(st.session_state.current_language, "search_placeholder"))
+    if search_term != st.session_state.get('history_search', ''):
+        st.session_state.history_search = search_term
+        st.session_state.history_page = 1
     
-    # Filter reports
-    filtered_reports = st.session_state.saved_reports
-    if search_term:
-        filtered_reports = [
-            report for report in st.session_state.saved_reports
-            if (search_term.lower() in report['country']['name'].lower() or
-                search_term.lower() in report['title'].lower() or
-                search_term in report['date_range']['start_date'] or
-                search_term in report['date_range']['end_date'])
-        ]
+    # Only the current page is read; report bodies are loaded when opened or exported
+    result = report_history.page(st.session_state.history_page, search=search_term or None)
+    st.session_state.history_page = result['page']
+    page_reports = result['reports']
     
-    if not filtered_reports:
+    if not page_reports:
         st.warning(get_translation(st.session_state.current_language, "no_matching_reports"))
         return
     
     # Display reports
-    for i, report in enumerate(filtered_reports):
+    for report in page_reports:
         with st.expander(f"📄 {report['title']}", expanded=False):
             col1, col2 = st.columns([3, 1])
             
@@ -597,33 +674,89 @@ def render_history_page():
                 
                 # Preview
                 st.markdown(f"**{get_translation(st.session_state.current_language, 'preview')}:**")
-                st.markdown(f"_{report['report_data']['summary'][:150]}..._")
+                if report.get('snippet'):
+                    # Where the search terms matched, highlighted
+                    st.markdown(report['snippet'])
+                else:
+                    st.markdown(f"_{report['preview']}..._")
             
             with col2:
-                if st.button(f"👁️ {get_translation(st.session_state.current_language, 'open')}", key=f"open_{i}"):
-                    st.session_state.report_data = report['report_data']
-                    st.session_state.current_page = 'preview'
+                if st.button(f"👁️ {get_translation(st.session_state.current_language, 'open')}", key=f"open_{report['id']}"):
+                    saved = report_history.get(report['id'])
+                    if saved:
+                        st.session_state.report_data = saved['report_data']
+                        # Same country and dates as when saved, so stored documents are reused
+                        st.session_state.selected_country = saved['country']
+                        st.session_state.date_range = saved['date_range']
+                        st.session_state.current_page = 'preview'
                     st.rerun()
                 
-                if st.button(f"🗑️ {get_translation(st.session_state.current_language, 'delete')}", key=f"delete_{i}"):
-                    st.session_state.saved_reports.remove(report)
+                if st.button(f"🗑️ {get_translation(st.session_state.current_language, 'delete')}", key=f"delete_{report['id']}"):
+                    report_history.delete(report['id'])
                     st.rerun()
     
+    # Pagination
+    if result['pages'] > 1:
+        col_prev, col_page, col_next = st.columns([1, 2, 1])
+        with col_prev:
+            if st.button(f"← {get_translation(st.session_state.current_language, 'previous_page')}", disabled=result['page'] <= 1):
+                st.session_state.history_page = result['page'] - 1
+                st.rerun()
+        with col_page:
+            st.caption(get_translation(st.session_state.current_language, 'page_of').format(page=result['page'], pages=result['pages'], total=result['total']))
+        with col_next:
+            if st.button(f"{get_translation(st.session_state.current_language, 'next_page')} →", disabled=result['page'] >= result['pages']):
+                st.session_state.history_page = result['page'] + 1
+                st.rerun()
+    
+    # Bulk export
+    st.markdown(f'<h2 class="section-header">📦 {get_translation(st.session_state.current_language, "bulk_export")}</h2>', unsafe_allow_html=True)
+    # Every report matching the search, not just this page; bodies are loaded only when exporting
+    titles = {report['id']: report['title'] for report in report_history.titles(search=search_term or None)}
+    selected_ids = st.multiselect(
+        get_translation(st.session_state.current_language, "select_reports"),
+        options=list(titles),
+        default=list(titles),
+        format_func=lambda report_id: titles[report_id]
+    )
+    export_formats = st.multiselect(
+        get_translation(st.session_state.current_language, "export_formats"),
+        options=list(EXPORT_FORMATS),
+        default=list(EXPORT_FORMATS),
+        format_func=str.upper
+    )
+    if st.button(f"📦 {get_translation(st.session_state.current_language, 'export_zip')}", disabled=not (selected_ids and export_formats)):
+        with st.spinner(get_translation(st.session_state.current_language, "exporting_reports")):
+            try:
+                export = write_zip(report_history.get_many(selected_ids), export_path(), export_formats)
+                st.session_state.bulk_export_path = export['path']
+            except Exception as e:
+                st.error(f"Error exporting reports: {str(e)}")
+    export_file = st.session_state.get('bulk_export_path')
+    if export_file and os.path.exists(export_file):
+        # Written to disk chunk by chunk, but the download button reads the whole archive into memory
+        with open(export_file, 'rb') as archive:
+            st.download_button(
+                label=f"⬇️ {get_translation(st.session_state.current_language, 'download_zip')}",
+                data=archive,
+                file_name=os.path.basename(export_file),
+                mime="application/zip",
+                type="primary"
+            )
+    
     # Statistics
     st.markdown(f'<h2 class="section-header">📊 {get_translation(st.session_state.current_language, "history_stats")}</h2>', unsafe_allow_html=True)
     
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        st.metric(get_translation(st.session_state.current_language, "total_reports"), len(st.session_state.saved_reports))
+        st.metric(get_translation(st.session_state.current_language, "total_reports"), stats['total'])
     
     with col2:
-        unique_countries = len(set(report['country']['code'] for report in st.session_state.saved_reports))
-        st.metric(get_translation(st.session_state.current_language, "countries_covered"), unique_countries)
+        st.metric(get_translation(st.session_state.current_language, "countries_covered"), stats['countries'])
     
     with col3:
-        avg_data_points = sum(len(report['report_data']['chart_data']) for report in st.session_state.saved_reports) // len(st.session_state.saved_reports) if st.session_state.saved_reports else 0
-        st.metric(get_translation(st.session_state.current_language, "avg_data_points"), avg_data_points)
+        st.metric(get_translation(st.session_state.current_language, "avg_data_points"), stats['avg_data_points'])
 
 # Sidebar navigation
 with st.sidebar:
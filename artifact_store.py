@@ -0,0 +1,151 @@
+"""
+Artifact Store for NGO Data Helpers
+Content-addressed store of rendered PDF and DOCX documents under REPORTS_DIRECTORY
+"""
+
+import hashlib
+import os
+import threading
+from typing import BinaryIO, Optional
+
+from config import get_config
+from report_generator import RENDERER_VERSION
+
+
+class ArtifactTooLargeError(ValueError):
+    """Raised when a document exceeds MAX_REPORT_SIZE_MB"""
+
+
+class ArtifactStore:
+    """
+    Rendered documents on disk, addressed by report content and renderer version
+
+    A document's address is the SHA-256 of its report_fingerprint (report data,
+    country, date range and format) and RENDERER_VERSION, so the same report is
+    rendered once and a layout change invalidates every stored document. Files are
+    written atomically and returned as paths; the backend streams them with sendfile,
+    while a Streamlit download button reads the whole file into memory. The store is capped at
+    ARTIFACT_STORE_MAX_MB; reading a document marks it as recently used and the least
+    recently used documents are deleted first.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: Optional[int] = None,
+                 max_file_bytes: Optional[int] = None):
+        config = get_config()
+        self.directory = directory or os.path.join(config['REPORTS_DIRECTORY'], 'artifacts')
+        self.max_bytes = max_bytes if max_bytes is not None else config['ARTIFACT_STORE_MAX_MB'] * 1024 * 1024
+        self.max_file_bytes = max_file_bytes if max_file_bytes is not None else \
+            config['MAX_REPORT_SIZE_MB'] * 1024 * 1024
+        self._lock = threading.Lock()
+        # Bytes on disk, counted on the first write and rescanned by cleanup()
+        self._total = None
+
+    def path(self, fingerprint: str, format: str) -> str:
+        """Location of a document, whether or not it exists"""
+        key = hashlib.sha256(f"{RENDERER_VERSION}:{fingerprint}".encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, key[:2], f"{key}.{format}")
+
+    def get(self, fingerprint: str, format: str) -> Optional[str]:
+        """
+        Path of a stored document, marking it as recently used
+
+        Args:
+            fingerprint: report_fingerprint of the document
+            format: 'pdf' or 'docx'
+
+        Returns:
+            The path, or None if the document is not stored
+        """
+        path = self.path(fingerprint, format)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def open(self, fingerprint: str, format: str) -> Optional[BinaryIO]:
+        """Stored document opened for reading, or None"""
+        path = self.get(fingerprint, format)
+        if path is None:
+            return None
+        try:
+            return open(path, 'rb')
+        except FileNotFoundError:
+            # Evicted by another process between get() and open()
+            return None
+
+    def put(self, fingerprint: str, format: str, document: bytes) -> str:
+        """
+        Store a document (atomically; a no-op if it is already stored)
+
+        Returns:
+            The document's path
+
+        Raises:
+            ArtifactTooLargeError: If the document exceeds MAX_REPORT_SIZE_MB
+        """
+        if len(document) > self.max_file_bytes:
+            raise ArtifactTooLargeError(f"Rendered {format.upper()} is {len(document) / 1024 / 1024:.1f} MB, "
+                                        f"over the {self.max_file_bytes // 1024 // 1024} MB limit")
+        path = self.path(fingerprint, format)
+        if self.get(fingerprint, format) is not None:
+            return path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(document)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._total is None:
+                self._total = self._scan_total()
+            else:
+                self._total += len(document)
+            over = self._total > self.max_bytes
+        if over:
+            self.cleanup()
+        return path
+
+    def _files(self):
+        """(mtime, size, path) of every stored document"""
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def _scan_total(self) -> int:
+        return sum(size for _, size, _ in self._files())
+
+    def cleanup(self) -> int:
+        """
+        Delete least recently used documents until the store fits ARTIFACT_STORE_MAX_MB
+
+        Returns:
+            Number of bytes freed
+        """
+        files = sorted(self._files())
+        total = sum(size for _, size, _ in files)
+        freed = 0
+        for _, size, path in files:
+            if total - freed <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            freed += size
+        with self._lock:
+            self._total = total - freed
+        return freed
+
+
+# Global artifact store shared by the renderers of this process
+artifact_store = ArtifactStore()
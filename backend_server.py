@@ -0,0 +1,584 @@
+"""
+Backend Server for NGO Data Helpers
+Implements the endpoints of API_CONTRACT.md with a report job queue served by a
+pool of worker processes, each holding the LLM and embedding models once
+
+    python backend_server.py --port 8000 --workers 1
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Any, Tuple
+from urllib.parse import urlparse, parse_qs
+
+from config import get_config
+from country_registry import country_registry
+from llm_backends import get_backend
+from single_flight import report_key
+from pregeneration import ReportCache
+from artifact_store import ArtifactTooLargeError
+from rate_limiter import RateLimiter, AdmissionController, QueueFullError
+
+DOWNLOAD_FORMATS = {
+    'pdf': 'application/pdf',
+    'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+}
+
+# Report service and progress queue of this worker process, set by init_worker
+_worker_service = None
+_worker_events = None
+
+
+def init_worker(events) -> None:
+    """Load the models once when a worker process starts"""
+    global _worker_service, _worker_events
+    from llama_service import llama_service
+
+    llama_service.initialize_model()
+    llama_service.get_embedding_model()
+    _worker_service = llama_service
+    _worker_events = events
+
+
+def run_report_job(report_id: str, country_name: str, date_range: Dict[str, str],
+                   language: str = 'en') -> Dict[str, Any]:
+    """Generate one report inside a worker process, forwarding its progress events"""
+    return _worker_service.generate_report(
+        country_name, date_range, language=language,
+        progress=lambda event: _worker_events.put((report_id, event)),
+    )
+
+
+def parse_range(header: Optional[str], size: int):
+    """
+    Parse a single-range 'Range: bytes=start-end' header
+
+    Args:
+        header: Range header value, or None
+        size: Length of the full body
+
+    Returns:
+        None to send the whole body, (start, end) inclusive, or 'invalid' for a 416 response
+    """
+    match = re.fullmatch(r'bytes=(\d*)-(\d*)', (header or '').strip())
+    if match is None or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # Suffix range: the last N bytes
+        start, end = max(size - int(last), 0), size - 1
+    if start >= size or start > end:
+        return 'invalid'
+    return start, end
+
+
+def utc_timestamp(timestamp: Optional[float] = None) -> str:
+    """Format a Unix timestamp (default now) as ISO 8601 UTC, e.g. 2024-01-15T10:30:00Z"""
+    moment = datetime.fromtimestamp(timestamp if timestamp is not None else time.time(), timezone.utc)
+    return moment.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class RequestError(Exception):
+    """Invalid client request, reported in the contract's error format"""
+
+    def __init__(self, status: int, code: str, message: str, details: str = '',
+                 headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+        self.message = message
+        self.details = details
+        self.headers = headers or {}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"error": {"code": self.code, "message": self.message, "details": self.details}}
+
+
+def validate_report_request(payload: Dict[str, Any]) -> Tuple[Dict[str, str], Dict[str, str], str]:
+    """
+    Validate a POST /api/reports body
+
+    Args:
+        payload: Decoded JSON request body
+
+    Returns:
+        (country, date_range, language) with the country name normalized
+
+    Raises:
+        RequestError: If the country or date range is missing or invalid
+    """
+    country = payload.get('country') or {}
+    lookup = country.get('code') or country.get('name')
+    if not lookup:
+        raise RequestError(400, 'INVALID_COUNTRY', 'Country is required')
+    match = country_registry.get(lookup)
+    if match is None:
+        raise RequestError(400, 'INVALID_COUNTRY', f"Country '{lookup}' is not supported")
+
+    date_range = payload.get('date_range') or {}
+    try:
+        start = date.fromisoformat(date_range['start_date'])
+        end = date.fromisoformat(date_range['end_date'])
+    except (KeyError, TypeError, ValueError):
+        raise RequestError(400, 'INVALID_DATE_RANGE', 'Start and end dates are required',
+                           'Dates must use the YYYY-MM-DD format')
+    if end < start:
+        raise RequestError(400, 'INVALID_DATE_RANGE', 'End date must be after start date',
+                           'The provided date range is invalid')
+
+    return (
+        {"code": match['code'], "name": match['name']},
+        {"start_date": start.isoformat(), "end_date": end.isoformat()},
+        payload.get('language') or 'en',
+    )
+
+
+class ReportJobManager:
+    """
+    Queue of report jobs executed by a process pool
+
+    Each worker process loads the models once (init_worker) and then generates
+    reports one at a time; jobs beyond the number of workers wait in the queue.
+    Finished jobs are kept in memory for BACKEND_JOB_TTL_SECONDS. A request identical
+    to a queued or running job attaches to that job instead of queueing another.
+    At most REPORT_QUEUE_SIZE jobs wait for a worker; beyond that new reports are
+    rejected (QUEUE_FULL) with an estimate of when to retry.
+    """
+
+    def __init__(self, workers: int = 1, job_ttl: float = 86400):
+        # spawn: CUDA cannot be re-initialized in a forked child
+        context = multiprocessing.get_context('spawn')
+        # Progress events from all workers: (report_id, event)
+        self.events = context.Queue()
+        self.executor = ProcessPoolExecutor(
+            max_workers=max(workers, 1),
+            mp_context=context,
+            initializer=init_worker,
+            initargs=(self.events,),
+        )
+        self.job_ttl = job_ttl
+        self.backend_model_id = get_backend().model_id
+        self.report_mode = get_config()['REPORT_MODE']
+        self.model_id = f"{self.backend_model_id}:{self.report_mode}"
+        self.report_cache = ReportCache()
+        # Tickets are report IDs, admitted in the executor's own FIFO order
+        self.admission = AdmissionController(max_active=max(workers, 1))
+        self.jobs = {}
+        # report_key -> unfinished job with that key
+        self.in_flight = {}
+        self._lock = threading.Lock()
+        # Notified whenever any job's status changes (its 'version' increases)
+        self._changed = threading.Condition(self._lock)
+        self._event_thread = threading.Thread(target=self._drain_events, name='report-progress', daemon=True)
+        self._event_thread.start()
+
+    def create_job(self, country: Dict[str, str], date_range: Dict[str, str], language: str) -> Tuple[Dict[str, Any], bool]:
+        """
+        Queue a report, attach to an identical one still in progress, or answer it
+        from the pre-generated report cache
+
+        Returns:
+            (job record, attached) where attached is True for an existing job
+
+        Raises:
+            RequestError: QUEUE_FULL (503) when REPORT_QUEUE_SIZE jobs are already waiting
+        """
+        self._prune()
+        key = report_key(country['code'], date_range['start_date'], date_range['end_date'],
+                         language, self.model_id)
+        with self._lock:
+            existing = self.in_flight.get(key)
+            if existing is not None:
+                existing["requests"] += 1
+                return existing, True
+
+            job = {
+                "report_id": f"report_{uuid.uuid4().hex[:12]}",
+                "key": key,
+                "state": "queued",
+                "country": country,
+                "date_range": date_range,
+                "language": language,
+                "created_at": time.time(),
+                "completed_at": None,
+                "result": None,
+                "error": None,
+                "requests": 1,
+                "progress": None,
+                "data_sources": {},
+                "stage_durations": {},
+                "version": 0,
+            }
+            cached = self.report_cache.get(country['name'], date_range, self.backend_model_id, self.report_mode,
+                                           language=language)
+            if cached is not None:
+                # Pre-generated report: complete immediately without touching a worker
+                job.update(state="completed", result={**cached, 'cached': True},
+                           completed_at=time.time(), version=1)
+                self.jobs[job["report_id"]] = job
+                return job, False
+            try:
+                self.admission.enqueue(job["report_id"])
+                self.admission.admit_waiting()
+            except QueueFullError as e:
+                retry_after = str(max(int(e.estimated_wait), 1))
+                raise RequestError(503, 'QUEUE_FULL', str(e), 'Retry after the indicated number of seconds',
+                                   headers={'Retry-After': retry_after})
+            job["future"] = self.executor.submit(run_report_job, job["report_id"], country['name'], date_range,
+                                               language)
+            self.jobs[job["report_id"]] = job
+            self.in_flight[key] = job
+        job["future"].add_done_callback(lambda future: self._finish(job, future))
+        return job, False
+
+    def get_job(self, report_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self.jobs.get(report_id)
+
+    def _drain_events(self) -> None:
+        """Apply worker progress events to their jobs"""
+        while True:
+            item = self.events.get()
+            if item is None:
+                return
+            report_id, event = item
+            with self._changed:
+                job = self.jobs.get(report_id)
+                if job is None:
+                    continue
+                job["progress"] = event
+                if "source" in event:
+                    job["data_sources"][event["source"].lower().replace(' ', '')] = event["source_status"]
+                if event["status"] == "completed" and "duration" in event:
+                    stage = event["stage"]
+                    job["stage_durations"][stage] = round(job["stage_durations"].get(stage, 0.0) + event["duration"], 3)
+                job["version"] += 1
+                self._changed.notify_all()
+
+    def _finish(self, job: Dict[str, Any], future) -> None:
+        try:
+            result = future.result()
+        except Exception as e:
+            job["error"] = RequestError(500, 'LLM_ERROR', 'Report worker failed', str(e))
+        else:
+            if 'error' in result:
+                job["error"] = RequestError(500, 'GENERATION_FAILED', result['error'])
+            else:
+                job["result"] = result
+        with self._changed:
+            self.admission.release(job["report_id"])
+            self.admission.admit_waiting()
+            job["completed_at"] = time.time()
+            job["state"] = "error" if job["error"] is not None else "completed"
+            self.in_flight.pop(job["key"], None)
+            job["version"] += 1
+            self._changed.notify_all()
+
+    def wait_for_change(self, job: Dict[str, Any], since: int, timeout: float) -> None:
+        """Block until the job's status version exceeds since, it finishes, or timeout elapses"""
+        with self._changed:
+            self._changed.wait_for(
+                lambda: job["version"] > since or job["completed_at"] is not None,
+                timeout=timeout,
+            )
+
+    def _prune(self) -> None:
+        """Forget finished jobs older than the retention period"""
+        cutoff = time.time() - self.job_ttl
+        with self._lock:
+            expired = [report_id for report_id, job in self.jobs.items()
+                       if job["completed_at"] is not None and job["completed_at"] < cutoff]
+            for report_id in expired:
+                del self.jobs[report_id]
+
+    def status(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Status payload of GET /api/reports/{report_id}/status"""
+        return {**self._status(job), "version": job["version"]}
+
+    def _status(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        state = job["state"]
+        if state == "completed":
+            return {"status": "completed", "progress": 100, "current_step": "ready", "stage": "ready",
+                    "message": "Report generation completed", "data_sources": job["data_sources"],
+                    "stage_durations": job["result"].get("timings", job["stage_durations"])}
+        if state == "error":
+            return {"status": "error", "progress": 100, "current_step": "error",
+                    "message": job["error"].message, "error": job["error"].to_dict()["error"]}
+        event = job["progress"]
+        if event is not None:
+            return {"status": "processing", "progress": event["progress"], "current_step": event["step"],
+                    "stage": event["stage"], "message": event["message"], "elapsed": event["elapsed"],
+                    "data_sources": job["data_sources"], "stage_durations": job["stage_durations"]}
+        if job["future"].running():
+            return {"status": "processing", "progress": 0, "current_step": "collecting", "stage": "starting",
+                    "message": "Starting report generation"}
+        return {"status": "processing", "progress": 0, "current_step": "queued", "stage": "queued",
+                "message": "Waiting for a free report worker", **self.queue_info(job)}
+
+    def queue_info(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Queue position and estimated seconds until a queued job starts (empty once it runs)"""
+        position = self.admission.position(job["report_id"])
+        if position is None:
+            return {}
+        return {"queue_position": position, "estimated_wait_seconds": self.admission.estimated_wait(job["report_id"])}
+
+    def report_data(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Payload of GET /api/reports/{report_id} for a completed job"""
+        return {
+            "report_id": job["report_id"],
+            "status": "completed",
+            **job["result"],
+            "generated_at": utc_timestamp(job["completed_at"]),
+            "country": job["country"],
+            "date_range": job["date_range"],
+        }
+
+    def document_path(self, job: Dict[str, Any], format: str) -> str:
+        """Path of the report file in the given format, rendered into the artifact store on first use"""
+        from render_service import render_service
+
+        return render_service.render_file(job["result"], job["country"]["name"], job["date_range"], format)
+
+    def shutdown(self) -> None:
+        from render_service import render_service
+
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        render_service.shutdown()
+        self.events.put(None)
+
+
+class ReportRequestHandler(BaseHTTPRequestHandler):
+    """HTTP handler for the API_CONTRACT.md endpoints"""
+
+    server_version = 'NGODataHelpers/1.0'
+    routes = [
+        ('GET', re.compile(r'^/api/countries$'), 'get_countries'),
+        ('GET', re.compile(r'^/health$'), 'get_health'),
+        ('POST', re.compile(r'^/api/reports$'), 'create_report'),
+        ('GET', re.compile(r'^/api/reports/(?P<report_id>[\w-]+)/status$'), 'get_status'),
+        ('GET', re.compile(r'^/api/reports/(?P<report_id>[\w-]+)/download$'), 'download_report'),
+        ('GET', re.compile(r'^/api/reports/(?P<report_id>[\w-]+)$'), 'get_report'),
+    ]
+    # Not counted against RATE_LIMIT_REQUESTS_PER_MINUTE: health checks, and status
+    # long polls, which the server itself paces
+    unlimited = {'get_health', 'get_status'}
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def _dispatch(self, method: str) -> None:
+        url = urlparse(self.path)
+        self.query = parse_qs(url.query)
+        self.rate_limit = None
+        try:
+            for route_method, pattern, handler in self.routes:
+                match = pattern.match(url.path)
+                if match and route_method == method:
+                    if handler not in self.unlimited:
+                        self._check_rate_limit('requests')
+                    getattr(self, handler)(**match.groupdict())
+                    return
+            raise RequestError(404, 'NOT_FOUND', f"No endpoint {method} {url.path}")
+        except RequestError as e:
+            self._send_json(e.status, e.to_dict(), e.headers)
+        except Exception as e:
+            print(f"Error handling {method} {url.path}: {e}")
+            self._send_json(500, RequestError(500, 'SERVER_ERROR', 'Internal server error').to_dict())
+
+    def _client_id(self) -> str:
+        """Rate-limited identity: the X-Session-ID header, else the client address"""
+        return self.headers.get('X-Session-ID') or self.client_address[0]
+
+    def _check_rate_limit(self, limit: str) -> None:
+        """Count this request against a RateLimiter limit, raising API_RATE_LIMIT (429) when exhausted"""
+        self.rate_limit = self.server.rate_limiter.check(self._client_id(), limit)
+        if not self.rate_limit["allowed"]:
+            period = 'minute' if limit == 'requests' else 'hour'
+            raise RequestError(429, 'API_RATE_LIMIT',
+                               f"Rate limit of {self.rate_limit['limit']} {limit} per {period} exceeded",
+                               f"Retry after {self.rate_limit['retry_after']} seconds",
+                               headers={'Retry-After': str(self.rate_limit['retry_after'])})
+
+    def _send_rate_limit_headers(self) -> None:
+        if self.rate_limit is not None and self.rate_limit['limit']:
+            self.send_header('X-RateLimit-Limit', str(self.rate_limit['limit']))
+            self.send_header('X-RateLimit-Remaining', str(self.rate_limit['remaining']))
+            self.send_header('X-RateLimit-Reset', str(self.rate_limit['reset']))
+
+    def _send_json(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self._send_rate_limit_headers()
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> Dict[str, Any]:
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # A negative length would make read() wait for the client to close the connection
+            raise RequestError(400, 'INVALID_REQUEST', 'Content-Length must be a non-negative integer')
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except json.JSONDecodeError:
+            raise RequestError(400, 'INVALID_REQUEST', 'Request body must be JSON')
+        if not isinstance(payload, dict):
+            raise RequestError(400, 'INVALID_REQUEST', 'Request body must be a JSON object')
+        return payload
+
+    def _get_job(self, report_id: str) -> Dict[str, Any]:
+        job = self.server.jobs.get_job(report_id)
+        if job is None:
+            raise RequestError(404, 'REPORT_NOT_FOUND', f"Report '{report_id}' does not exist")
+        return job
+
+    def get_countries(self) -> None:
+        self._send_json(200, self.server.countries)
+
+    def get_health(self) -> None:
+        jobs = self.server.jobs
+        self._send_json(200, {"status": "ok", "jobs": len(jobs.jobs), "in_flight": len(jobs.in_flight),
+                              "queue": jobs.admission.snapshot()})
+
+    def create_report(self) -> None:
+        country, date_range, language = validate_report_request(self._read_json())
+        self._check_rate_limit('reports')
+        job, attached = self.server.jobs.create_job(country, date_range, language)
+        queue_info = self.server.jobs.queue_info(job)
+        if attached:
+            message = "Attached to an identical report in progress"
+        elif queue_info:
+            message = "Report queued until a worker is free"
+        else:
+            message = "Report generation started"
+        self._send_json(201, {
+            "report_id": job["report_id"],
+            "status": "processing",
+            "message": message,
+            "country": country,
+            "date_range": date_range,
+            "created_at": utc_timestamp(job["created_at"]),
+            **queue_info,
+        })
+
+    def get_status(self, report_id: str) -> None:
+        job = self._get_job(report_id)
+        # Long poll: ?wait=<seconds>&since=<version> holds the request until the status changes
+        try:
+            wait = min(float(self.query.get('wait', ['0'])[0]), self.server.max_long_poll)
+            since = int(self.query.get('since', ['-1'])[0])
+        except ValueError:
+            raise RequestError(400, 'INVALID_REQUEST', 'wait and since must be numbers')
+        if wait > 0:
+            self.server.jobs.wait_for_change(job, since, wait)
+        self._send_json(200, self.server.jobs.status(job))
+
+    def get_report(self, report_id: str) -> None:
+        job = self._get_job(report_id)
+        if job["state"] == "error":
+            raise job["error"]
+        if job["state"] != "completed":
+            self._send_json(202, self.server.jobs.status(job))
+            return
+        self._send_json(200, self.server.jobs.report_data(job))
+
+    def download_report(self, report_id: str) -> None:
+        format = self.query.get('format', ['pdf'])[0]
+        if format not in DOWNLOAD_FORMATS:
+            raise RequestError(400, 'INVALID_FORMAT', f"Unsupported format '{format}'", 'Use pdf or docx')
+        job = self._get_job(report_id)
+        if job["state"] == "error":
+            raise job["error"]
+        if job["state"] != "completed":
+            raise RequestError(404, 'REPORT_NOT_FOUND', f"Report '{report_id}' is not ready yet")
+
+        try:
+            path = self.server.jobs.document_path(job, format)
+        except ArtifactTooLargeError as e:
+            raise RequestError(500, 'GENERATION_FAILED', str(e))
+        # The open handle keeps the file readable even if the store evicts it meanwhile
+        with open(path, 'rb') as document:
+            size = os.fstat(document.fileno()).st_size
+            start, end = 0, size - 1
+            byte_range = parse_range(self.headers.get('Range'), size)
+            if byte_range == 'invalid':
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            if byte_range is not None:
+                start, end = byte_range
+                self.send_response(206)
+                self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+            else:
+                self.send_response(200)
+            self.send_header('Content-Type', DOWNLOAD_FORMATS[format])
+            self.send_header('Content-Disposition', f'attachment; filename="{report_id}.{format}"')
+            self.send_header('Accept-Ranges', 'bytes')
+            self.send_header('Content-Length', str(end - start + 1))
+            self._send_rate_limit_headers()
+            self.end_headers()
+            # Zero-copy from the page cache to the socket where the OS supports it
+            self.connection.sendfile(document, offset=start, count=end - start + 1)
+
+
+def supported_countries() -> List[Dict[str, str]]:
+    """Countries for GET /api/countries, sorted by name"""
+    return [{"code": country['code'], "name": country['name']} for country in country_registry.all()]
+
+
+def create_server(host: str, port: int, workers: int) -> ThreadingHTTPServer:
+    """Create the HTTP server with its job manager attached"""
+    config = get_config()
+    server = ThreadingHTTPServer((host, port), ReportRequestHandler)
+    server.jobs = ReportJobManager(workers, config['BACKEND_JOB_TTL_SECONDS'])
+    server.rate_limiter = RateLimiter()
+    server.countries = supported_countries()
+    server.max_long_poll = config['STATUS_LONG_POLL_SECONDS']
+    return server
+
+
+def main():
+    config = get_config()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default=config['BACKEND_HOST'], help='Interface to listen on')
+    parser.add_argument('--port', type=int, default=config['BACKEND_PORT'], help='Port to listen on')
+    parser.add_argument('--workers', type=int, default=config['BACKEND_WORKERS'],
+                        help='Report worker processes (each loads its own copy of the models)')
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port, args.workers)
+    print(f"Serving NGO Data Helpers API on http://{args.host}:{args.port} with {args.workers} worker(s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.jobs.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+"""
+Batch Report CLI for NGO Data Helpers
+Generates reports for many countries and date ranges without the Streamlit UI
+
+Data collection runs concurrently across countries while generation runs one report
+at a time on the shared, once-loaded LLM and embedding models, and PDF/DOCX documents
+render in the render service's process pool. Each report is written as JSON (plus
+PDF/DOCX) into REPORTS_DIRECTORY.
+
+    python batch_cli.py --countries Sudan,Yemen,Haiti --days 30
+    python batch_cli.py --countries-file countries.txt --start 2024-01-01 --end 2024-06-30 --formats json,pdf
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Any, Tuple
+
+from config import get_config
+from country_registry import country_registry
+from report_generator import report_filename
+
+FORMATS = ('json', 'pdf', 'docx')
+
+
+def collect(service, country_name: str, date_range: Dict[str, str]) -> Tuple[Dict[str, str], float]:
+    """Fetch all sources for one country; returns (sources, seconds)"""
+    start = time.perf_counter()
+    country_code = country_registry.lookup(country_name)['alpha_3']
+    sources = service.collect_sources(country_name, country_code, date_range['start_date'], date_range['end_date'])
+    return sources, time.perf_counter() - start
+
+
+def write_json(report: Dict[str, Any], country_name: str, date_range: Dict[str, str], output_dir: str) -> str:
+    """Write the report data as JSON and return the path"""
+    path = os.path.join(output_dir, report_filename(country_name, date_range, 'json'))
+    payload = {"country": country_name, "date_range": date_range, **report}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, indent=2, ensure_ascii=False)
+    return path
+
+
+def write_documents(renders: Dict[str, Future], country_name: str, date_range: Dict[str, str],
+                    output_dir: str) -> List[str]:
+    """Wait for rendered documents ({format: Future}) and write them; returns the paths"""
+    paths = []
+    for format, future in renders.items():
+        path = os.path.join(output_dir, report_filename(country_name, date_range, format))
+        with open(path, 'wb') as f:
+            f.write(future.result())
+        paths.append(path)
+    return paths
+
+
+def run_batch(service, requests: List[Tuple[str, Dict[str, str]]], output_dir: str,
+              formats: List[str], collect_workers: int) -> List[Dict[str, Any]]:
+    """
+    Generate every (country, date_range) request
+
+    Args:
+        service: LlamaService whose models are shared by all reports
+        requests: (country name, date range) pairs
+        output_dir: Directory receiving the report files
+        formats: Subset of FORMATS to write
+        collect_workers: Countries whose data is fetched concurrently
+
+    Returns:
+        One result per request with status, timings and output paths
+    """
+    from render_service import render_service
+
+    os.makedirs(output_dir, exist_ok=True)
+    document_formats = [format for format in formats if format != 'json']
+    results = []
+    # (result, {format: Future}, submitted at, {format: finished at}) of documents still rendering
+    rendering = []
+    with ThreadPoolExecutor(max_workers=max(collect_workers, 1)) as pool:
+        futures = {pool.submit(collect, service, country, date_range): (country, date_range)
+                   for country, date_range in requests}
+        # Generate in completion order so the model works while slower collections finish
+        for future in as_completed(futures):
+            country, date_range = futures[future]
+            result = {"country": country, "date_range": date_range}
+            results.append(result)
+            try:
+                sources, result["collect_seconds"] = future.result()
+            except Exception as e:
+                result.update(status="error", error=f"Data collection failed: {e}")
+                print(f"{country}: {result['error']}")
+                continue
+
+            start = time.perf_counter()
+            report = service.report_from_sources(country, sources)
+            result["generate_seconds"] = time.perf_counter() - start
+            if 'error' in report:
+                result.update(status="error", error=report['error'])
+                print(f"{country}: {report['error']}")
+                continue
+
+            # Documents render in the render service's processes while the next report generates
+            renders = render_service.render_all(report, country, date_range, document_formats)
+            finished = {}
+            for format, render in renders.items():
+                render.add_done_callback(lambda _, format=format, finished=finished:
+                                         finished.__setitem__(format, time.perf_counter()))
+            rendering.append((result, renders, time.perf_counter(), finished))
+            result["outputs"] = [write_json(report, country, date_range, output_dir)] if 'json' in formats else []
+            result["status"] = "truncated" if report.get('truncated') else "ok"
+            print(f"{country:>24} {date_range['start_date']}..{date_range['end_date']}: {result['status']}, "
+                  f"collect {result['collect_seconds']:.1f}s, generate {result['generate_seconds']:.1f}s")
+
+    for result, renders, submitted, finished in rendering:
+        try:
+            result["outputs"] += write_documents(renders, result["country"], result["date_range"], output_dir)
+        except Exception as e:
+            result.update(status="error", error=f"Rendering failed: {e}")
+            print(f"{result['country']}: {result['error']}")
+        result["render_seconds"] = max(finished.values(), default=submitted) - submitted
+    return results
+
+
+def read_countries(args) -> List[str]:
+    countries = []
+    if args.countries:
+        countries += args.countries.split(',')
+    if args.countries_file:
+        with open(args.countries_file, encoding='utf-8') as f:
+            countries += [line for line in f.read().splitlines() if not line.startswith('#')]
+    return [country.strip() for country in countries if country.strip()]
+
+
+def read_date_ranges(args, parser) -> List[Dict[str, str]]:
+    ranges = []
+    if args.start or args.end:
+        if not (args.start and args.end):
+            parser.error('--start and --end must be given together')
+        ranges.append({"start_date": args.start, "end_date": args.end})
+    today = date.today()
+    for days in args.days or []:
+        ranges.append({"start_date": (today - timedelta(days=days)).isoformat(), "end_date": today.isoformat()})
+    if not ranges:
+        parser.error('give --start/--end and/or --days')
+    return ranges
+
+
+def main():
+    config = get_config()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--countries', help='Comma-separated country names or ISO codes')
+    parser.add_argument('--countries-file', help='File with one country per line')
+    parser.add_argument('--start', help='Start date YYYY-MM-DD')
+    parser.add_argument('--end', help='End date YYYY-MM-DD')
+    parser.add_argument('--days', type=int, action='append', help='Trailing window in days (repeatable)')
+    parser.add_argument('--formats', default='json,pdf,docx', help='Comma-separated subset of json,pdf,docx')
+    parser.add_argument('--collect-workers', type=int, default=4, help='Countries collected concurrently')
+    parser.add_argument('--output-dir', help='Output directory (default REPORTS_DIRECTORY/batch-<timestamp>)')
+    args = parser.parse_args()
+
+    formats = [f.strip() for f in args.formats.split(',') if f.strip()]
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        parser.error(f"unknown formats: {', '.join(sorted(unknown))}")
+    countries = []
+    for country in read_countries(args):
+        try:
+            countries.append(country_registry.lookup(country)['name'])
+        except LookupError:
+            parser.error(f"unknown country '{country}'")
+    if not countries:
+        parser.error('give --countries and/or --countries-file')
+    requests = [(country, date_range) for country in countries for date_range in read_date_ranges(args, parser)]
+    output_dir = args.output_dir or os.path.join(config['REPORTS_DIRECTORY'],
+                                                 f"batch-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+
+    from llama_service import llama_service
+
+    start = time.perf_counter()
+    llama_service.initialize_model()
+    llama_service.get_embedding_model()
+    load_seconds = time.perf_counter() - start
+    print(f"Models loaded in {load_seconds:.1f}s; generating {len(requests)} reports into {output_dir}")
+
+    start = time.perf_counter()
+    results = run_batch(llama_service, requests, output_dir, formats, args.collect_workers)
+    wall_seconds = time.perf_counter() - start
+
+    succeeded = [r for r in results if r["status"] != "error"]
+    summary = {
+        "reports": len(results),
+        "succeeded": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "model_load_seconds": round(load_seconds, 2),
+        "wall_seconds": round(wall_seconds, 2),
+        "reports_per_hour": round(len(succeeded) / wall_seconds * 3600, 1) if wall_seconds else 0.0,
+        "median_generate_seconds": round(statistics.median(r["generate_seconds"] for r in succeeded), 2)
+        if succeeded else None,
+        "results": results,
+    }
+    with open(os.path.join(output_dir, 'batch_summary.json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+    print(f"{summary['succeeded']}/{summary['reports']} reports in {wall_seconds:.1f}s "
+          f"({summary['reports_per_hour']} reports/hour)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,4 @@
+"""
+Benchmarks for NGO Data Helpers
+Run from the repository root, e.g. python -m benchmarks.bench_extractive --help
+"""
@@ -0,0 +1,94 @@
+"""
+Benchmark: template-based DOCX generation
+Times ReportGenerator.generate_docx (prebuilt template, bulk section fill) against
+the paragraph-by-paragraph generate_docx_object_model on synthetic reports of
+increasing size, and checks that both produce the same paragraphs.
+
+    python -m benchmarks.bench_docx --events 10 200 1000 --output bench_docx.json
+"""
+
+import argparse
+import io
+import json
+import statistics
+import time
+from typing import Dict, List, Any, Tuple
+
+from docx import Document
+
+from report_generator import report_generator
+
+COUNTRY = 'Sudan'
+DATE_RANGE = {'start_date': '2024-01-01', 'end_date': '2024-06-30'}
+
+
+def synthetic_report(events: int) -> Dict[str, Any]:
+    """Report data with the given number of key events and proportional trends and risks"""
+    return {
+        "summary": "Humanitarian conditions deteriorated across the reporting period. " * 20,
+        "key_events": [f"Event {i}: clashes reported near town {i % 40}, displacing "
+                       f"{(i * 137) % 5000} people & disrupting aid <convoys>." for i in range(events)],
+        "trends": [f"Trend {i}: food prices rose {i % 30}% month on month." for i in range(max(events // 4, 1))],
+        "risks": [f"Risk {i}: escalation along supply route {i % 12}." for i in range(max(events // 4, 1))],
+        "sources": ["ACLED", "GDELT", "ReliefWeb", "World Bank Open Data"],
+    }
+
+
+def paragraphs(document: bytes) -> List[Tuple[str, str, Any]]:
+    """(style, text, alignment) of every paragraph except the generation timestamp"""
+    doc = Document(io.BytesIO(document))
+    return [(p.style.name, p.text, p.alignment) for p in doc.paragraphs
+            if not p.text.startswith('Generated on:')]
+
+
+def run_variant(render, report_data: Dict[str, Any], repeats: int) -> Tuple[float, bytes]:
+    """Median wall time and the last document of repeats renders"""
+    timings, document = [], b''
+    for _ in range(repeats):
+        start = time.perf_counter()
+        document = render(report_data, COUNTRY, DATE_RANGE)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), document
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, nargs='+', default=[10, 200, 1000],
+                        help='Key events per synthetic report (one report per value)')
+    parser.add_argument('--repeats', type=int, default=5, help='Timing repetitions per variant')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    # Warm up both paths so one-time imports and template loading are not timed
+    warmup = synthetic_report(1)
+    report_generator.generate_docx(warmup, COUNTRY, DATE_RANGE)
+    report_generator.generate_docx_object_model(warmup, COUNTRY, DATE_RANGE)
+
+    results = []
+    for events in args.events:
+        report_data = synthetic_report(events)
+        template_seconds, template_doc = run_variant(report_generator.generate_docx, report_data, args.repeats)
+        object_seconds, object_doc = run_variant(report_generator.generate_docx_object_model,
+                                                 report_data, args.repeats)
+        result = {
+            "events": events,
+            "paragraphs": len(paragraphs(template_doc)),
+            "object_model_seconds": object_seconds,
+            "template_seconds": template_seconds,
+            "speedup": object_seconds / template_seconds if template_seconds else 0.0,
+            "object_model_bytes": len(object_doc),
+            "template_bytes": len(template_doc),
+            "identical_content": paragraphs(template_doc) == paragraphs(object_doc),
+        }
+        results.append(result)
+        print(f"{events:>6} events: object model {object_seconds * 1000:.1f} ms, "
+              f"template {template_seconds * 1000:.1f} ms ({result['speedup']:.2f}x), "
+              f"{result['paragraphs']:,} paragraphs, identical content: {result['identical_content']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"country": COUNTRY, "repeats": args.repeats, "results": results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
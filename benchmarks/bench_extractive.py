@@ -0,0 +1,115 @@
+"""
+Benchmark: extractive pre-summarization vs retrieval-only context
+Compares context size and LLM prefill time for the RAG path with and without
+the extractive stage (EXTRACTIVE_SUMMARY).
+
+    python -m benchmarks.bench_extractive --country Sudan --start 2024-01-01 --end 2024-06-30 \
+        --save-sources sudan_sources.json
+    python -m benchmarks.bench_extractive --sources sudan_sources.json --output bench_extractive.json
+"""
+
+import argparse
+import json
+import statistics
+import time
+from typing import Dict, Any
+
+from country_registry import country_registry
+from llama_service import LlamaService
+from extractive_summarizer import estimate_tokens
+
+
+def time_prefill(service: LlamaService, country: str, context: str, repeats: int) -> Dict[str, Any]:
+    """Median time of generating a single token (prefill of the user context dominates)"""
+    backend = service.backend
+    messages = [
+        {"role": "system", "content": service.base_prompt},
+        {"role": "user", "content": f"\nRelevant data about {country}: {context}"}
+    ]
+    prompt_tokens = backend.encode_chat(messages, add_generation_prompt=True).shape[1]
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        backend.generate(messages, max_new_tokens=1)
+        timings.append(time.perf_counter() - start)
+    return {"prompt_tokens": prompt_tokens, "prefill_seconds": statistics.median(timings)}
+
+
+def run_variant(service: LlamaService, country: str, sources: Dict[str, str], condense: bool,
+                budget: int, repeats: int, measure_prefill: bool) -> Dict[str, Any]:
+    result = {"variant": "extractive+retrieval" if condense else "retrieval-only"}
+    start = time.perf_counter()
+    if condense:
+        sources = service.condense_sources(sources, token_budget=budget)
+    result["condense_seconds"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    context = service.retrieve_context(country, sources)
+    result["retrieval_seconds"] = time.perf_counter() - start
+    result["input_chars"] = sum(len(text) for text in sources.values())
+    result["context_chars"] = len(context)
+    result["context_tokens_estimate"] = estimate_tokens(context)
+
+    if measure_prefill:
+        result.update(time_prefill(service, country, context, repeats))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sources', help='JSON file mapping source name to collected text')
+    parser.add_argument('--country', help='Country name (used for live collection and prompts)')
+    parser.add_argument('--start', help='Start date YYYY-MM-DD for live collection')
+    parser.add_argument('--end', help='End date YYYY-MM-DD for live collection')
+    parser.add_argument('--save-sources', help='Write the collected sources to this JSON file')
+    parser.add_argument('--budget', type=int, default=1500, help='Extractive token budget per source')
+    parser.add_argument('--repeats', type=int, default=3, help='Prefill timing repetitions')
+    parser.add_argument('--no-prefill', action='store_true', help='Only measure context sizes (no model load)')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    service = LlamaService()
+    if args.sources:
+        with open(args.sources) as f:
+            payload = json.load(f)
+        country, sources = payload["country"], payload["sources"]
+    else:
+        if not (args.country and args.start and args.end):
+            parser.error('either --sources or --country/--start/--end is required')
+        country = args.country
+        country_code = country_registry.lookup(country)['alpha_3']
+        sources = service.collect_sources(country, country_code, args.start, args.end)
+        if args.save_sources:
+            with open(args.save_sources, 'w') as f:
+                json.dump({"country": country, "sources": sources}, f)
+
+    measure_prefill = not args.no_prefill
+    if measure_prefill and service.backend.name != 'transformers':
+        parser.error('prefill timing needs LLM_BACKEND=transformers (or pass --no-prefill)')
+    if measure_prefill:
+        service.initialize_model()
+
+    results = [
+        run_variant(service, country, sources, condense, args.budget, args.repeats, measure_prefill)
+        for condense in (False, True)
+    ]
+
+    for result in results:
+        line = (f"{result['variant']:>22}: input {result['input_chars']:>9,} chars, "
+                f"context {result['context_chars']:>7,} chars (~{result['context_tokens_estimate']:,} tokens), "
+                f"condense {result['condense_seconds']:.2f}s, retrieval {result['retrieval_seconds']:.2f}s")
+        if measure_prefill:
+            line += f", prompt {result['prompt_tokens']:,} tokens, prefill {result['prefill_seconds']:.2f}s"
+        print(line)
+    if measure_prefill:
+        baseline, extractive = results
+        saved = baseline['prefill_seconds'] - extractive['prefill_seconds']
+        print(f"Prefill time saved: {saved:.2f}s ({saved / baseline['prefill_seconds']:.0%})")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"country": country, "budget": args.budget, "results": results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""
+Benchmark: report rendering throughput and memory
+Renders synthetic report_data of increasing size (summary length, events, trends,
+risks and chart points) as PDF and DOCX, and records the median render time, the
+peak Python memory (tracemalloc) and the output size per format. Runs offline,
+without Streamlit or the LLM; results can be compared against an earlier run.
+
+    python -m benchmarks.bench_rendering --output bench_rendering.json
+    python -m benchmarks.bench_rendering --compare bench_rendering.json
+"""
+
+import argparse
+import json
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Dict, List, Any
+
+import chart_renderer
+from artifact_store import artifact_store
+from report_generator import RENDERER_VERSION, report_generator
+
+COUNTRY = 'Sudan'
+DATE_RANGE = {'start_date': '2024-01-01', 'end_date': '2024-12-31'}
+FORMATS = ('pdf', 'docx')
+
+# name -> (summary sentences, key events, trends, risks, chart points)
+SCALES = {
+    'small': (5, 5, 3, 3, 6),
+    'medium': (40, 50, 15, 15, 12),
+    'large': (200, 300, 60, 60, 36),
+    'xlarge': (800, 1500, 250, 250, 120),
+}
+
+
+def synthetic_report(summary_sentences: int, events: int, trends: int, risks: int,
+                     chart_points: int) -> Dict[str, Any]:
+    """Report data shaped like LlamaService output, with the given section sizes"""
+    return {
+        "summary": " ".join(f"Sentence {i}: humanitarian access in region {i % 17} remained constrained "
+                            f"while displacement rose & aid <convoys> were delayed." for i in range(summary_sentences)),
+        "key_events": [f"Event {i}: clashes reported near town {i % 40}, displacing {(i * 137) % 5000} people."
+                       for i in range(events)],
+        "trends": [f"Trend {i}: food prices rose {i % 30}% month on month." for i in range(trends)],
+        "risks": [f"Risk {i}: escalation along supply route {i % 12}." for i in range(risks)],
+        "chart_data": [{"name": f"M{i + 1}", "value": (i * 37) % 100} for i in range(chart_points)],
+        "sources": ["ACLED", "GDELT", "ReliefWeb", "World Bank Open Data"],
+    }
+
+
+def render(report_data: Dict[str, Any], format: str) -> bytes:
+    if format == 'pdf':
+        return report_generator.generate_pdf(report_data, COUNTRY, DATE_RANGE)
+    return report_generator.generate_docx(report_data, COUNTRY, DATE_RANGE)
+
+
+def forget_charts(warm_charts: bool) -> None:
+    """Drop memoized and stored chart images so every run draws its charts"""
+    if warm_charts:
+        return
+    with chart_renderer._chart_lock:
+        chart_renderer._chart_cache.clear()
+    shutil.rmtree(artifact_store.directory, ignore_errors=True)
+
+
+def measure(report_data: Dict[str, Any], format: str, repeats: int, warm_charts: bool) -> Dict[str, Any]:
+    """Median render time over repeats, then peak traced memory of one more render"""
+    timings, document = [], b''
+    for _ in range(repeats):
+        forget_charts(warm_charts)
+        start = time.perf_counter()
+        document = render(report_data, format)
+        timings.append(time.perf_counter() - start)
+
+    # Traced separately: tracemalloc slows allocation-heavy code down noticeably
+    forget_charts(warm_charts)
+    tracemalloc.start()
+    try:
+        render(report_data, format)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    seconds = statistics.median(timings)
+    return {
+        "seconds": seconds,
+        "min_seconds": min(timings),
+        "peak_memory_bytes": peak,
+        "output_bytes": len(document),
+    }
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str) -> None:
+    """Print each case's time and memory relative to an earlier results file"""
+    with open(baseline_path) as f:
+        baseline = {(r['scale'], r['format']): r for r in json.load(f)['results']}
+    print(f"\nCompared with {baseline_path}:")
+    for result in results:
+        before = baseline.get((result['scale'], result['format']))
+        if before is None:
+            continue
+        print(f"{result['scale']:>7} {result['format']:>4}: time {result['seconds'] / before['seconds']:.2f}x, "
+              f"peak memory {result['peak_memory_bytes'] / max(before['peak_memory_bytes'], 1):.2f}x, "
+              f"size {result['output_bytes'] / max(before['output_bytes'], 1):.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', nargs='+', choices=list(SCALES), default=list(SCALES),
+                        help='Report sizes to render')
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=list(FORMATS), help='Formats to render')
+    parser.add_argument('--repeats', type=int, default=3, help='Timing repetitions per case')
+    parser.add_argument('--warm-charts', action='store_true',
+                        help='Reuse chart images between runs instead of drawing them every time')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--compare', help='Earlier --output file to compare the results against')
+    args = parser.parse_args()
+
+    # Keep the benchmark's chart images out of the real artifact store
+    artifact_store.directory = tempfile.mkdtemp(prefix='bench_rendering_')
+    try:
+        # Warm up: font loading and matplotlib/reportlab imports are not timed
+        warmup = synthetic_report(*SCALES['small'])
+        for format in args.formats:
+            render(warmup, format)
+
+        results = []
+        for scale in args.scales:
+            summary_sentences, events, trends, risks, chart_points = SCALES[scale]
+            report_data = synthetic_report(*SCALES[scale])
+            for format in args.formats:
+                result = {"scale": scale, "format": format, "summary_sentences": summary_sentences,
+                          "events": events, "trends": trends, "risks": risks, "chart_points": chart_points,
+                          **measure(report_data, format, args.repeats, args.warm_charts)}
+                results.append(result)
+                print(f"{scale:>7} {format:>4}: {result['seconds'] * 1000:8.1f} ms, "
+                      f"peak {result['peak_memory_bytes'] / 1024 / 1024:6.1f} MB, "
+                      f"output {result['output_bytes'] / 1024:8.1f} KB")
+    finally:
+        shutil.rmtree(artifact_store.directory, ignore_errors=True)
+
+    if args.compare:
+        compare(results, args.compare)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"created_at": datetime.now().isoformat(), "renderer_version": RENDERER_VERSION,
+                       "python": platform.python_version(), "repeats": args.repeats,
+                       "warm_charts": args.warm_charts, "results": results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark: speculative (assisted) decoding with a draft model
+Measures decode throughput of the report prompt with and without LLM_DRAFT_MODEL
+and checks that both produce the same text.
+
+    python -m benchmarks.bench_speculative --draft meta-llama/Llama-3.2-1B-Instruct \
+        --sources sudan_sources.json --output bench_speculative.json
+"""
+
+import argparse
+import json
+import statistics
+import time
+from typing import Dict, List, Any
+
+import torch
+
+from llama_service import LlamaService
+
+
+def build_messages(service: LlamaService, country: str, sources: Dict[str, str], max_context_chars: int) -> List[Dict[str, str]]:
+    """Report prompt over the raw collected sources, truncated to max_context_chars"""
+    context = "\n\n".join(f"{name}: {text}" for name, text in sources.items() if text)
+    return [
+        {"role": "system", "content": service.base_prompt},
+        {"role": "user", "content": f"\nRelevant data about {country}: {context[:max_context_chars]}"}
+    ]
+
+
+def run_variant(service: LlamaService, messages: List[Dict[str, str]], draft_model,
+                max_new_tokens: int, repeats: int) -> Dict[str, Any]:
+    """Median wall time and tokens/sec of one full generation"""
+    backend = service.backend
+    backend.draft_model = draft_model
+    timings, text, new_tokens = [], '', 0
+    for _ in range(repeats):
+        kwargs = backend._generate_kwargs(messages, max_new_tokens, None)
+        # Assisted decoding cannot start from the prefilled system prefix, so the baseline
+        # prefills the full prompt too; otherwise the comparison would favour the baseline
+        kwargs["past_key_values"] = None
+        prompt_len = kwargs["input_ids"].shape[1]
+        start = time.perf_counter()
+        with torch.no_grad():
+            output_ids = backend.model.generate(**kwargs)
+        timings.append(time.perf_counter() - start)
+        new_tokens = output_ids.shape[1] - prompt_len
+        text = backend.tokenizer.decode(output_ids[0, prompt_len:], skip_special_tokens=True)
+    seconds = statistics.median(timings)
+    return {
+        "variant": "assisted" if draft_model is not None else "baseline",
+        "prompt_tokens": prompt_len,
+        "new_tokens": new_tokens,
+        "seconds": seconds,
+        "tokens_per_second": new_tokens / seconds if seconds else 0.0,
+        "text": text,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--draft', help='Draft model name (defaults to LLM_DRAFT_MODEL)')
+    parser.add_argument('--sources', help='JSON file from bench_extractive --save-sources')
+    parser.add_argument('--country', default='Sudan', help='Country name used in the prompt without --sources')
+    parser.add_argument('--max-context-chars', type=int, default=8000, help='Truncate the source context to this length')
+    parser.add_argument('--max-new-tokens', type=int, default=512, help='Tokens to generate per run')
+    parser.add_argument('--repeats', type=int, default=3, help='Timing repetitions per variant')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    service = LlamaService()
+    if service.backend.name != 'transformers':
+        parser.error('speculative decoding needs LLM_BACKEND=transformers')
+    draft_name = args.draft or service.backend.draft_model_name
+    if not draft_name:
+        parser.error('pass --draft or set LLM_DRAFT_MODEL')
+
+    if args.sources:
+        with open(args.sources) as f:
+            payload = json.load(f)
+        country, sources = payload["country"], payload["sources"]
+    else:
+        country, sources = args.country, {"Notes": f"No collected data; write a general overview of {args.country}."}
+
+    service.initialize_model()
+    backend = service.backend
+    if backend.draft_model is None:
+        backend.load_draft_model(draft_name)
+    draft_model = backend.draft_model
+    messages = build_messages(service, country, sources, args.max_context_chars)
+
+    # Warm up both paths so one-time CUDA/kernel setup is not timed
+    for model in (None, draft_model):
+        backend.draft_model = model
+        backend.model.generate(**{**backend._generate_kwargs(messages, 8, None), "past_key_values": None})
+
+    results = [run_variant(service, messages, model, args.max_new_tokens, args.repeats)
+               for model in (None, draft_model)]
+    baseline, assisted = results
+    identical = baseline["text"] == assisted["text"]
+
+    for result in results:
+        print(f"{result['variant']:>9}: {result['new_tokens']:,} tokens in {result['seconds']:.2f}s "
+              f"({result['tokens_per_second']:.1f} tokens/s), prompt {result['prompt_tokens']:,} tokens")
+    print(f"Speedup: {baseline['seconds'] / assisted['seconds']:.2f}x, identical output: {identical}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"country": country, "draft_model": draft_name, "identical_output": identical,
+                       "results": results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Bulk Export for NGO Data Helpers
+Writes saved reports (JSON plus PDF/DOCX) into one ZIP archive, streamed to disk
+"""
+
+import json
+import os
+import shutil
+import time
+import uuid
+import zipfile
+from datetime import datetime
+from typing import Dict, List, Any, Iterable, Optional
+
+from config import get_config
+from report_generator import report_filename
+
+EXPORT_FORMATS = ('json', 'pdf', 'docx')
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def archive_names(reports: List[Dict[str, Any]], format: str) -> List[str]:
+    """File name of each report inside the archive, made unique with a numeric suffix"""
+    names, seen = [], {}
+    for report in reports:
+        name = report_filename(report['country']['name'], report['date_range'], format)
+        count = seen[name] = seen.get(name, 0) + 1
+        if count > 1:
+            stem, extension = os.path.splitext(name)
+            name = f"{stem}_{count}{extension}"
+        names.append(name)
+    return names
+
+
+def write_zip(reports: List[Dict[str, Any]], destination: str,
+              formats: Iterable[str] = EXPORT_FORMATS, render_service=None) -> Dict[str, Any]:
+    """
+    Export saved reports as a ZIP archive
+
+    Every PDF/DOCX is queued on the render service first, so documents render in
+    parallel (or come straight from the artifact store), and each is copied into the
+    archive in chunks as it becomes ready. Neither the archive nor more than one
+    chunk of a document is held in memory. The archive is written to
+    '<destination>.part' and renamed into place once complete.
+
+    Args:
+        reports: Saved reports ('country', 'date_range', 'report_data', 'title', 'created_at')
+        destination: Path of the ZIP file to create
+        formats: Subset of EXPORT_FORMATS to include for each report
+        render_service: RenderService to use (defaults to the shared one)
+
+    Returns:
+        Dict with 'path', 'reports', 'files' and 'bytes' of the archive
+    """
+    if render_service is None:
+        from render_service import render_service
+
+    formats = [format for format in EXPORT_FORMATS if format in formats]
+    # Queue every document before writing anything so they all render concurrently
+    pending = {
+        format: [render_service.submit_file(report['report_data'], report['country']['name'],
+                                            report['date_range'], format) for report in reports]
+        for format in formats if format != 'json'
+    }
+
+    names = {format: archive_names(reports, format) for format in formats}
+
+    os.makedirs(os.path.dirname(os.path.abspath(destination)), exist_ok=True)
+    part_path = f"{destination}.part"
+    files = 0
+    try:
+        with zipfile.ZipFile(part_path, 'w') as archive:
+            for format in formats:
+                for index, report in enumerate(reports):
+                    if format == 'json':
+                        payload = {"country": report['country'], "date_range": report['date_range'],
+                                   "created_at": report.get('created_at'), **report['report_data']}
+                        archive.writestr(names[format][index], json.dumps(payload, indent=2, ensure_ascii=False),
+                                         compress_type=zipfile.ZIP_DEFLATED)
+                    else:
+                        # PDF and DOCX are already compressed; store them as-is
+                        path = pending[format][index].result()
+                        with open(path, 'rb') as source, archive.open(names[format][index], 'w') as target:
+                            shutil.copyfileobj(source, target, COPY_CHUNK_SIZE)
+                    files += 1
+            manifest = [{
+                "title": report.get('title'),
+                "country": report['country'],
+                "date_range": report['date_range'],
+                "created_at": report.get('created_at'),
+                "files": [names[format][index] for format in formats],
+            } for index, report in enumerate(reports)]
+            archive.writestr('manifest.json', json.dumps({"exported_at": datetime.now().isoformat(),
+                                                          "reports": manifest}, indent=2, ensure_ascii=False),
+                             compress_type=zipfile.ZIP_DEFLATED)
+        os.replace(part_path, destination)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    return {"path": destination, "reports": len(reports), "files": files,
+            "bytes": os.path.getsize(destination)}
+
+
+def prune_exports(directory: str, max_age_seconds: float) -> int:
+    """
+    Delete archives (and abandoned .part files) older than max_age_seconds
+
+    Returns:
+        Number of files deleted
+    """
+    cutoff = time.time() - max_age_seconds
+    deleted = 0
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        if not entry.name.endswith(('.zip', '.zip.part')):
+            continue
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                deleted += 1
+        except FileNotFoundError:
+            pass
+    return deleted
+
+
+def export_path(directory: Optional[str] = None) -> str:
+    """
+    New, unique archive path under REPORTS_DIRECTORY/exports
+
+    Archives older than EXPORT_RETENTION_HOURS are deleted on the way.
+    """
+    config = get_config()
+    directory = directory or os.path.join(config['REPORTS_DIRECTORY'], 'exports')
+    prune_exports(directory, config['EXPORT_RETENTION_HOURS'] * 3600)
+    # The random suffix keeps sessions exporting in the same second from sharing a file
+    return os.path.join(directory, f"NGO_Reports_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}.zip")
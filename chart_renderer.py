@@ -0,0 +1,104 @@
+"""
+Chart Renderer for NGO Data Helpers
+Renders a report's chart_data as PNG images for the PDF and DOCX exports
+"""
+
+import hashlib
+import io
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Any
+
+from matplotlib.figure import Figure
+
+# The charts of the preview page: (kind, title)
+CHARTS = (
+    ('line', 'Monthly Trends'),
+    ('bar', 'Monthly Comparison'),
+)
+
+CHART_SIZE_INCHES = (6.5, 3.0)
+CHART_DPI = 150
+CHART_COLOR = '#1f4e9c'
+
+# Chart sets kept in memory, most recently used last
+CHART_CACHE_SIZE = 64
+
+_chart_cache: "OrderedDict[str, Dict[str, bytes]]" = OrderedDict()
+_chart_lock = threading.Lock()
+
+
+def chart_fingerprint(chart_data: List[Dict[str, Any]]) -> str:
+    """Hash of the chart data; equal data renders to the same images"""
+    key = json.dumps(['charts', CHART_SIZE_INCHES, CHART_DPI, chart_data], sort_keys=True, default=str)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def _render_chart(chart_data: List[Dict[str, Any]], kind: str, title: str) -> bytes:
+    """Draw one chart with matplotlib's Agg raster backend (no display or browser needed)"""
+    names = [str(point.get('name', '')) for point in chart_data]
+    values = [point.get('value', 0) for point in chart_data]
+
+    # Figure without pyplot: no global state, safe to use from several threads
+    figure = Figure(figsize=CHART_SIZE_INCHES, dpi=CHART_DPI)
+    axes = figure.subplots()
+    if kind == 'line':
+        axes.plot(names, values, marker='o', color=CHART_COLOR)
+    else:
+        axes.bar(names, values, color=CHART_COLOR)
+    axes.set_title(title)
+    if len(names) > 12:
+        axes.tick_params(axis='x', labelrotation=45, labelsize=7)
+    axes.grid(axis='y', alpha=0.3)
+    axes.spines[['top', 'right']].set_visible(False)
+    figure.tight_layout()
+
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format='png')
+    return buffer.getvalue()
+
+
+def render_charts(chart_data: List[Dict[str, Any]]) -> Dict[str, bytes]:
+    """
+    PNG images of a report's charts, rendered once per distinct chart_data
+
+    Images are memoized in memory and persisted in the artifact store, so repeated
+    downloads (and the render worker processes) reuse them instead of drawing again.
+
+    Args:
+        chart_data: List of {'name': label, 'value': number} points
+
+    Returns:
+        {kind: PNG bytes} for each chart in CHARTS, or {} if there is no data
+    """
+    if not chart_data:
+        return {}
+    fingerprint = chart_fingerprint(chart_data)
+    with _chart_lock:
+        if fingerprint in _chart_cache:
+            _chart_cache.move_to_end(fingerprint)
+            return _chart_cache[fingerprint]
+
+    # Imported here: artifact_store imports report_generator, which imports this module
+    from artifact_store import artifact_store
+
+    images = {}
+    for kind, title in CHARTS:
+        format = f"{kind}.png"
+        stored = artifact_store.open(fingerprint, format)
+        if stored is not None:
+            with stored:
+                images[kind] = stored.read()
+            continue
+        images[kind] = _render_chart(chart_data, kind, title)
+        try:
+            artifact_store.put(fingerprint, format, images[kind])
+        except (ValueError, OSError) as e:
+            print(f"Error storing chart image: {e}")
+
+    with _chart_lock:
+        _chart_cache[fingerprint] = images
+        while len(_chart_cache) > CHART_CACHE_SIZE:
+            _chart_cache.popitem(last=False)
+    return images
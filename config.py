@@ -22,7 +22,16 @@ def get_config() -> Dict[str, Any]:
         'BACKEND_API_URL': os.getenv('BACKEND_API_URL', 'http://localhost:8000'),
         'API_TIMEOUT': int(os.getenv('API_TIMEOUT', '120')),  # seconds
         'POLL_INTERVAL': int(os.getenv('POLL_INTERVAL', '2')),  # seconds
+        'COUNTRY_LIST_TTL_SECONDS': int(os.getenv('COUNTRY_LIST_TTL_SECONDS', '86400')),  # reload of the country list
         'USE_MOCK_DATA': os.getenv('USE_MOCK_DATA', 'true').lower() == 'true',
+        'REPORT_MAX_WAIT_SECONDS': int(os.getenv('REPORT_MAX_WAIT_SECONDS', '900')),  # client wait for a queued report
+        
+        # Backend Server (backend_server.py)
+        'BACKEND_HOST': os.getenv('BACKEND_HOST', '127.0.0.1'),
+        'BACKEND_PORT': int(os.getenv('BACKEND_PORT', '8000')),
+        'BACKEND_WORKERS': int(os.getenv('BACKEND_WORKERS', '1')),  # processes, each with its own model copy
+        'BACKEND_JOB_TTL_SECONDS': int(os.getenv('BACKEND_JOB_TTL_SECONDS', '86400')),  # keep finished jobs
+        'STATUS_LONG_POLL_SECONDS': int(os.getenv('STATUS_LONG_POLL_SECONDS', '25')),  # max hold of a status request
         
         # API Keys (for backend team to implement)
         'ACLED_API_KEY': os.getenv('ACLED_API_KEY', ''),
@@ -31,8 +40,34 @@ def get_config() -> Dict[str, Any]:
         'WORLDBANK_API_KEY': os.getenv('WORLDBANK_API_KEY', ''),
         
         # LLM Configuration
+        'LLM_BACKEND': os.getenv('LLM_BACKEND', 'transformers'),  # 'transformers' or 'ollama'
+        'LLM_MODEL_NAME': os.getenv('LLM_MODEL_NAME', 'meta-llama/Llama-3.2-3B-Instruct'),
+        'LLM_DRAFT_MODEL': os.getenv('LLM_DRAFT_MODEL', ''),  # e.g. meta-llama/Llama-3.2-1B-Instruct; empty disables
+        'LLM_CONTINUOUS_BATCHING': os.getenv('LLM_CONTINUOUS_BATCHING', 'false').lower() == 'true',
+        'LLM_MAX_BATCH_SIZE': int(os.getenv('LLM_MAX_BATCH_SIZE', '8')),  # concurrent sequences per decode step
         'OLLAMA_BASE_URL': os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434'),
         'OLLAMA_MODEL': os.getenv('OLLAMA_MODEL', 'llama2'),
+        'OLLAMA_CONNECT_TIMEOUT': float(os.getenv('OLLAMA_CONNECT_TIMEOUT', '5')),  # seconds
+        'OLLAMA_READ_TIMEOUT': float(os.getenv('OLLAMA_READ_TIMEOUT', '300')),  # seconds between streamed chunks
+        'OLLAMA_MAX_PARALLEL': int(os.getenv('OLLAMA_MAX_PARALLEL', '4')),  # concurrent requests per batch
+        
+        # Report Generation
+        'REPORT_MODE': os.getenv('REPORT_MODE', 'rag'),  # 'rag' (single pass) or 'map_reduce'
+        'MAP_CHUNK_SIZE': int(os.getenv('MAP_CHUNK_SIZE', '6000')),  # characters per map-step excerpt
+        'MAP_BATCH_SIZE': int(os.getenv('MAP_BATCH_SIZE', '4')),  # excerpts per batched generate call
+        'MAP_MAX_NEW_TOKENS': int(os.getenv('MAP_MAX_NEW_TOKENS', '300')),
+        'REDUCE_MAX_CHARS': int(os.getenv('REDUCE_MAX_CHARS', '12000')),  # partial summaries per final call
+        'EXTRACTIVE_SUMMARY': os.getenv('EXTRACTIVE_SUMMARY', 'false').lower() == 'true',
+        'EXTRACTIVE_TOKEN_BUDGET': int(os.getenv('EXTRACTIVE_TOKEN_BUDGET', '1500')),  # tokens kept per source
+        'REPORT_DEADLINE_SECONDS': float(os.getenv('REPORT_DEADLINE_SECONDS', '600')),  # 0 disables the limit
+        # embed every sentence for ranking (on top of the retrieval embeddings); TF-IDF otherwise
+        'EXTRACTIVE_USE_EMBEDDINGS': os.getenv('EXTRACTIVE_USE_EMBEDDINGS', 'false').lower() == 'true',
+        
+        # Report Pre-generation (pregeneration.py)
+        'PREGENERATE_COUNTRIES': os.getenv('PREGENERATE_COUNTRIES', ''),  # comma-separated names or ISO codes
+        'PREGENERATE_WINDOWS': os.getenv('PREGENERATE_WINDOWS', '30:12,90:48'),  # days:max age hours
+        'PREGENERATE_HOURS': os.getenv('PREGENERATE_HOURS', '1-5'),  # off-peak local hours, inclusive
+        'PREGENERATE_CHECK_MINUTES': int(os.getenv('PREGENERATE_CHECK_MINUTES', '15')),
         
         # Database Configuration
         'CHROMA_PERSIST_DIRECTORY': os.getenv('CHROMA_PERSIST_DIRECTORY', './chroma_db'),
@@ -45,10 +80,21 @@ def get_config() -> Dict[str, Any]:
         # File Storage
         'REPORTS_DIRECTORY': os.getenv('REPORTS_DIRECTORY', './reports'),
         'MAX_REPORT_SIZE_MB': int(os.getenv('MAX_REPORT_SIZE_MB', '50')),
+        'REPORT_HISTORY_DB': os.getenv('REPORT_HISTORY_DB', ''),  # SQLite file, empty = REPORTS_DIRECTORY/history.sqlite3
+        'REPORT_HISTORY_PAGE_SIZE': int(os.getenv('REPORT_HISTORY_PAGE_SIZE', '10')),  # reports per history page
+        'ARTIFACT_STORE_MAX_MB': int(os.getenv('ARTIFACT_STORE_MAX_MB', '1024')),  # rendered documents kept on disk
+        'EXPORT_RETENTION_HOURS': float(os.getenv('EXPORT_RETENTION_HOURS', '24')),  # bulk export ZIPs kept on disk
+        'DOWNLOAD_RETRIES': int(os.getenv('DOWNLOAD_RETRIES', '3')),  # resumed attempts per report download
+        'RENDER_WORKERS': int(os.getenv('RENDER_WORKERS', '2')),  # processes rendering PDF/DOCX, 0 renders in-process
+        'DOCX_TEMPLATE': os.getenv('DOCX_TEMPLATE', ''),  # styled base document for DOCX reports, empty = default
         
         # Rate Limiting
         'RATE_LIMIT_REQUESTS_PER_MINUTE': int(os.getenv('RATE_LIMIT_REQUESTS_PER_MINUTE', '60')),
         'RATE_LIMIT_REPORTS_PER_HOUR': int(os.getenv('RATE_LIMIT_REPORTS_PER_HOUR', '10')),
+        # reports generated at once per process; 0 = LLM_MAX_BATCH_SIZE with continuous batching, else 1
+        'MAX_CONCURRENT_REPORTS': int(os.getenv('MAX_CONCURRENT_REPORTS', '0')),
+        'REPORT_QUEUE_SIZE': int(os.getenv('REPORT_QUEUE_SIZE', '20')),  # waiting reports before new ones are rejected
+        'REPORT_ESTIMATED_SECONDS': float(os.getenv('REPORT_ESTIMATED_SECONDS', '120')),  # initial wait estimate per report
     }
 
 def get_api_config() -> Dict[str, str]:
@@ -75,8 +121,13 @@ def get_llm_config() -> Dict[str, str]:
     """
     config = get_config()
     return {
+        'llm_backend': config['LLM_BACKEND'],
+        'llm_model_name': config['LLM_MODEL_NAME'],
+        'llm_draft_model': config['LLM_DRAFT_MODEL'],
         'ollama_base_url': config['OLLAMA_BASE_URL'],
         'ollama_model': config['OLLAMA_MODEL'],
+        'ollama_connect_timeout': str(config['OLLAMA_CONNECT_TIMEOUT']),
+        'ollama_read_timeout': str(config['OLLAMA_READ_TIMEOUT']),
         'chroma_persist_directory': config['CHROMA_PERSIST_DIRECTORY'],
     }
 
@@ -0,0 +1,152 @@
+"""
+Country Registry for NGO Data Helpers
+Country list loaded once per process, with constant-time lookup by name, ISO code
+and the spellings used by each data source
+"""
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Any
+
+import pycountry
+
+from config import get_config
+
+# Country names as the data sources spell them, where they differ from ISO 3166, by ISO2 code
+SOURCE_ALIASES = {
+    'acled': {
+        'BN': 'Brunei', 'BO': 'Bolivia', 'CD': 'Democratic Republic of Congo', 'CG': 'Republic of Congo',
+        'CI': 'Ivory Coast', 'CV': 'Cape Verde', 'CZ': 'Czech Republic', 'FM': 'Micronesia', 'IR': 'Iran',
+        'KP': 'North Korea', 'KR': 'South Korea', 'LA': 'Laos', 'MD': 'Moldova', 'PS': 'Palestine',
+        'RU': 'Russia', 'SY': 'Syria', 'SZ': 'eSwatini', 'TR': 'Turkey', 'TW': 'Taiwan', 'TZ': 'Tanzania',
+        'VE': 'Venezuela', 'VN': 'Vietnam',
+    },
+    'reliefweb': {
+        'BO': 'Bolivia (Plurinational State of)', 'CD': 'Democratic Republic of the Congo', 'CG': 'Congo',
+        'CI': "Côte d'Ivoire", 'FM': 'Micronesia (Federated States of)', 'IR': 'Iran (Islamic Republic of)',
+        'KP': "Democratic People's Republic of Korea", 'KR': 'Republic of Korea',
+        'LA': "Lao People's Democratic Republic", 'MD': 'Moldova', 'PS': 'occupied Palestinian territory',
+        'RU': 'Russian Federation', 'SY': 'Syrian Arab Republic', 'TR': 'Türkiye',
+        'TZ': 'United Republic of Tanzania', 'VE': 'Venezuela (Bolivarian Republic of)', 'VN': 'Viet Nam',
+    },
+}
+
+
+def iso_countries() -> List[Dict[str, str]]:
+    """Every ISO 3166 country as {'code': ISO2, 'name': name}"""
+    return [{"code": country.alpha_2, "name": country.name} for country in pycountry.countries]
+
+
+def _key(value: str) -> str:
+    return ' '.join(str(value).split()).casefold()
+
+
+class CountryRegistry:
+    """
+    Country list with a lookup index, loaded once and refreshed after a TTL
+
+    The list comes from loader (ISO 3166 via pycountry by default, or the backend's
+    GET /api/countries in the UI) and is kept for COUNTRY_LIST_TTL_SECONDS. Every
+    country is indexed by its listed name, ISO 3166 names, ISO2 and ISO3 codes and
+    source aliases (case-insensitive), so lookups are a dict access instead of a
+    scan. A reload that fails keeps serving the previous list.
+    """
+
+    def __init__(self, loader: Optional[Callable[[], List[Dict[str, str]]]] = None,
+                 ttl_seconds: Optional[float] = None):
+        self.loader = loader or iso_countries
+        self.ttl_seconds = get_config()['COUNTRY_LIST_TTL_SECONDS'] if ttl_seconds is None else ttl_seconds
+        self._lock = threading.Lock()
+        # (countries, index, loaded at); replaced as a whole so readers need no lock
+        self._snapshot = None
+
+    def _build(self, listed: List[Dict[str, str]]):
+        countries, index = [], {}
+        for entry in listed:
+            iso = pycountry.countries.get(alpha_2=entry['code'].upper())
+            country = {"code": entry['code'].upper(), "name": entry['name'],
+                       "alpha_3": iso.alpha_3 if iso else entry.get('alpha_3', '')}
+            countries.append(country)
+            keys = [country['code'], country['alpha_3'], country['name']]
+            if iso:
+                keys += [iso.name, getattr(iso, 'common_name', ''), getattr(iso, 'official_name', '')]
+            keys += [aliases[country['code']] for aliases in SOURCE_ALIASES.values() if country['code'] in aliases]
+            for key in keys:
+                if key:
+                    # The first country listed under a name wins
+                    index.setdefault(_key(key), country)
+        countries.sort(key=lambda country: country['name'])
+        return countries, index, time.monotonic()
+
+    def _current(self):
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - snapshot[2] < self.ttl_seconds:
+            return snapshot
+        with self._lock:
+            # Another thread may have reloaded while this one waited
+            if self._snapshot is snapshot:
+                try:
+                    self._snapshot = self._build(self.loader())
+                except Exception as e:
+                    print(f"Error loading countries: {e}")
+                    if snapshot is None:
+                        self._snapshot = self._build([])
+                    else:
+                        # Keep the stale list and try again after another TTL
+                        self._snapshot = (snapshot[0], snapshot[1], time.monotonic())
+            return self._snapshot
+
+    def refresh(self) -> None:
+        """Reload the country list on the next access"""
+        with self._lock:
+            self._snapshot = None
+
+    def all(self) -> List[Dict[str, str]]:
+        """
+        Every country, sorted by name
+
+        Returns:
+            List of {'code': ISO2, 'name': name, 'alpha_3': ISO3} dicts (shared; do not modify)
+        """
+        return self._current()[0]
+
+    def get(self, query: str) -> Optional[Dict[str, str]]:
+        """
+        Find a country by name, ISO2/ISO3 code or source alias
+
+        Args:
+            query: Name or code, in any case
+
+        Returns:
+            The country dict, or None if unknown
+        """
+        if not query:
+            return None
+        return self._current()[1].get(_key(query))
+
+    def lookup(self, query: str) -> Dict[str, str]:
+        """Like get(), but raises LookupError for an unknown country"""
+        country = self.get(query)
+        if country is None:
+            raise LookupError(f"Unknown country '{query}'")
+        return country
+
+    def source_name(self, query: str, source: str) -> str:
+        """
+        Name of a country as a data source spells it
+
+        Args:
+            query: Name or code of the country
+            source: 'acled' or 'reliefweb'
+
+        Returns:
+            The source's spelling, the registry name, or query itself if unknown
+        """
+        country = self.get(query)
+        if country is None:
+            return query
+        return SOURCE_ALIASES.get(source, {}).get(country['code'], country['name'])
+
+
+# Global ISO 3166 registry shared by the report service, batch CLI and backend
+country_registry = CountryRegistry()
@@ -0,0 +1,204 @@
+"""
+Extractive Summarizer for NGO Data Helpers
+Selects the most informative sentences of a source under a token budget
+"""
+
+import re
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+|\n+')
+WORD = re.compile(r"[a-z0-9][a-z0-9'-]*")
+
+# Sentences shorter than this are layout fragments rather than content; whole lines
+# this short are fields such as 'Date: ...' and are always kept
+MIN_SENTENCE_CHARS = 25
+
+# TextRank builds an n x n similarity graph; above this many sentences the
+# ranking falls back to centroid (degree) centrality, which is linear in n
+MAX_GRAPH_SENTENCES = 1500
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough Llama token count (about four characters per token for English prose)"""
+    return len(text) // 4 + 1
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into stripped, non-trivial sentences"""
+    sentences = (s.strip() for s in SENTENCE_SPLIT.split(text))
+    return [s for s in sentences if len(s) >= MIN_SENTENCE_CHARS]
+
+
+def split_units(text: str) -> List[Tuple[str, bool]]:
+    """
+    Split text into (unit, pinned) pairs in their original order
+
+    Pinned units are kept whatever their rank: the source's introduction line (its
+    first line when it ends with ':', e.g. '... from ReliefWeb API:'), which the
+    report needs for attribution, and short field lines such as 'Date: 2024-03-01'.
+    Every other line is split into sentences to be ranked.
+    """
+    units = []
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    for i, line in enumerate(lines):
+        if (i == 0 and line.endswith(':')) or len(line) < MIN_SENTENCE_CHARS:
+            units.append((line, True))
+        else:
+            units.extend((sentence, False) for sentence in split_sentences(line))
+    return units
+
+
+def truncate_to_budget(text: str, token_budget: int) -> str:
+    """Cut text to the longest prefix whose estimate_tokens is within token_budget"""
+    return text[:max(token_budget * 4 - 1, 0)]
+
+
+def tfidf_entries(sentences: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+    """
+    Build an L2-normalized TF-IDF matrix in coordinate form
+
+    Args:
+        sentences: Sentences to vectorize
+
+    Returns:
+        (rows, cols, values, vocabulary size) of the non-zero entries
+    """
+    vocabulary = {}
+    rows, cols = [], []
+    for row, sentence in enumerate(sentences):
+        for token in WORD.findall(sentence.lower()):
+            rows.append(row)
+            cols.append(vocabulary.setdefault(token, len(vocabulary)))
+    n_terms = max(len(vocabulary), 1)
+    if not rows:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros(0, dtype=np.float32), n_terms
+
+    # Merge repeated (sentence, term) pairs into term counts
+    keys = np.asarray(rows, dtype=np.int64) * n_terms + np.asarray(cols, dtype=np.int64)
+    keys, counts = np.unique(keys, return_counts=True)
+    rows, cols = keys // n_terms, keys % n_terms
+
+    document_frequency = np.bincount(cols, minlength=n_terms)
+    idf = np.log((1 + len(sentences)) / (1 + document_frequency)) + 1
+    values = (counts * idf[cols]).astype(np.float32)
+    norms = np.sqrt(np.bincount(rows, weights=values ** 2, minlength=len(sentences)))
+    values /= norms[rows].astype(np.float32)
+    return rows, cols, values, n_terms
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Scale every row to unit length, leaving all-zero rows untouched"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def textrank_scores(vectors: np.ndarray, damping: float = 0.85,
+                    max_iterations: int = 100, tolerance: float = 1e-6) -> np.ndarray:
+    """
+    Score sentences with TextRank over their cosine-similarity graph
+
+    Args:
+        vectors: Row-normalized sentence vectors
+        damping: PageRank damping factor
+        max_iterations: Power-iteration limit
+        tolerance: L1 convergence threshold
+
+    Returns:
+        One centrality score per sentence
+    """
+    n = vectors.shape[0]
+    similarity = np.clip(vectors @ vectors.T, 0, None)
+    np.fill_diagonal(similarity, 0)
+    out_weight = similarity.sum(axis=1, keepdims=True)
+    # Isolated sentences link uniformly so the transition matrix stays stochastic
+    transition = np.where(out_weight > 0, similarity / np.where(out_weight > 0, out_weight, 1), 1.0 / n)
+
+    scores = np.full(n, 1.0 / n)
+    for _ in range(max_iterations):
+        updated = (1 - damping) / n + damping * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < tolerance:
+            return updated
+        scores = updated
+    return scores
+
+
+def rank_sentences(sentences: List[str],
+                   embed: Optional[Callable[[List[str]], List[List[float]]]] = None) -> np.ndarray:
+    """
+    Score sentences by centrality
+
+    Args:
+        sentences: Sentences to rank
+        embed: Optional sentence embedding function (e.g. HuggingFaceEmbeddings.embed_documents);
+               TF-IDF vectors are used when it is not given
+
+    Returns:
+        One score per sentence, higher is more informative
+    """
+    n = len(sentences)
+    if embed is not None and n <= MAX_GRAPH_SENTENCES:
+        return textrank_scores(normalize_rows(np.asarray(embed(sentences), dtype=np.float32)))
+
+    rows, cols, values, n_terms = tfidf_entries(sentences)
+    if n <= MAX_GRAPH_SENTENCES:
+        vectors = np.zeros((n, n_terms), dtype=np.float32)
+        vectors[rows, cols] = values
+        return textrank_scores(vectors)
+
+    # Degree centrality: each sentence's total similarity to all others is its
+    # dot product with the sum of all sentence vectors
+    centroid = np.bincount(cols, weights=values, minlength=n_terms)
+    return np.bincount(rows, weights=values * centroid[cols], minlength=n)
+
+
+def select_sentences(text: str, token_budget: int,
+                     embed: Optional[Callable[[List[str]], List[List[float]]]] = None) -> str:
+    """
+    Keep the highest-ranked sentences of text that fit in token_budget
+
+    Args:
+        text: Source text
+        token_budget: Maximum estimated tokens of the returned text
+        embed: Optional sentence embedding function, see rank_sentences
+
+    Returns:
+        Selected sentences in their original order, or text unchanged if it already fits;
+        if no sentence fits, the top-ranked one truncated to the budget. The pinned lines
+        of split_units are always kept and their tokens count against the budget first.
+    """
+    if estimate_tokens(text) <= token_budget:
+        return text
+
+    units = split_units(text)
+    pinned = [i for i, (_, is_pinned) in enumerate(units) if is_pinned]
+    budget = token_budget - sum(estimate_tokens(units[i][0]) for i in pinned)
+    # Exact repeats (syndicated articles) carry no new information
+    candidates = {}
+    for i, (sentence, is_pinned) in enumerate(units):
+        if not is_pinned:
+            candidates.setdefault(sentence, i)
+    if not candidates:
+        if not pinned:
+            return truncate_to_budget(text, token_budget)
+        return "\n".join(units[i][0] for i in pinned)
+    sentences = list(candidates)
+    scores = rank_sentences(sentences, embed)
+
+    selected = []
+    used = 0
+    for index in np.argsort(-scores, kind='stable'):
+        cost = estimate_tokens(sentences[index])
+        if used + cost > budget:
+            continue
+        selected.append(candidates[sentences[index]])
+        used += cost
+    kept = {i: units[i][0] for i in pinned + selected}
+    if not selected and budget > 0:
+        # Every sentence is over budget (e.g. unpunctuated scraped text): keep the best one, cut short
+        best = sentences[int(np.argmax(scores))]
+        kept[candidates[best]] = truncate_to_budget(best, budget)
+    return "\n".join(kept[i] for i in sorted(kept))
@@ -0,0 +1,353 @@
+"""
+Generation Scheduler for NGO Data Helpers
+Continuous batching of concurrent generation requests on one loaded transformers model
+"""
+
+import itertools
+import queue
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, List, Iterator, Optional, Any
+
+import torch
+from transformers import DynamicCache
+
+from llm_backends import LLMBackendError, GenerationLimits
+
+
+def cache_layers(cache) -> List[tuple]:
+    """Return [(keys, values), ...] per layer for any DynamicCache layout"""
+    if hasattr(cache, 'layers'):
+        return [(layer.keys, layer.values) for layer in cache.layers]
+    return list(zip(cache.key_cache, cache.value_cache))
+
+
+def build_cache(layers: List[tuple]) -> DynamicCache:
+    """Create a DynamicCache holding the given per-layer (keys, values)"""
+    cache = DynamicCache()
+    for layer_idx, (keys, values) in enumerate(layers):
+        cache.update(keys, values, layer_idx)
+    return cache
+
+
+def left_pad(tensor: torch.Tensor, length: int, dim: int) -> torch.Tensor:
+    """Zero-pad tensor on the left of dim up to length"""
+    missing = length - tensor.shape[dim]
+    if missing <= 0:
+        return tensor
+    shape = list(tensor.shape)
+    shape[dim] = missing
+    return torch.cat([tensor.new_zeros(shape), tensor], dim=dim)
+
+
+class GenerationRequest:
+    """A queued generation whose text can be streamed or awaited"""
+
+    _ids = itertools.count()
+
+    def __init__(self, messages: List[Dict[str, str]], max_new_tokens: int,
+                 limits: Optional[GenerationLimits], session_id: Any):
+        self.id = next(self._ids)
+        self.messages = messages
+        self.max_new_tokens = max_new_tokens
+        self.limits = limits
+        self.session_id = session_id
+        self.text = ''
+        self.error = None
+        self._chunks = queue.Queue()
+        self._done = threading.Event()
+        self._cancelled = threading.Event()
+
+        # Decoding state, owned by the scheduler thread
+        self.prompt_ids = None
+        self.generated_ids = []
+        self.position = 0
+        # generated_ids[prefix_offset:read_offset] is already emitted context for decoding what follows
+        self.prefix_offset = 0
+        self.read_offset = 0
+
+    def stream(self) -> Iterator[str]:
+        """Yield text fragments as they are decoded; closing the stream early cancels the request"""
+        try:
+            while True:
+                chunk = self._chunks.get()
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            if not self._done.is_set():
+                self.cancel()
+        if self.error is not None:
+            raise self.error
+
+    def cancel(self) -> None:
+        """Stop decoding this request at the next step (its text so far is kept)"""
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def result(self) -> str:
+        """Block until generation finishes and return the full text"""
+        self._done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.text
+
+    def _emit(self, text: str) -> None:
+        self._chunks.put(text)
+        self.text += text
+
+    def _finish(self, error: Optional[Exception] = None) -> None:
+        if self._done.is_set():
+            return
+        self.error = error
+        self._chunks.put(None)
+        self._done.set()
+
+
+class GenerationScheduler:
+    """
+    Runs requests from all sessions as one dynamically batched decode loop
+
+    New requests are prefilled individually (reusing the backend's cached system
+    prefix) and then joined to the running batch, whose KV cache is left-padded to a
+    common length. Every step decodes one token for every active request; finished
+    requests leave the batch immediately, freeing their slot for the next one.
+    Pending requests are admitted round-robin across sessions so one session's
+    burst (e.g. a map-reduce batch) cannot starve others.
+    """
+
+    def __init__(self, backend, max_batch_size: int = 8):
+        self.backend = backend
+        self.model = backend.model
+        self.tokenizer = backend.tokenizer
+        self.max_batch_size = max(max_batch_size, 1)
+        self.repetition_penalty = backend.generation_kwargs.get("repetition_penalty", 1.0)
+        eos = self.model.generation_config.eos_token_id
+        if eos is None:
+            eos = self.tokenizer.eos_token_id
+        self.eos_token_ids = set(eos if isinstance(eos, (list, tuple)) else [eos])
+
+        # session id -> deque of pending requests; order of the dict is the round-robin order
+        self._pending = OrderedDict()
+        self._condition = threading.Condition()
+
+        # Batched decoding state
+        self._active = []
+        self._layers = None
+        self._attention_mask = None
+        self._seen = None
+
+        self.tokens_generated = 0
+        self._thread = threading.Thread(target=self._run, name='generation-scheduler', daemon=True)
+        self._thread.start()
+
+    def submit(self, messages: List[Dict[str, str]], max_new_tokens: int = 1500,
+               limits: Optional[GenerationLimits] = None, session_id: Any = None) -> GenerationRequest:
+        """
+        Queue a generation request
+
+        Args:
+            messages: Chat messages with 'role' and 'content'
+            max_new_tokens: Maximum number of tokens to generate
+            limits: Optional deadline/cancellation checked every decoding step
+            session_id: Fairness key; defaults to the calling thread (one per Streamlit session run)
+
+        Returns:
+            The queued request
+        """
+        if session_id is None:
+            session_id = threading.get_ident()
+        request = GenerationRequest(messages, max_new_tokens, limits, session_id)
+        with self._condition:
+            self._pending.setdefault(session_id, deque()).append(request)
+            self._condition.notify()
+        return request
+
+    def stats(self) -> Dict[str, int]:
+        """Current queue and batch sizes"""
+        with self._condition:
+            pending = sum(len(requests) for requests in self._pending.values())
+        return {"active": len(self._active), "pending": pending, "tokens_generated": self.tokens_generated}
+
+    def _next_pending(self) -> Optional[GenerationRequest]:
+        with self._condition:
+            while not self._active and not self._pending:
+                self._condition.wait()
+            if not self._pending or len(self._active) >= self.max_batch_size:
+                return None
+            session_id, requests = next(iter(self._pending.items()))
+            request = requests.popleft()
+            # Rotate the session to the back of the round-robin order
+            del self._pending[session_id]
+            if requests:
+                self._pending[session_id] = requests
+            return request
+
+    def _run(self) -> None:
+        while True:
+            request = None
+            try:
+                request = self._next_pending()
+                while request is not None:
+                    if request.cancelled:
+                        # Abandoned before it was admitted: never prefill it
+                        request._finish()
+                    else:
+                        self._admit(request)
+                    request = self._next_pending()
+                if self._active:
+                    self._step()
+            except Exception as e:
+                # The batch state may be half-updated: fail everything in it (and the request
+                # being admitted) but keep the thread alive for the requests still pending
+                error = LLMBackendError(f"Batched generation failed: {e}")
+                if request is not None:
+                    request._finish(error)
+                for active in self._active:
+                    active._finish(error)
+                self._reset_batch()
+
+    def _reset_batch(self) -> None:
+        self._active = []
+        self._layers = None
+        self._attention_mask = None
+        self._seen = None
+
+    def _select_token(self, logits: torch.Tensor, seen: torch.Tensor) -> torch.Tensor:
+        """Greedy choice with the same repetition penalty as transformers' generate()"""
+        logits = logits.float()
+        if self.repetition_penalty != 1.0:
+            penalized = torch.where(logits > 0, logits / self.repetition_penalty, logits * self.repetition_penalty)
+            logits = torch.where(seen, penalized, logits)
+        return logits.argmax(dim=-1)
+
+    def _admit(self, request: GenerationRequest) -> None:
+        """Prefill a request on its own, then join it to the running batch"""
+        if request.limits is not None and request.limits.should_stop():
+            request._finish()
+            return
+        try:
+            input_ids = self.backend.encode_chat(request.messages, add_generation_prompt=True)
+            past_key_values = self.backend.get_prefix_cache(request.messages, input_ids)
+            past_len = past_key_values.get_seq_length() if past_key_values is not None else 0
+            if past_key_values is None:
+                past_key_values = DynamicCache()
+            with torch.no_grad():
+                outputs = self.model(
+                    input_ids=input_ids[:, past_len:],
+                    attention_mask=torch.ones_like(input_ids),
+                    past_key_values=past_key_values,
+                    use_cache=True,
+                )
+        except Exception as e:
+            request._finish(LLMBackendError(f"Prefill failed: {e}"))
+            return
+
+        vocab_size = outputs.logits.shape[-1]
+        seen = torch.zeros((1, vocab_size), dtype=torch.bool, device=input_ids.device)
+        seen[0, input_ids[0]] = True
+        request.prompt_ids = input_ids
+        request.position = input_ids.shape[1]
+        layers = cache_layers(outputs.past_key_values)
+        mask = torch.ones_like(input_ids)
+
+        if not self._active:
+            self._layers, self._attention_mask, self._seen = layers, mask, seen
+        else:
+            length = max(self._attention_mask.shape[1], mask.shape[1])
+            self._layers = [
+                (torch.cat([left_pad(k, length, 2), left_pad(nk, length, 2)]),
+                 torch.cat([left_pad(v, length, 2), left_pad(nv, length, 2)]))
+                for (k, v), (nk, nv) in zip(self._layers, layers)
+            ]
+            self._attention_mask = torch.cat([left_pad(self._attention_mask, length, 1), left_pad(mask, length, 1)])
+            self._seen = torch.cat([self._seen, seen])
+        self._active.append(request)
+
+        token = self._select_token(outputs.logits[:, -1, :], seen)
+        self._accept(len(self._active) - 1, int(token[0]))
+        self._retire_finished()
+
+    def _accept(self, row: int, token: int) -> None:
+        request = self._active[row]
+        request.generated_ids.append(token)
+        self._seen[row, token] = True
+        self.tokens_generated += 1
+        self._emit_new_text(request)
+
+    def _emit_new_text(self, request: GenerationRequest, final: bool = False) -> None:
+        """
+        Emit the text of tokens not emitted yet
+
+        Like TextIteratorStreamer, only a short window of tokens is decoded per call (the
+        already emitted tokens before read_offset give the tokenizer its spacing context),
+        so streaming stays linear in the length of the output.
+        """
+        ids = request.generated_ids
+        emitted = self.tokenizer.decode(ids[request.prefix_offset:request.read_offset], skip_special_tokens=True)
+        text = self.tokenizer.decode(ids[request.prefix_offset:], skip_special_tokens=True)
+        # Hold back incomplete multi-byte characters until the next token completes them
+        if len(text) > len(emitted) and (final or not text.endswith('�')):
+            request._emit(text[len(emitted):])
+            request.prefix_offset = request.read_offset
+            request.read_offset = len(ids)
+
+    def _is_finished(self, request: GenerationRequest) -> bool:
+        return (
+            request.generated_ids[-1] in self.eos_token_ids
+            or len(request.generated_ids) >= request.max_new_tokens
+            or request.cancelled
+            or (request.limits is not None and request.limits.should_stop())
+        )
+
+    def _step(self) -> None:
+        """Decode one token for every active request"""
+        device = self._attention_mask.device
+        input_ids = torch.tensor([[r.generated_ids[-1]] for r in self._active], device=device)
+        position_ids = torch.tensor([[r.position] for r in self._active], device=device)
+        attention_mask = torch.cat([self._attention_mask, self._attention_mask.new_ones((len(self._active), 1))], dim=1)
+        with torch.no_grad():
+            outputs = self.model(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                position_ids=position_ids,
+                past_key_values=build_cache(self._layers),
+                use_cache=True,
+            )
+        self._layers = cache_layers(outputs.past_key_values)
+        self._attention_mask = attention_mask
+
+        tokens = self._select_token(outputs.logits[:, -1, :], self._seen)
+        for row, token in enumerate(tokens.tolist()):
+            self._active[row].position += 1
+            self._accept(row, token)
+        self._retire_finished()
+
+    def _retire_finished(self) -> None:
+        """Drop finished rows from the batch and trim padding no row needs any more"""
+        keep = []
+        for row, request in enumerate(self._active):
+            if self._is_finished(request):
+                self._emit_new_text(request, final=True)
+                request._finish()
+            else:
+                keep.append(row)
+        if len(keep) == len(self._active):
+            return
+        if not keep:
+            self._reset_batch()
+            return
+
+        index = torch.tensor(keep, device=self._attention_mask.device)
+        mask = self._attention_mask.index_select(0, index)
+        first_used = int(mask.any(dim=0).nonzero()[0])
+        self._attention_mask = mask[:, first_used:]
+        self._layers = [
+            (k.index_select(0, index)[:, :, first_used:], v.index_select(0, index)[:, :, first_used:])
+            for k, v in self._layers
+        ]
+        self._seen = self._seen.index_select(0, index)
+        self._active = [self._active[row] for row in keep]
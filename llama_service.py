@@ -1,17 +1,22 @@
-import torch
 import os
-from huggingface_hub import login
-from transformers import pipeline, AutoTokenizer
-import pycountry
+import time
+import uuid
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import Chroma
 import requests
 import pandas as pd
 from bs4 import BeautifulSoup
+from config import config
+from llm_backends import get_backend, GenerationLimits
+from extractive_summarizer import select_sentences, estimate_tokens
+from single_flight import Detached, SingleFlight, report_key
+from report_progress import ProgressReporter
+from pregeneration import ReportCache
+from rate_limiter import AdmissionController, QueueFullError
+from country_registry import country_registry
 
 # Set your tokens as environment variables
-HF_TOKEN = os.getenv('HF_TOKEN')
 G_NEWS_TOKEN = os.getenv('G_NEWS_TOKEN')
 ACLED_USERNAME = os.getenv('ACLED_USERNAME')
 ACLED_PASSWORD = os.getenv('ACLED_PASSWORD')
@@ -53,32 +58,71 @@ class LlamaService:
         - Identify emerging or ongoing humanitarian risks (conflict escalation, funding gaps, or instability) strictly from the data.
         """
         
-        # Initialize model (cache it to avoid reloading)
-        self.model = None
-        self.tokenizer = None
-        self.llama_pipeline = None
+        # Prompt for the map step of map-reduce summarization
+        self.map_prompt = """
+        You are an expert humanitarian data analyst working for an NGO.
+
+        TASK:
+        Summarize the data excerpt below into concise factual bullet points.
+
+        STRICT RULES:
+        1. Use only facts stated in the excerpt. Keep exact figures, dates, and place names.
+        2. Ignore and exclude any NaN, null, or missing values completely.
+        3. Discuss only data related to the specified country.
+        4. Do NOT give any recommendations, opinions, or projections.
+        5. Write in ENGLISH only and end every bullet with the source in parentheses, e.g. (ReliefWeb).
+        6. Output 3–8 bullet points, each starting with "-", and nothing else.
+        """
+        
+        # LLM backend selected by LLM_BACKEND (loaded lazily and cached)
+        self.backend = get_backend()
+        self.embedding_model = None
+        
+        # Identical reports requested while one is being generated share its result
+        self.report_flights = SingleFlight()
+        
+        # Reports pre-generated off-peak for high-demand countries (pregeneration.py)
+        self.report_cache = ReportCache()
+        
+        # At most MAX_CONCURRENT_REPORTS (see AdmissionController) run at once; up to REPORT_QUEUE_SIZE more wait
+        self.report_admission = AdmissionController()
         
     def initialize_model(self):
-        """Initialize the Llama model (call this once)"""
-        if self.llama_pipeline is not None:
-            return
-            
-        login(HF_TOKEN)
-        model_name = "meta-llama/Llama-3.2-3B-Instruct"
+        """Initialize the LLM backend (call this once)"""
+        self.backend.load()
+        self.backend.prepare_system_prompt(self.base_prompt)
+
+    def get_embedding_model(self):
+        """Load the sentence embedding model once and reuse it for every report"""
+        if self.embedding_model is None:
+            self.embedding_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+        return self.embedding_model
+
+    def generate_text(self, messages, max_new_tokens=1500, limits=None, reporter=None):
+        """Generate a completion with the configured backend
+
+        With a reporter the completion is streamed so 'generating' events can report
+        the number of tokens generated so far (at most every half second).
+        """
+        if reporter is None or reporter.callback is None:
+            return self.backend.generate(messages, max_new_tokens=max_new_tokens, limits=limits)
         
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.llama_pipeline = pipeline(
-            "text-generation",
-            model=model_name,
-            dtype=torch.bfloat16,
-            device_map="auto",
-            tokenizer=self.tokenizer,
-            do_sample=False,
-            repetition_penalty=1.15,
-            return_full_text=False,
-            pad_token_id=self.tokenizer.eos_token_id,
-            max_new_tokens=1024
-        )
+        text = ""
+        last_update = time.perf_counter()
+        stream = self.backend.stream(messages, max_new_tokens=max_new_tokens, limits=limits)
+        try:
+            for chunk in stream:
+                text += chunk
+                if time.perf_counter() - last_update >= 0.5:
+                    last_update = time.perf_counter()
+                    tokens = estimate_tokens(text)
+                    reporter.emit('generating', 'running', tokens / max_new_tokens,
+                                  f"Generated about {tokens} tokens", tokens=tokens)
+        finally:
+            # Close now rather than when the traceback is freed, so an exception raised by
+            # the progress callback stops decoding right away
+            stream.close()
+        return text
 
     # Your existing API functions (copy from Colab)
     def fetch_worldbank(self, country, indicator, start, end):
@@ -278,61 +322,289 @@ class LlamaService:
     """
         return content
 
-    def generate_report(self, country_name, date_range):
-        """Main function to generate report using Llama"""
+    def collect_sources(self, country_name, country_code, start, end, reporter=None):
+        """Fetch every data source and return its prompt text keyed by source name"""
+        reporter = reporter or ProgressReporter()
+        fetchers = {
+            "World Bank": lambda: self.create_prompt_worldbank(country_code, start.split('-')[0], end.split('-')[0]),
+            # ACLED and ReliefWeb filter on their own spelling of the country name
+            "ACLED": lambda: self.create_prompt_acled(country_registry.source_name(country_name, 'acled'), start, end),
+            "ReliefWeb": lambda: self.create_prompt_reliefweb(country_registry.source_name(country_name, 'reliefweb'),
+                                                              start, end),
+            "Google News": lambda: self.create_prompt_gnews(country_name, start, end),
+        }
+        sources = {}
+        for i, (source, fetch) in enumerate(fetchers.items()):
+            reporter.emit('collecting', 'running', i / len(fetchers), f"Fetching {source} data",
+                          source=source, source_status='processing')
+            fetch_start = time.perf_counter()
+            sources[source] = fetch()
+            duration = time.perf_counter() - fetch_start
+            reporter.record(f"collecting: {source}", duration)
+            reporter.emit('collecting', 'running', (i + 1) / len(fetchers), f"Fetched {source} data",
+                          source=source, source_status='completed', duration=round(duration, 3),
+                          chars=len(sources[source]))
+        return sources
+
+    def generate_report(self, country_name, date_range, mode=None, deadline_seconds=None, cancel_token=None,
+                        language='en', progress=None, use_cache=True):
+        """Main function to generate report using Llama
+
+        mode selects 'rag' (single retrieval pass, the default) or 'map_reduce'
+        (hierarchical summarization over all collected data); REPORT_MODE sets the default.
+
+        Generation stops once deadline_seconds (default REPORT_DEADLINE_SECONDS, 0 for none)
+        have elapsed or cancel_token is cancelled; the sections parsed so far are returned
+        with 'truncated' set and 'stop_reason' ('deadline' or 'cancelled').
+
+        A call identical in (country, dates, language, model, mode) to one already running
+        waits for that run and returns a copy of its result instead of starting another.
+        Cancelling cancel_token while waiting returns the cancellation error at once; the
+        shared run itself stops only once every caller attached to it has cancelled.
+
+        progress, if given, is called with a structured event (see report_progress) as each
+        stage starts, advances and completes; the result carries per-stage 'timings'.
+        An attached caller receives a single 'waiting' event, then the shared result.
+
+        A fresh pre-generated report for the same country, dates, model, mode and language is
+        returned straight from the report cache (with 'cached' set) unless use_cache is False.
+
+        Generation waits for a free slot of the admission queue, emitting 'waiting' events
+        with 'queue_position' and 'estimated_wait' meanwhile; when the queue is full an
+        error is returned immediately.
+        """
+        mode = mode or config['REPORT_MODE']
+        if mode not in ('rag', 'map_reduce'):
+            return {"error": f"Unknown report mode '{mode}'"}
+        if use_cache:
+            cached = self.report_cache.get(country_name, date_range, self.backend.model_id, mode, language=language)
+            if cached is not None:
+                if progress is not None:
+                    ProgressReporter(progress).emit('ready', 'completed', 1.0, "Served from the report cache")
+                return {**cached, 'cached': True}
+
+        key = report_key(country_name, date_range['start_date'], date_range['end_date'], language,
+                         self.backend.model_id) + (mode,)
+        on_wait = None
+        if progress is not None:
+            on_wait = lambda: ProgressReporter(progress).emit(
+                'waiting', message="Waiting for an identical report already in progress")
+        try:
+            report, _ = self.report_flights.do(key, self._admitted_report, country_name, date_range, mode,
+                                               deadline_seconds, progress=progress, on_wait=on_wait,
+                                               cancel_token=cancel_token)
+        except Detached:
+            return {"error": self.stop_message('cancelled')}
+        return report
+
+    def _admitted_report(self, country_name, date_range, mode, deadline_seconds, cancel_token=None, progress=None):
+        """Run _generate_report once the admission queue lets it through"""
+        on_wait = None
+        if progress is not None:
+            on_wait = lambda position, estimate: ProgressReporter(progress).emit(
+                'waiting', message=f"Queued at position {position}, about {round(estimate)} seconds to start",
+                queue_position=position, estimated_wait=estimate)
         try:
+            with self.report_admission.slot(on_wait):
+                return self._generate_report(country_name, date_range, mode, deadline_seconds, cancel_token,
+                                             progress)
+        except QueueFullError as e:
+            return {"error": str(e)}
+
+    def _generate_report(self, country_name, date_range, mode, deadline_seconds, cancel_token, progress=None):
+        """Collect, condense and generate one report (see generate_report)"""
+        reporter = ProgressReporter(progress)
+        try:
+            if deadline_seconds is None:
+                deadline_seconds = config['REPORT_DEADLINE_SECONDS']
+            limits = GenerationLimits(deadline_seconds, cancel_token)
+
             # Initialize model if not already done
             self.initialize_model()
             
             # Get country code
-            country_code = pycountry.countries.lookup(country_name).alpha_3
+            country_code = country_registry.lookup(country_name)['alpha_3']
             start = date_range['start_date']
             end = date_range['end_date']
             
             # Fetch data from all sources
-            prompt1 = self.create_prompt_worldbank(country_code, start.split('-')[0], end.split('-')[0])
-            prompt2 = self.create_prompt_reliefweb(country_name, start, end)
-            prompt3 = self.create_prompt_gnews(country_name, start, end)
-            prompt4 = self.create_prompt_acled(country_name, start, end)
+            sources = self.collect_sources(country_name, country_code, start, end, reporter)
+            return self._report_from_sources(country_name, sources, mode, limits, reporter)
             
-            text = f"{prompt1} \n {prompt4} \n {prompt2} \n {prompt3}"
-            
-            # Process with RAG
+        except Exception as e:
+            return {"error": f"Failed to generate report: {str(e)}"}
+
+    def report_from_sources(self, country_name, sources, mode=None, deadline_seconds=None, cancel_token=None,
+                            progress=None):
+        """Condense, generate and parse a report from already collected sources
+
+        Used by batch generation, which collects data for many countries concurrently
+        and then generates the reports one after another on the shared model.
+        Arguments and result are as for generate_report.
+        """
+        reporter = ProgressReporter(progress)
+        try:
+            mode = mode or config['REPORT_MODE']
+            if deadline_seconds is None:
+                deadline_seconds = config['REPORT_DEADLINE_SECONDS']
+            limits = GenerationLimits(deadline_seconds, cancel_token)
+            self.initialize_model()
+            return self._report_from_sources(country_name, sources, mode, limits, reporter)
+        except Exception as e:
+            return {"error": f"Failed to generate report: {str(e)}"}
+
+    def _report_from_sources(self, country_name, sources, mode, limits, reporter):
+        if config['EXTRACTIVE_SUMMARY']:
+            with reporter.stage('condensing', "Selecting the most informative sentences"):
+                sources = self.condense_sources(sources)
+        
+        if mode == 'map_reduce':
+            output = self.generate_map_reduce(country_name, sources, limits, reporter)
+        else:
+            output = self.generate_rag(country_name, sources, limits, reporter)
+        
+        if limits.stop_reason and not output.strip():
+            return {"error": self.stop_message(limits.stop_reason)}
+        
+        # Parse the output into structured format
+        with reporter.stage('parsing', "Structuring the report sections"):
+            sections = self.parse_llama_output(output)
+        sections['sources'] = list(sources.keys())
+        sections['truncated'] = limits.stop_reason is not None
+        if limits.stop_reason:
+            sections['stop_reason'] = limits.stop_reason
+        reporter.finish()
+        sections['timings'] = dict(reporter.durations)
+        return sections
+
+    def stop_message(self, stop_reason):
+        if stop_reason == 'cancelled':
+            return "Report generation was cancelled"
+        return "Report generation exceeded its time limit before any text was generated"
+
+    def condense_sources(self, sources, token_budget=None):
+        """Keep only the most informative sentences of each source under a token budget"""
+        token_budget = token_budget or config['EXTRACTIVE_TOKEN_BUDGET']
+        embed = self.get_embedding_model().embed_documents if config['EXTRACTIVE_USE_EMBEDDINGS'] else None
+        return {
+            source: select_sentences(text, token_budget, embed=embed)
+            for source, text in sources.items()
+        }
+
+    def retrieve_context(self, country_name, sources, reporter=None):
+        """Chunk and embed the source texts, then retrieve the most relevant chunks"""
+        reporter = reporter or ProgressReporter()
+        text = " \n ".join(sources.values())
+        
+        # Process with RAG
+        with reporter.stage('chunking', "Splitting the collected data into chunks"):
             splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
             chunks = splitter.create_documents([text])
-            
-            embedding_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+        
+        # A collection of its own per call: the in-memory Chroma client is shared by the
+        # whole process, so the default collection would keep every earlier report's chunks
+        with reporter.stage('embedding', f"Embedding {len(chunks)} chunks", chunks=len(chunks)):
             chroma = Chroma.from_documents(
                 documents=chunks,
-                embedding=embedding_model,
-            )
-            
-            STATIC_QUERY = f"""
-            Gather comprehensive humanitarian, socioeconomic, and situational information for {country_name}
-            from datasets and reports published by the World Bank, ReliefWeb, ACLED, and Google News.
-            """
-            
-            retriever = chroma.as_retriever(
-                search_type="mmr",
-                search_kwargs={"k": 25, "fetch_k": 60, "lambda_mult": 0.7}
+                embedding=self.get_embedding_model(),
+                collection_name=f"report_{uuid.uuid4().hex}",
             )
-            relevant_docs = retriever.invoke(STATIC_QUERY)
-            context = "\n\n".join([doc.page_content for doc in relevant_docs])
-            
-            # Generate response with Llama
-            messages = [
-                {"role": "system", "content": self.base_prompt},
-                {"role": "user", "content": f"\nRelevant data about {country_name}: {context}"}
+        
+        STATIC_QUERY = f"""
+        Gather comprehensive humanitarian, socioeconomic, and situational information for {country_name}
+        from datasets and reports published by the World Bank, ReliefWeb, ACLED, and Google News.
+        """
+        
+        try:
+            with reporter.stage('retrieving', "Retrieving the most relevant chunks"):
+                retriever = chroma.as_retriever(
+                    search_type="mmr",
+                    search_kwargs={"k": 25, "fetch_k": 60, "lambda_mult": 0.7}
+                )
+                relevant_docs = retriever.invoke(STATIC_QUERY)
+        finally:
+            chroma.delete_collection()
+        return "\n\n".join([doc.page_content for doc in relevant_docs])
+
+    def generate_rag(self, country_name, sources, limits=None, reporter=None):
+        """Single pass: retrieve the most relevant chunks and generate the report from them"""
+        reporter = reporter or ProgressReporter()
+        if limits is not None and limits.should_stop():
+            return ""
+        context = self.retrieve_context(country_name, sources, reporter)
+        
+        # Generate response with Llama
+        messages = [
+            {"role": "system", "content": self.base_prompt},
+            {"role": "user", "content": f"\nRelevant data about {country_name}: {context}"}
+        ]
+        
+        with reporter.stage('generating', "Generating the report with the LLM"):
+            return self.generate_text(messages, max_new_tokens=1500, limits=limits, reporter=reporter)
+
+    def generate_map_reduce(self, country_name, sources, limits=None, reporter=None):
+        """Hierarchical summarization: summarize every excerpt of every source, then combine"""
+        reporter = reporter or ProgressReporter()
+        with reporter.stage('chunking', "Splitting the collected data into excerpts"):
+            splitter = RecursiveCharacterTextSplitter(chunk_size=config['MAP_CHUNK_SIZE'], chunk_overlap=200)
+            excerpts = []
+            for source, text in sources.items():
+                for chunk in splitter.split_text(text):
+                    excerpts.append((source, chunk))
+        
+        # Map: one partial summary per excerpt, generated in batches
+        with reporter.stage('mapping', f"Summarizing {len(excerpts)} excerpts", excerpts=len(excerpts)):
+            partials = self.summarize_excerpts(country_name, excerpts, limits, reporter)
+        
+        # Collapse until all partial summaries fit in a single final call
+        while (len(partials) > 1 and not (limits is not None and limits.should_stop())
+               and sum(len(text) for _, text in partials) > config['REDUCE_MAX_CHARS']):
+            groups = []
+            for source, text in partials:
+                if groups and groups[-1][0] == source and len(groups[-1][1]) + len(text) <= config['MAP_CHUNK_SIZE']:
+                    groups[-1] = (source, groups[-1][1] + "\n" + text)
+                else:
+                    groups.append((source, text))
+            if len(groups) == len(partials):
+                # Nothing left to merge within a source, so merge across sources
+                groups = [("multiple sources", "\n".join(text for _, text in partials[i:i + 2]))
+                          for i in range(0, len(partials), 2)]
+            with reporter.stage('mapping', f"Combining {len(groups)} partial summaries", excerpts=len(groups)):
+                partials = self.summarize_excerpts(country_name, groups, limits, reporter)
+        
+        # Reduce: write the four-section report from the partial summaries
+        context = "\n\n".join(f"Summary of {source} data:\n{text}" for source, text in partials)
+        messages = [
+            {"role": "system", "content": self.base_prompt},
+            {"role": "user", "content": f"\nRelevant data about {country_name}: {context}"}
+        ]
+        with reporter.stage('generating', "Writing the report from the partial summaries"):
+            return self.generate_text(messages, max_new_tokens=1500, limits=limits, reporter=reporter)
+
+    def summarize_excerpts(self, country_name, excerpts, limits=None, reporter=None):
+        """Map step: summarize (source, text) excerpts in batched generation calls"""
+        reporter = reporter or ProgressReporter()
+        batch_size = max(config['MAP_BATCH_SIZE'], 1)
+        partials = []
+        for i in range(0, len(excerpts), batch_size):
+            if limits is not None and limits.should_stop():
+                break
+            reporter.emit('mapping', 'running', i / max(len(excerpts), 1),
+                          f"Summarized {i} of {len(excerpts)} excerpts", done=i, total=len(excerpts))
+            batch = excerpts[i:i + batch_size]
+            conversations = [
+                [
+                    {"role": "system", "content": self.map_prompt},
+                    {"role": "user", "content": f"Source: {source}\nCountry: {country_name}\nData:\n{text}"}
+                ]
+                for source, text in batch
             ]
-            
-            outputs = self.llama_pipeline(messages, max_new_tokens=1500)
-            output = outputs[0]["generated_text"]
-            
-            # Parse the output into structured format
-            return self.parse_llama_output(output)
-            
-        except Exception as e:
-            return {"error": f"Failed to generate report: {str(e)}"}
+            outputs = self.backend.generate_batch(conversations, max_new_tokens=config['MAP_MAX_NEW_TOKENS'],
+                                                  limits=limits)
+            for (source, _), output in zip(batch, outputs):
+                if output.strip():
+                    partials.append((source, output.strip()))
+        return partials
 
     def parse_llama_output(self, output):
         """Parse Llama output into structured format for your Streamlit app"""
@@ -0,0 +1,550 @@
+"""
+LLM Backends for NGO Data Helpers
+Pluggable text generation backends used by LlamaService
+"""
+
+import os
+import copy
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Iterator, Optional, Any
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import get_config
+
+HF_TOKEN = os.getenv('HF_TOKEN')
+
+Messages = List[Dict[str, str]]
+
+
+class LLMBackendError(Exception):
+    """Raised when a backend fails to produce a completion"""
+
+
+class CancellationToken:
+    """Thread-safe flag a caller sets to abandon an in-flight report"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+
+class GenerationLimits:
+    """Wall-clock deadline and cancellation checked between decoding steps"""
+
+    def __init__(self, timeout: Optional[float] = None, cancel_token: Optional[CancellationToken] = None):
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.cancel_token = cancel_token
+        self.stop_reason = None
+
+    def should_stop(self) -> bool:
+        """Return True (and remember why) once the deadline passed or the token was cancelled"""
+        if self.stop_reason is None:
+            if self.cancel_token is not None and self.cancel_token.cancelled:
+                self.stop_reason = 'cancelled'
+            elif self.deadline is not None and time.monotonic() >= self.deadline:
+                self.stop_reason = 'deadline'
+        return self.stop_reason is not None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline, or None without a deadline"""
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0.0)
+
+
+_stopping_criteria_class = None
+
+
+def stopping_criteria(limits: Optional[GenerationLimits]):
+    """Wrap limits in a transformers StoppingCriteriaList checked after every decoding step"""
+    global _stopping_criteria_class
+    from transformers import StoppingCriteria, StoppingCriteriaList
+
+    if limits is None:
+        return StoppingCriteriaList()
+    if _stopping_criteria_class is None:
+        import torch
+
+        class LimitsStoppingCriteria(StoppingCriteria):
+            def __init__(self, limits):
+                self.limits = limits
+
+            def __call__(self, input_ids, scores, **kwargs):
+                stop = self.limits.should_stop()
+                return torch.full((input_ids.shape[0],), stop, dtype=torch.bool, device=input_ids.device)
+
+        _stopping_criteria_class = LimitsStoppingCriteria
+    return StoppingCriteriaList([_stopping_criteria_class(limits)])
+
+
+class LLMBackend:
+    """Interface shared by all text generation backends"""
+
+    name = 'base'
+
+    @property
+    def model_id(self) -> str:
+        """Identifier of the backend and model producing the text"""
+        return self.name
+
+    def load(self) -> None:
+        """Prepare the backend (load weights, open connections). Safe to call repeatedly."""
+
+    def prepare_system_prompt(self, system_prompt: str) -> None:
+        """Precompute any per-prompt state for a system prompt reused across requests"""
+
+    def stream(self, messages: Messages, max_new_tokens: int = 1500,
+               limits: Optional[GenerationLimits] = None) -> Iterator[str]:
+        """
+        Stream a chat completion
+
+        Args:
+            messages: Chat messages with 'role' and 'content'
+            max_new_tokens: Maximum number of tokens to generate
+            limits: Optional deadline/cancellation; the stream ends early once it triggers
+
+        Yields:
+            Text fragments in generation order
+        """
+        raise NotImplementedError
+
+    def generate(self, messages: Messages, max_new_tokens: int = 1500,
+                 limits: Optional[GenerationLimits] = None) -> str:
+        """
+        Generate a complete chat completion
+
+        Args:
+            messages: Chat messages with 'role' and 'content'
+            max_new_tokens: Maximum number of tokens to generate
+            limits: Optional deadline/cancellation; the text so far is returned once it triggers
+
+        Returns:
+            Generated text
+        """
+        return ''.join(self.stream(messages, max_new_tokens, limits))
+
+    def generate_batch(self, batch: List[Messages], max_new_tokens: int = 1500,
+                       limits: Optional[GenerationLimits] = None) -> List[str]:
+        """
+        Generate completions for several independent conversations
+
+        Args:
+            batch: List of chat message lists
+            max_new_tokens: Maximum number of tokens to generate per conversation
+            limits: Optional deadline/cancellation shared by the whole batch
+
+        Returns:
+            Generated texts in the same order as batch
+        """
+        return [self.generate(messages, max_new_tokens, limits) for messages in batch]
+
+
+class TransformersBackend(LLMBackend):
+    """In-process Hugging Face transformers backend"""
+
+    name = 'transformers'
+
+    def __init__(self, model_name: Optional[str] = None, draft_model_name: Optional[str] = None):
+        config = get_config()
+        self.model_name = model_name or config['LLM_MODEL_NAME']
+        self.draft_model_name = draft_model_name if draft_model_name is not None else config['LLM_DRAFT_MODEL']
+        self.model = None
+        self.draft_model = None
+        self.tokenizer = None
+        self.llama_pipeline = None
+        self.generation_kwargs = {}
+        self.scheduler = None
+        self._load_lock = threading.Lock()
+
+        # Chat-templated system prefixes prefilled once per loaded model:
+        # system prompt -> (prefix token ids, past key/values)
+        self.prefix_caches = {}
+
+    @property
+    def model_id(self) -> str:
+        return f"{self.name}:{self.model_name}"
+
+    def load(self) -> None:
+        """Load the model and tokenizer once per process"""
+        if self.llama_pipeline is not None:
+            return
+        with self._load_lock:
+            if self.llama_pipeline is not None:
+                return
+
+            import torch
+            from huggingface_hub import login
+            from transformers import pipeline, AutoTokenizer
+
+            login(HF_TOKEN)
+            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            self.generation_kwargs = {
+                "do_sample": False,
+                "repetition_penalty": 1.15,
+                "pad_token_id": self.tokenizer.eos_token_id,
+            }
+            llama_pipeline = pipeline(
+                "text-generation",
+                model=self.model_name,
+                dtype=torch.bfloat16,
+                device_map="auto",
+                tokenizer=self.tokenizer,
+                return_full_text=False,
+                max_new_tokens=1024,
+                **self.generation_kwargs
+            )
+            self.model = llama_pipeline.model
+            if self.draft_model_name:
+                self.load_draft_model(self.draft_model_name)
+            if get_config()['LLM_CONTINUOUS_BATCHING']:
+                self.start_scheduler()
+            self.llama_pipeline = llama_pipeline
+
+    def load_draft_model(self, draft_model_name: str) -> None:
+        """
+        Enable assisted (speculative) generation with a small draft model
+
+        The draft must share the main model's tokenizer (e.g. Llama-3.2-1B-Instruct for
+        Llama-3.2-3B-Instruct). With greedy decoding the output is identical to decoding
+        without the draft; only the number of main-model forward passes changes.
+        Assisted generation runs one sequence at a time, so generate_batch() decodes
+        sequentially while a draft is loaded and the continuous-batching scheduler
+        does not use it. The cached system prefix is not reused with a draft model,
+        so each prompt is prefilled in full.
+        """
+        import torch
+        from transformers import AutoModelForCausalLM
+
+        self.draft_model = AutoModelForCausalLM.from_pretrained(
+            draft_model_name,
+            dtype=torch.bfloat16,
+            device_map="auto",
+        )
+        self.draft_model_name = draft_model_name
+
+    def start_scheduler(self, max_batch_size: Optional[int] = None) -> None:
+        """Route every generation through one continuously batched decode loop"""
+        from generation_scheduler import GenerationScheduler
+
+        self.scheduler = GenerationScheduler(self, max_batch_size or get_config()['LLM_MAX_BATCH_SIZE'])
+
+    def encode_chat(self, messages: Messages, add_generation_prompt: bool = False):
+        """Tokenize messages with the model's chat template"""
+        text = self.tokenizer.apply_chat_template(
+            messages, tokenize=False, add_generation_prompt=add_generation_prompt
+        )
+        input_ids = self.tokenizer(text, return_tensors="pt", add_special_tokens=False).input_ids
+        return input_ids.to(self.model.device)
+
+    def prepare_system_prompt(self, system_prompt: str) -> None:
+        """Prefill the chat-templated system prompt once and keep its past key/values"""
+        self.load()
+        if system_prompt not in self.prefix_caches:
+            self._build_prefix_cache(system_prompt)
+
+    def _build_prefix_cache(self, system_prompt: str) -> None:
+        import torch
+        from transformers import DynamicCache
+
+        prefix_ids = self.encode_chat([{"role": "system", "content": system_prompt}])
+        with torch.no_grad():
+            outputs = self.model(input_ids=prefix_ids, past_key_values=DynamicCache(), use_cache=True)
+        self.prefix_caches[system_prompt] = (prefix_ids, outputs.past_key_values)
+
+    def get_prefix_cache(self, messages: Messages, input_ids):
+        """Return a private copy of the system prefix cache if it is a prefix of input_ids"""
+        import torch
+
+        if not messages or messages[0]["role"] != "system":
+            return None
+        system_prompt = messages[0]["content"]
+
+        def cached_prefix():
+            entry = self.prefix_caches.get(system_prompt)
+            if entry is None:
+                return None
+            prefix_ids, prefix_cache = entry
+            prefix_len = prefix_ids.shape[1]
+            if input_ids.shape[1] > prefix_len and torch.equal(input_ids[:, :prefix_len], prefix_ids):
+                return prefix_cache
+            return None
+
+        prefix_cache = cached_prefix()
+        if prefix_cache is None:
+            # First use of this prompt, or the chat template's embedded date rolled over
+            self._build_prefix_cache(system_prompt)
+            prefix_cache = cached_prefix()
+            if prefix_cache is None:
+                return None
+        # generate() appends to the cache in place, so every call needs its own copy
+        return copy.deepcopy(prefix_cache)
+
+    def _generate_kwargs(self, messages: Messages, max_new_tokens: int,
+                         limits: Optional[GenerationLimits]) -> Dict[str, Any]:
+        import torch
+
+        self.load()
+        input_ids = self.encode_chat(messages, add_generation_prompt=True)
+        # Assisted decoding re-crops the cache while verifying draft tokens and does
+        # not reproduce greedy output when started from a pre-filled prefix cache
+        past_key_values = None if self.draft_model is not None else self.get_prefix_cache(messages, input_ids)
+        return {
+            "input_ids": input_ids,
+            "attention_mask": torch.ones_like(input_ids),
+            "past_key_values": past_key_values,
+            "max_new_tokens": max_new_tokens,
+            "stopping_criteria": stopping_criteria(limits),
+            "assistant_model": self.draft_model,
+            **self.generation_kwargs,
+        }
+
+    def generate(self, messages: Messages, max_new_tokens: int = 1500,
+                 limits: Optional[GenerationLimits] = None) -> str:
+        """Generate a completion, prefilling only the tokens after the cached system prefix"""
+        import torch
+
+        if limits is not None and limits.should_stop():
+            return ''
+        if self.scheduler is not None:
+            self.load()
+            return self.scheduler.submit(messages, max_new_tokens, limits).result()
+        kwargs = self._generate_kwargs(messages, max_new_tokens, limits)
+        prompt_len = kwargs["input_ids"].shape[1]
+        with torch.no_grad():
+            output_ids = self.model.generate(**kwargs)
+        return self.tokenizer.decode(output_ids[0, prompt_len:], skip_special_tokens=True)
+
+    def generate_batch(self, batch: List[Messages], max_new_tokens: int = 1500,
+                       limits: Optional[GenerationLimits] = None) -> List[str]:
+        """
+        Generate completions in a single batched generate() call
+
+        When every conversation starts with the same cached system prefix, the prefix
+        key/values are shared and padding is inserted between the prefix and each
+        conversation's own tokens, so only the per-conversation suffixes are prefilled.
+        """
+        import torch
+
+        if not batch:
+            return []
+        if limits is not None and limits.should_stop():
+            return [''] * len(batch)
+        if self.scheduler is not None:
+            self.load()
+            requests = [self.scheduler.submit(messages, max_new_tokens, limits) for messages in batch]
+            return [request.result() for request in requests]
+        if len(batch) == 1 or self.draft_model is not None:
+            # Assisted generation only supports one sequence at a time
+            return [self.generate(messages, max_new_tokens, limits) for messages in batch]
+
+        self.load()
+        encoded = [self.encode_chat(messages, add_generation_prompt=True) for messages in batch]
+
+        prefix_cache = None
+        if len({messages[0]["content"] for messages in batch if messages}) == 1:
+            prefix_cache = self.get_prefix_cache(batch[0], encoded[0])
+        prefix_ids = None
+        if prefix_cache is not None:
+            prefix_ids = self.prefix_caches[batch[0][0]["content"]][0]
+            prefix_len = prefix_ids.shape[1]
+            if not all(ids.shape[1] > prefix_len and torch.equal(ids[:, :prefix_len], prefix_ids)
+                       for ids in encoded):
+                prefix_cache, prefix_ids = None, None
+        prefix_len = prefix_ids.shape[1] if prefix_ids is not None else 0
+
+        suffixes = [ids[0, prefix_len:] for ids in encoded]
+        width = max(len(suffix) for suffix in suffixes)
+        device = encoded[0].device
+        # Pad each row with its own first token: padding is masked out of attention, and a token
+        # already in the prompt leaves the (set-based) repetition penalty unchanged
+        first_tokens = torch.stack([ids[0, 0] for ids in encoded]).unsqueeze(1)
+        input_ids = first_tokens.expand(len(batch), prefix_len + width).clone().to(device)
+        attention_mask = torch.zeros_like(input_ids)
+        if prefix_ids is not None:
+            input_ids[:, :prefix_len] = prefix_ids[0]
+            attention_mask[:, :prefix_len] = 1
+        for row, suffix in enumerate(suffixes):
+            input_ids[row, prefix_len + width - len(suffix):] = suffix
+            attention_mask[row, prefix_len + width - len(suffix):] = 1
+
+        if prefix_cache is not None:
+            prefix_cache.batch_repeat_interleave(len(batch))
+        with torch.no_grad():
+            output_ids = self.model.generate(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                past_key_values=prefix_cache,
+                max_new_tokens=max_new_tokens,
+                stopping_criteria=stopping_criteria(limits),
+                **self.generation_kwargs
+            )
+        prompt_len = input_ids.shape[1]
+        return [self.tokenizer.decode(row[prompt_len:], skip_special_tokens=True) for row in output_ids]
+
+    def stream(self, messages: Messages, max_new_tokens: int = 1500,
+               limits: Optional[GenerationLimits] = None) -> Iterator[str]:
+        """Stream a completion from a background generate() call"""
+        import torch
+        from transformers import TextIteratorStreamer
+
+        if limits is not None and limits.should_stop():
+            return
+        if self.scheduler is not None:
+            self.load()
+            yield from self.scheduler.submit(messages, max_new_tokens, limits).stream()
+            return
+        kwargs = self._generate_kwargs(messages, max_new_tokens, limits)
+        # Set when the consumer stops iterating (closed generator, exception in the caller),
+        # so the background generate() stops at its next step instead of running to max_new_tokens
+        abandoned = CancellationToken()
+        kwargs["stopping_criteria"].extend(stopping_criteria(GenerationLimits(cancel_token=abandoned)))
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        errors = []
+
+        def run():
+            try:
+                with torch.no_grad():
+                    self.model.generate(streamer=streamer, **kwargs)
+            except Exception as e:
+                # generate() never ended the stream: end it so the consumer stops waiting
+                errors.append(e)
+                streamer.end()
+
+        worker = threading.Thread(target=run, daemon=True)
+        worker.start()
+        try:
+            for text in streamer:
+                if text:
+                    yield text
+        finally:
+            abandoned.cancel()
+            worker.join()
+        if errors:
+            raise LLMBackendError(f"Generation failed: {errors[0]}") from errors[0]
+
+
+class OllamaBackend(LLMBackend):
+    """Ollama HTTP backend streaming from /api/chat over a pooled session"""
+
+    name = 'ollama'
+
+    def __init__(self, base_url: Optional[str] = None, model: Optional[str] = None,
+                 connect_timeout: Optional[float] = None, read_timeout: Optional[float] = None):
+        config = get_config()
+        self.base_url = (base_url or config['OLLAMA_BASE_URL']).rstrip('/')
+        self.model = model or config['OLLAMA_MODEL']
+        self.connect_timeout = connect_timeout if connect_timeout is not None else config['OLLAMA_CONNECT_TIMEOUT']
+        self.read_timeout = read_timeout if read_timeout is not None else config['OLLAMA_READ_TIMEOUT']
+        self.max_parallel = config['OLLAMA_MAX_PARALLEL']
+        self.session = None
+
+    @property
+    def model_id(self) -> str:
+        return f"{self.name}:{self.model}"
+
+    def load(self) -> None:
+        """Open a keep-alive session shared by all requests from this process"""
+        if self.session is not None:
+            return
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(self.max_parallel, 1))
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        self.session = session
+
+    def _payload(self, messages: Messages, max_new_tokens: int) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "messages": messages,
+            "stream": True,
+            "options": {
+                "num_predict": max_new_tokens,
+                "temperature": 0,
+                "repeat_penalty": 1.15,
+            },
+        }
+
+    def stream(self, messages: Messages, max_new_tokens: int = 1500,
+               limits: Optional[GenerationLimits] = None) -> Iterator[str]:
+        """Stream newline-delimited JSON chunks from the Ollama chat endpoint"""
+        self.load()
+        if limits is not None and limits.should_stop():
+            return
+        read_timeout = self.read_timeout
+        if limits is not None and limits.remaining() is not None:
+            # Never block on a socket read past the deadline
+            read_timeout = min(read_timeout, max(limits.remaining(), 0.1))
+        try:
+            response = self.session.post(
+                f"{self.base_url}/api/chat",
+                json=self._payload(messages, max_new_tokens),
+                stream=True,
+                timeout=(self.connect_timeout, read_timeout),
+            )
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            if limits is not None and limits.should_stop():
+                return
+            raise LLMBackendError(f"Ollama request failed: {e}") from e
+
+        # Leaving the with block closes the connection, which makes Ollama abort the generation
+        with response:
+            try:
+                for line in response.iter_lines():
+                    if limits is not None and limits.should_stop():
+                        break
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise LLMBackendError(f"Ollama error: {chunk['error']}")
+                    text = chunk.get("message", {}).get("content", "")
+                    if text:
+                        yield text
+                    if chunk.get("done"):
+                        break
+            except requests.exceptions.RequestException as e:
+                if limits is not None and limits.should_stop():
+                    return
+                raise LLMBackendError(f"Ollama stream interrupted: {e}") from e
+
+    def generate_batch(self, batch: List[Messages], max_new_tokens: int = 1500,
+                       limits: Optional[GenerationLimits] = None) -> List[str]:
+        """Send the conversations concurrently so the Ollama server can batch them"""
+        if not batch:
+            return []
+        with ThreadPoolExecutor(max_workers=min(len(batch), self.max_parallel)) as executor:
+            return list(executor.map(lambda messages: self.generate(messages, max_new_tokens, limits), batch))
+
+
+BACKENDS = {
+    TransformersBackend.name: TransformersBackend,
+    OllamaBackend.name: OllamaBackend,
+}
+
+
+def get_backend(name: Optional[str] = None) -> LLMBackend:
+    """
+    Create the backend selected by LLM_BACKEND
+
+    Args:
+        name: Backend name overriding the configured one
+
+    Returns:
+        An unloaded backend instance
+    """
+    name = (name or get_config()['LLM_BACKEND']).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend '{name}'. Expected one of: {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
@@ -0,0 +1,261 @@
+"""
+Report Pre-generation for NGO Data Helpers
+Generates and caches reports for high-demand countries over rolling windows
+during off-peak hours, so matching requests are served instantly from cache
+
+    python pregeneration.py          # run the off-peak scheduler
+    python pregeneration.py --once   # refresh every stale report now
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Any, Tuple
+
+from config import get_config
+from country_registry import country_registry
+
+
+def parse_windows(spec: str) -> List[Tuple[int, float]]:
+    """
+    Parse PREGENERATE_WINDOWS, e.g. '30:12,90:48'
+
+    Returns:
+        [(window length in days, maximum age in seconds), ...]
+    """
+    windows = []
+    for item in spec.split(','):
+        if not item.strip():
+            continue
+        days, _, hours = item.partition(':')
+        windows.append((int(days), float(hours or 24) * 3600))
+    return windows
+
+
+def parse_hours(spec: str) -> Optional[Tuple[int, int]]:
+    """Parse PREGENERATE_HOURS, e.g. '1-5' (inclusive, may wrap midnight); empty means any hour"""
+    if not spec.strip():
+        return None
+    start, _, end = spec.partition('-')
+    return int(start), int(end or start)
+
+
+def in_hours(hour: int, hours: Optional[Tuple[int, int]]) -> bool:
+    """Whether hour falls inside an inclusive (start, end) range that may wrap midnight"""
+    if hours is None:
+        return True
+    start, end = hours
+    if start <= end:
+        return start <= hour <= end
+    return hour >= start or hour <= end
+
+
+def rolling_window(days: int, today: Optional[date] = None) -> Dict[str, str]:
+    """Date range of the trailing days days, the last of them today"""
+    end = today or date.today()
+    return {"start_date": (end - timedelta(days=max(days, 1) - 1)).isoformat(), "end_date": end.isoformat()}
+
+
+def country_id(country: str) -> str:
+    """Stable identifier of a country name or code (ISO alpha-3 when known)"""
+    match = country_registry.get(country)
+    if match is not None and match['alpha_3']:
+        return match['alpha_3']
+    return " ".join(country.split()).casefold()
+
+
+class ReportCache:
+    """
+    Finished reports on disk, one JSON file per (country, date range, model, mode, language)
+
+    Entries are written atomically and carry their own maximum age, so every process
+    sharing REPORTS_DIRECTORY (Streamlit, backend workers, the scheduler) sees the
+    same cache.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or os.path.join(get_config()['REPORTS_DIRECTORY'], 'cache')
+
+    def path(self, country: str, date_range: Dict[str, str], model_id: str, mode: str,
+             language: Optional[str] = None) -> str:
+        # Language normalized as in single_flight.report_key, so cache and dedup agree on identity
+        key = json.dumps([country_id(country), date_range['start_date'], date_range['end_date'], model_id, mode,
+                          (language or 'en').strip().lower()])
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+
+    def _load(self, path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get(self, country: str, date_range: Dict[str, str], model_id: str, mode: str,
+            max_age: Optional[float] = None, language: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Cached report, if one exists and is fresh
+
+        Args:
+            country: Country name or code
+            date_range: Date range dict with 'start_date' and 'end_date'
+            model_id: Backend model identifier the report was generated with
+            mode: Report mode ('rag' or 'map_reduce')
+            max_age: Override of the entry's own maximum age in seconds
+            language: Requested language code (default 'en')
+
+        Returns:
+            The report dict, or None on a miss or a stale entry
+        """
+        entry = self._load(self.path(country, date_range, model_id, mode, language))
+        if entry is None:
+            return None
+        limit = max_age if max_age is not None else entry['max_age']
+        if time.time() - entry['generated_at'] > limit:
+            return None
+        return entry['report']
+
+    def age(self, country: str, date_range: Dict[str, str], model_id: str, mode: str,
+            language: Optional[str] = None) -> Optional[float]:
+        """Seconds since the cached report was generated, or None if there is none"""
+        entry = self._load(self.path(country, date_range, model_id, mode, language))
+        return time.time() - entry['generated_at'] if entry is not None else None
+
+    def put(self, country: str, date_range: Dict[str, str], model_id: str, mode: str,
+            report: Dict[str, Any], max_age: float, language: Optional[str] = None) -> None:
+        """Store a report, replacing any previous entry"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(country, date_range, model_id, mode, language)
+        entry = {
+            "country": country,
+            "date_range": date_range,
+            "model": model_id,
+            "mode": mode,
+            "language": (language or 'en').strip().lower(),
+            "generated_at": time.time(),
+            "max_age": max_age,
+            "report": report,
+        }
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+
+
+class PregenerationScheduler:
+    """
+    Keeps cached reports for a country list and rolling windows fresh
+
+    During the configured off-peak hours, every (country, window) whose cached report
+    is missing or older than the window's maximum age is regenerated with the shared
+    LlamaService (models loaded once). Requests for the same country and window are
+    then answered from ReportCache by LlamaService.generate_report. Reports are
+    pre-generated for the default language ('en') only.
+    """
+
+    def __init__(self, service, cache: Optional[ReportCache] = None,
+                 countries: Optional[List[str]] = None, windows: Optional[List[Tuple[int, float]]] = None,
+                 hours: Optional[Tuple[int, int]] = None, check_interval: Optional[float] = None):
+        config = get_config()
+        self.service = service
+        self.cache = cache or service.report_cache
+        self.countries = countries if countries is not None else [
+            c.strip() for c in config['PREGENERATE_COUNTRIES'].split(',') if c.strip()
+        ]
+        self.windows = windows if windows is not None else parse_windows(config['PREGENERATE_WINDOWS'])
+        self.hours = hours if hours is not None else parse_hours(config['PREGENERATE_HOURS'])
+        self.check_interval = check_interval or config['PREGENERATE_CHECK_MINUTES'] * 60
+        self.mode = config['REPORT_MODE']
+        self._stop = threading.Event()
+        self._thread = None
+
+    def due(self) -> List[Tuple[str, Dict[str, str], float]]:
+        """(country, date_range, max_age) of every report that is missing or stale, stalest first"""
+        model_id = self.service.backend.model_id
+        due = []
+        for days, max_age in self.windows:
+            date_range = rolling_window(days)
+            for country in self.countries:
+                age = self.cache.age(country, date_range, model_id, self.mode)
+                if age is None or age > max_age:
+                    due.append((age if age is not None else float('inf'), country, date_range, max_age))
+        due.sort(key=lambda item: item[0], reverse=True)
+        return [(country, date_range, max_age) for _, country, date_range, max_age in due]
+
+    def run_once(self, ignore_hours: bool = False) -> List[Dict[str, Any]]:
+        """
+        Regenerate every due report, stopping early when off-peak hours end
+
+        Args:
+            ignore_hours: Run regardless of the off-peak window
+
+        Returns:
+            One {country, date_range, seconds, status} entry per attempted report
+        """
+        results = []
+        model_id = self.service.backend.model_id
+        for country, date_range, max_age in self.due():
+            if self._stop.is_set() or not (ignore_hours or in_hours(datetime.now().hour, self.hours)):
+                break
+            start = time.perf_counter()
+            report = self.service.generate_report(country, date_range, mode=self.mode, use_cache=False)
+            seconds = time.perf_counter() - start
+            if 'error' in report or report.get('truncated'):
+                status = report.get('error') or f"truncated ({report.get('stop_reason')})"
+                print(f"Pre-generation of {country} {date_range['start_date']}..{date_range['end_date']} failed: {status}")
+            else:
+                self.cache.put(country, date_range, model_id, self.mode, report, max_age)
+                status = 'cached'
+            results.append({"country": country, "date_range": date_range, "seconds": round(seconds, 1),
+                            "status": status})
+        return results
+
+    def run_forever(self) -> None:
+        """Check for stale reports every check_interval while inside off-peak hours"""
+        while not self._stop.is_set():
+            if in_hours(datetime.now().hour, self.hours):
+                self.run_once()
+            self._stop.wait(self.check_interval)
+
+    def start(self) -> None:
+        """Run the scheduler in a background thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run_forever, name='report-pregeneration', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--once', action='store_true', help='Refresh every stale report now and exit')
+    parser.add_argument('--countries', help='Comma-separated countries (default PREGENERATE_COUNTRIES)')
+    args = parser.parse_args()
+
+    from llama_service import llama_service
+
+    countries = [c.strip() for c in args.countries.split(',') if c.strip()] if args.countries else None
+    scheduler = PregenerationScheduler(llama_service, countries=countries)
+    if not scheduler.countries:
+        parser.error('no countries configured; set PREGENERATE_COUNTRIES or pass --countries')
+    llama_service.initialize_model()
+
+    if args.once:
+        for result in scheduler.run_once(ignore_hours=True):
+            print(f"{result['country']:>24} {result['date_range']['start_date']}..{result['date_range']['end_date']}: "
+                  f"{result['status']} in {result['seconds']}s")
+        return
+    print(f"Pre-generating {len(scheduler.countries)} countries x {len(scheduler.windows)} windows "
+          f"during hours {scheduler.hours or 'any'}")
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        scheduler.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,283 @@
+"""
+Rate Limiting and Admission Control for NGO Data Helpers
+Per-client token buckets for RATE_LIMIT_REQUESTS_PER_MINUTE / RATE_LIMIT_REPORTS_PER_HOUR
+and a bounded FIFO queue in front of report generation
+"""
+
+import itertools
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Any
+
+from config import get_config
+
+
+class TokenBucket:
+    """
+    Token bucket holding up to capacity tokens, refilled continuously at rate per second
+
+    A full bucket allows a burst of capacity requests; after that requests are
+    admitted at the refill rate.
+    """
+
+    def __init__(self, capacity: float, rate: float):
+        if capacity <= 0 or rate <= 0:
+            raise ValueError(f"Token bucket needs a positive capacity and rate, got {capacity} and {rate}")
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, cost: float = 1.0, now: Optional[float] = None) -> float:
+        """
+        Take cost tokens if available
+
+        Returns:
+            0.0 if the tokens were taken, otherwise seconds until enough have refilled
+        """
+        self._refill(time.monotonic() if now is None else now)
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+    def full_in(self) -> float:
+        """Seconds until the bucket is full again"""
+        return (self.capacity - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    Token buckets per client (session ID or address) and limit name
+
+    Limits are (capacity, period in seconds): 'requests' allows
+    RATE_LIMIT_REQUESTS_PER_MINUTE per minute and 'reports' RATE_LIMIT_REPORTS_PER_HOUR
+    per hour, each usable as a burst; a limit of 0 disables it. At most max_clients
+    buckets per limit are kept; the least recently used are forgotten first.
+    """
+
+    def __init__(self, requests_per_minute: Optional[int] = None, reports_per_hour: Optional[int] = None,
+                 max_clients: int = 10000):
+        config = get_config()
+        self.limits = {
+            'requests': (requests_per_minute if requests_per_minute is not None
+                         else config['RATE_LIMIT_REQUESTS_PER_MINUTE'], 60.0),
+            'reports': (reports_per_hour if reports_per_hour is not None
+                        else config['RATE_LIMIT_REPORTS_PER_HOUR'], 3600.0),
+        }
+        self.max_clients = max_clients
+        self._buckets: Dict[str, OrderedDict] = {name: OrderedDict() for name in self.limits}
+        self._lock = threading.Lock()
+
+    def check(self, client_id: str, limit: str = 'requests') -> Dict[str, Any]:
+        """
+        Count one request of client_id against a limit
+
+        Args:
+            client_id: Identity of the caller (session ID, user ID or address)
+            limit: 'requests' or 'reports'
+
+        Returns:
+            Dict with 'allowed', 'limit', 'remaining', 'reset' (Unix time the bucket is
+            full again) and 'retry_after' (seconds, 0 when allowed); 'limit' is 0 when
+            the limit is disabled
+        """
+        capacity, period = self.limits[limit]
+        if capacity <= 0:
+            return {"allowed": True, "limit": 0, "remaining": 0, "reset": 0, "retry_after": 0}
+        with self._lock:
+            buckets = self._buckets[limit]
+            bucket = buckets.get(client_id)
+            if bucket is None:
+                bucket = buckets[client_id] = TokenBucket(capacity, capacity / period)
+                if len(buckets) > self.max_clients:
+                    buckets.popitem(last=False)
+            buckets.move_to_end(client_id)
+            retry_after = bucket.acquire()
+            return {
+                "allowed": retry_after == 0.0,
+                "limit": capacity,
+                "remaining": int(bucket.tokens),
+                "reset": int(time.time() + bucket.full_in()),
+                "retry_after": math.ceil(retry_after),
+            }
+
+
+class QueueFullError(Exception):
+    """Raised when the admission queue cannot take another report"""
+
+    def __init__(self, queued: int, estimated_wait: float):
+        self.queued = queued
+        self.estimated_wait = estimated_wait
+        super().__init__(f"Report queue is full ({queued} waiting); try again in about "
+                         f"{math.ceil(estimated_wait)} seconds")
+
+
+def default_concurrency(config: Dict[str, Any]) -> int:
+    """Reports to run at once when MAX_CONCURRENT_REPORTS is not set"""
+    if config['LLM_CONTINUOUS_BATCHING'] and config['LLM_BACKEND'] == 'transformers':
+        return config['LLM_MAX_BATCH_SIZE']
+    return 1
+
+
+class AdmissionController:
+    """
+    Bounded FIFO queue in front of report generation
+
+    At most max_active reports run at once and at most max_queue wait; further
+    requests are rejected with QueueFullError instead of piling up. Each waiting
+    ticket knows its queue position and an estimated wait derived from a moving
+    average of recent report durations.
+
+    max_active defaults to MAX_CONCURRENT_REPORTS, or when that is 0 to
+    LLM_MAX_BATCH_SIZE with continuous batching on the transformers backend (so
+    concurrent reports can share decoding steps) and 1 otherwise.
+    """
+
+    def __init__(self, max_active: Optional[int] = None, max_queue: Optional[int] = None,
+                 estimated_seconds: Optional[float] = None):
+        config = get_config()
+        if not max_active:
+            max_active = config['MAX_CONCURRENT_REPORTS'] or default_concurrency(config)
+        self.max_active = max(max_active, 1)
+        self.max_queue = max_queue if max_queue is not None else config['REPORT_QUEUE_SIZE']
+        # Exponential moving average of report durations, seeded from config
+        self.average_seconds = float(estimated_seconds or config['REPORT_ESTIMATED_SECONDS'])
+        self._tickets = itertools.count()
+        self._waiting: OrderedDict = OrderedDict()
+        self._active: Dict[Any, float] = {}
+        self._changed = threading.Condition()
+
+    def enqueue(self, ticket: Any = None) -> Any:
+        """
+        Join the queue, or start right away if a slot is free and nobody is waiting
+
+        Args:
+            ticket: Identifier of the queued work (a new one is created if omitted)
+
+        Returns:
+            The ticket
+
+        Raises:
+            QueueFullError: If the ticket has to wait and max_queue reports already are
+        """
+        with self._changed:
+            ticket = next(self._tickets) if ticket is None else ticket
+            if not self._waiting and len(self._active) < self.max_active:
+                # Never queued, so max_queue (possibly 0) does not apply
+                self._active[ticket] = time.monotonic()
+                self._changed.notify_all()
+                return ticket
+            if len(self._waiting) >= self.max_queue:
+                raise QueueFullError(len(self._waiting), self._estimate(len(self._waiting)))
+            self._waiting[ticket] = time.monotonic()
+            return ticket
+
+    def start(self, ticket: Any) -> None:
+        """Mark a ticket as running (no-op if it already is)"""
+        with self._changed:
+            self._waiting.pop(ticket, None)
+            self._active.setdefault(ticket, time.monotonic())
+            self._changed.notify_all()
+
+    def release(self, ticket: Any) -> None:
+        """Remove a finished or abandoned ticket and fold its run time into the average"""
+        with self._changed:
+            self._waiting.pop(ticket, None)
+            started = self._active.pop(ticket, None)
+            if started is not None:
+                self.average_seconds = 0.8 * self.average_seconds + 0.2 * (time.monotonic() - started)
+            self._changed.notify_all()
+
+    def admit_waiting(self) -> List[Any]:
+        """
+        Start waiting tickets in FIFO order while slots are free
+
+        For callers whose work runs on its own FIFO executor (rather than in slot()),
+        to mirror which jobs the executor is running; call after enqueue and release.
+
+        Returns:
+            The tickets started
+        """
+        started = []
+        with self._changed:
+            while self._waiting and len(self._active) < self.max_active:
+                ticket, _ = self._waiting.popitem(last=False)
+                self._active[ticket] = time.monotonic()
+                started.append(ticket)
+            if started:
+                self._changed.notify_all()
+        return started
+
+    def position(self, ticket: Any) -> Optional[int]:
+        """1-based position among waiting tickets, or None once running"""
+        with self._changed:
+            for position, waiting in enumerate(self._waiting, 1):
+                if waiting == ticket:
+                    return position
+            return None
+
+    def _estimate(self, ahead: int) -> float:
+        # Reports that must finish before a slot frees up for this one, max_active at a time
+        must_finish = ahead + len(self._active) - self.max_active + 1
+        return max(must_finish, 0) / self.max_active * self.average_seconds
+
+    def estimated_wait(self, ticket: Any) -> float:
+        """Seconds until the ticket is expected to start (0 once running)"""
+        position = self.position(ticket)
+        if position is None:
+            return 0.0
+        with self._changed:
+            return round(self._estimate(position - 1), 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Queue length, running reports and current average duration"""
+        with self._changed:
+            return {"queued": len(self._waiting), "active": len(self._active),
+                    "max_active": self.max_active, "max_queue": self.max_queue,
+                    "average_seconds": round(self.average_seconds, 1)}
+
+    @contextmanager
+    def slot(self, on_wait: Optional[Callable[[int, float], None]] = None):
+        """
+        Block until a slot is free, then hold it for the duration of the block
+
+        Args:
+            on_wait: Called with (queue position, estimated wait seconds) whenever
+                the position changes while waiting
+
+        Raises:
+            QueueFullError: If the queue is full on entry
+        """
+        ticket = self.enqueue()
+        try:
+            last = None
+            while True:
+                with self._changed:
+                    if ticket in self._active:
+                        break
+                    position = list(self._waiting).index(ticket) + 1
+                    if position == 1 and len(self._active) < self.max_active:
+                        break
+                    if position == last or on_wait is None:
+                        self._changed.wait()
+                        continue
+                    estimate = round(self._estimate(position - 1), 1)
+                # Outside the lock: the callback may update a UI
+                on_wait(position, estimate)
+                last = position
+            self.start(ticket)
+            yield ticket
+        finally:
+            self.release(ticket)
+
+
+# Global limiter shared by the Streamlit sessions of this process
+rate_limiter = RateLimiter()
@@ -0,0 +1,155 @@
+"""
+Render Service for NGO Data Helpers
+Renders PDF and DOCX documents concurrently in a process pool
+"""
+
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Any, Iterable, Optional
+
+from artifact_store import ArtifactStore, ArtifactTooLargeError, artifact_store
+from config import get_config
+from report_generator import report_fingerprint, cached_render, store_render, render_uncached
+
+
+class RenderService:
+    """
+    Process pool rendering report documents off the calling thread
+
+    reportlab and python-docx are CPU-bound and hold the GIL, so each document is
+    rendered in its own worker process and both formats of a report render at the
+    same time. Results are memoized by report_generator and persisted in the
+    artifact store, so a report is rendered once even across restarts, and a
+    document already being rendered is shared by everyone asking for it. With
+    RENDER_WORKERS=0 documents are rendered in the calling process instead.
+    """
+
+    def __init__(self, workers: Optional[int] = None, store: Optional[ArtifactStore] = None):
+        self.workers = get_config()['RENDER_WORKERS'] if workers is None else workers
+        self.store = store or artifact_store
+        self._executor = None
+        self._lock = threading.Lock()
+        # report_fingerprint -> Future of a document being rendered
+        self._pending: Dict[str, Future] = {}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: the calling process may hold CUDA state or threads that must not be forked
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+    def submit(self, report_data: Dict[str, Any], country: str, date_range: Dict[str, str],
+               format: str) -> Future:
+        """
+        Start rendering one document
+
+        Args:
+            report_data: Report data dictionary
+            country: Country name
+            date_range: Date range dictionary
+            format: 'pdf' or 'docx'
+
+        Returns:
+            Future resolving to the document bytes (already resolved if memoized)
+        """
+        fingerprint = report_fingerprint(report_data, country, date_range, format)
+        document = cached_render(fingerprint)
+        if document is None:
+            document = self._read_stored(fingerprint, format)
+        if document is not None or self.workers <= 0:
+            future = Future()
+            try:
+                if document is None:
+                    document = render_uncached(report_data, country, date_range, format)
+                    self._keep(fingerprint, format, document)
+                future.set_result(document)
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        executor = self._get_executor()
+        with self._lock:
+            future = self._pending.get(fingerprint)
+            if future is not None:
+                return future
+            future = self._pending[fingerprint] = executor.submit(
+                render_uncached, report_data, country, date_range, format)
+        future.add_done_callback(lambda done: self._finish(fingerprint, format, done))
+        return future
+
+    def _read_stored(self, fingerprint: str, format: str) -> Optional[bytes]:
+        """Document from the artifact store, memoized in memory on the way"""
+        stored = self.store.open(fingerprint, format)
+        if stored is None:
+            return None
+        with stored:
+            document = stored.read()
+        store_render(fingerprint, document)
+        return document
+
+    def _keep(self, fingerprint: str, format: str, document: bytes) -> None:
+        """Memoize a freshly rendered document and persist it in the artifact store"""
+        store_render(fingerprint, document)
+        try:
+            self.store.put(fingerprint, format, document)
+        except (ArtifactTooLargeError, OSError) as e:
+            print(f"Error storing rendered {format.upper()}: {e}")
+
+    def _finish(self, fingerprint: str, format: str, future: Future) -> None:
+        if not future.cancelled() and future.exception() is None:
+            self._keep(fingerprint, format, future.result())
+        with self._lock:
+            self._pending.pop(fingerprint, None)
+
+    def submit_file(self, report_data: Dict[str, Any], country: str, date_range: Dict[str, str],
+                    format: str) -> Future:
+        """
+        Start rendering one document into the artifact store
+
+        Returns:
+            Future resolving to the stored file's path (already resolved if stored);
+            fails with ArtifactTooLargeError if the document exceeds MAX_REPORT_SIZE_MB
+        """
+        fingerprint = report_fingerprint(report_data, country, date_range, format)
+        path = self.store.get(fingerprint, format)
+        result = Future()
+        if path is not None:
+            result.set_result(path)
+            return result
+
+        def stored(rendered: Future) -> None:
+            try:
+                result.set_result(self.store.put(fingerprint, format, rendered.result()))
+            except Exception as e:
+                result.set_exception(e)
+
+        self.submit(report_data, country, date_range, format).add_done_callback(stored)
+        return result
+
+    def render_all(self, report_data: Dict[str, Any], country: str, date_range: Dict[str, str],
+                   formats: Iterable[str] = ('pdf', 'docx')) -> Dict[str, Future]:
+        """Start rendering a report in several formats at once; returns {format: Future}"""
+        return {format: self.submit(report_data, country, date_range, format) for format in formats}
+
+    def render(self, report_data: Dict[str, Any], country: str, date_range: Dict[str, str],
+               format: str, timeout: Optional[float] = None) -> bytes:
+        """Render one document and wait for it"""
+        return self.submit(report_data, country, date_range, format).result(timeout)
+
+    def render_file(self, report_data: Dict[str, Any], country: str, date_range: Dict[str, str],
+                    format: str, timeout: Optional[float] = None) -> str:
+        """Render one document into the artifact store and wait for its path"""
+        return self.submit_file(report_data, country, date_range, format).result(timeout)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+# Global render service shared by the preview page, batch exports and the backend
+render_service = RenderService()
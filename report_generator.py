@@ -3,19 +3,43 @@ Report Generator Module for NGO Data Helpers
 Handles PDF and DOCX generation from report data
 """
 
+import hashlib
 import io
+import json
+import re
+import threading
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, List, Any, Optional
+from xml.sax.saxutils import escape
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, Image
 from reportlab.lib import colors
 from docx import Document
 from docx.shared import Inches
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.enum.style import WD_STYLE_TYPE
-import streamlit as st
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+
+from chart_renderer import render_charts, CHART_SIZE_INCHES
+from config import get_config
+
+REPORT_MIME_TYPES = {
+    'pdf': 'application/pdf',
+    'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+}
+
+# Rendered documents kept in memory, most recently used last
+RENDER_CACHE_SIZE = 32
+
+# Bump whenever the PDF/DOCX layout changes, so stored documents are re-rendered
+RENDERER_VERSION = '3'
+
+# Characters XML 1.0 does not allow in documents
+_XML_INVALID_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
 
 
 class ReportGenerator:
@@ -24,6 +48,7 @@ class ReportGenerator:
     def __init__(self):
         self.styles = getSampleStyleSheet()
         self._setup_custom_styles()
+        self.docx_template = DocxTemplate(get_config()['DOCX_TEMPLATE'])
     
     def _setup_custom_styles(self):
         """Setup custom styles for reports"""
@@ -121,6 +146,17 @@ class ReportGenerator:
             story.append(Paragraph("No risks identified.", self.styles['CustomBody']))
         story.append(Spacer(1, 20))
         
+        # Data Visualization
+        charts = render_charts(report_data.get('chart_data', []))
+        if charts:
+            story.append(Paragraph("Data Visualization", self.styles['CustomHeading']))
+            width = 6 * inch
+            height = width * CHART_SIZE_INCHES[1] / CHART_SIZE_INCHES[0]
+            for image in charts.values():
+                story.append(Image(io.BytesIO(image), width=width, height=height))
+                story.append(Spacer(1, 12))
+            story.append(Spacer(1, 8))
+        
         # Data Sources
         story.append(Paragraph("Data Sources", self.styles['CustomHeading']))
         sources = report_data.get('sources', [])
@@ -142,6 +178,23 @@ class ReportGenerator:
         """
         Generate DOCX report
         
+        Args:
+            report_data: Report data dictionary
+            country: Country name
+            date_range: Date range dictionary
+            
+        Returns:
+            DOCX bytes
+        """
+        return self.docx_template.render(report_data, country, date_range)
+    
+    def generate_docx_object_model(self, report_data: Dict[str, Any], country: str, date_range: Dict[str, str]) -> bytes:
+        """
+        Generate DOCX report paragraph by paragraph through python-docx
+        
+        Reference implementation of generate_docx, kept to check the template
+        renderer's output and speed (benchmarks/bench_docx.py).
+        
         Args:
             report_data: Report data dictionary
             country: Country name
@@ -202,6 +255,14 @@ class ReportGenerator:
             doc.add_paragraph("No risks identified.")
         doc.add_paragraph()
         
+        # Data Visualization
+        charts = render_charts(report_data.get('chart_data', []))
+        if charts:
+            doc.add_heading("Data Visualization", level=1)
+            for image in charts.values():
+                doc.add_picture(io.BytesIO(image), width=Inches(6))
+            doc.add_paragraph()
+        
         # Data Sources
         doc.add_heading("Data Sources", level=1)
         sources = report_data.get('sources', [])
@@ -221,30 +282,232 @@ class ReportGenerator:
         return buffer.getvalue()
 
 
-def download_pdf_report(report_data: Dict[str, Any], country: str, date_range: Dict[str, str]) -> None:
+
+class DocxTemplate:
     """
-    Download PDF report using Streamlit
+    DOCX renderer that fills a prebuilt base document in bulk
+    
+    The base document (DOCX_TEMPLATE, or python-docx's default template) is loaded,
+    emptied and serialized once; each report opens a copy and appends its text
+    sections as a single parsed XML fragment, with style IDs resolved up front,
+    instead of one python-docx call and style lookup per paragraph. The output has
+    the same paragraphs, styles and images as generate_docx_object_model. A custom
+    template must define the 'Title', 'Heading 1' and 'List Number' styles.
+    """
+    
+    def __init__(self, template_path: Optional[str] = None):
+        template = Document(template_path or None)
+        body = template.element.body
+        for child in list(body):
+            if child.tag != qn('w:sectPr'):
+                body.remove(child)
+        self.style_ids = {name: template.styles[name].style_id for name in ('Title', 'Heading 1', 'List Number')}
+        buffer = io.BytesIO()
+        template.save(buffer)
+        self._template = buffer.getvalue()
+    
+    def _paragraph(self, text: str = '', style: Optional[str] = None, center: bool = False) -> str:
+        """WordprocessingML of one paragraph, as python-docx's add_paragraph/add_heading would write it"""
+        properties = ''
+        if style:
+            properties += f'<w:pStyle w:val="{self.style_ids[style]}"/>'
+        if center:
+            properties += '<w:jc w:val="center"/>'
+        xml = '<w:p>' + (f'<w:pPr>{properties}</w:pPr>' if properties else '')
+        if text:
+            xml += f'<w:r>{_run_content(text)}</w:r>'
+        return xml + '</w:p>'
+    
+    def _items(self, items: List[Any], empty_message: str) -> List[str]:
+        if not items:
+            return [self._paragraph(empty_message)]
+        return [self._paragraph(f"{i}. {item}", 'List Number') for i, item in enumerate(items, 1)]
+    
+    @staticmethod
+    def _append(document, paragraphs: List[str]) -> None:
+        """Parse paragraphs as one fragment and add them to the end of the body"""
+        fragment = parse_xml(f'<w:body {nsdecls("w")}>{"".join(paragraphs)}</w:body>')
+        section_properties = document.element.body.find(qn('w:sectPr'))
+        for paragraph in list(fragment):
+            section_properties.addprevious(paragraph)
+    
+    def render(self, report_data: Dict[str, Any], country: str, date_range: Dict[str, str]) -> bytes:
+        """DOCX bytes of a report (see ReportGenerator.generate_docx)"""
+        doc = Document(io.BytesIO(self._template))
+        
+        self._append(doc, [
+            self._paragraph(f"NGO Data Helpers Report: {country}", 'Title', center=True),
+            self._paragraph(f"Date Range: {date_range['start_date']} to {date_range['end_date']}", center=True),
+            self._paragraph(f"Generated on: {datetime.now().strftime('%B %d, %Y at %I:%M %p')}", center=True),
+            self._paragraph(),
+            self._paragraph("Executive Summary", 'Heading 1'),
+            self._paragraph(report_data.get('summary', 'No summary available.')),
+            self._paragraph(),
+            self._paragraph("Key Events", 'Heading 1'),
+            *self._items(report_data.get('key_events', []), "No key events available."),
+            self._paragraph(),
+            self._paragraph("Trends", 'Heading 1'),
+            *self._items(report_data.get('trends', []), "No trends available."),
+            self._paragraph(),
+            self._paragraph("Risks", 'Heading 1'),
+            *self._items(report_data.get('risks', []), "No risks identified."),
+            self._paragraph(),
+        ])
+        
+        # Images need package relationships, so they go through python-docx
+        charts = render_charts(report_data.get('chart_data', []))
+        if charts:
+            self._append(doc, [self._paragraph("Data Visualization", 'Heading 1')])
+            for image in charts.values():
+                doc.add_picture(io.BytesIO(image), width=Inches(6))
+            self._append(doc, [self._paragraph()])
+        
+        sources = report_data.get('sources', []) or [
+            "ACLED (Armed Conflict Location & Event Data Project)",
+            "GDELT (Global Database of Events, Language, and Tone)",
+            "ReliefWeb (Humanitarian Information Service)",
+            "World Bank Open Data",
+        ]
+        self._append(doc, [self._paragraph("Data Sources", 'Heading 1')] +
+                     [self._paragraph(f"• {source}") for source in sources])
+        
+        buffer = io.BytesIO()
+        doc.save(buffer)
+        return buffer.getvalue()
+
+
+def _run_content(text: Any) -> str:
+    """Escaped run content of text, with tabs and line breaks as python-docx writes them"""
+    text = _XML_INVALID_CHARS.sub('', str(text))
+    parts = []
+    for line_number, line in enumerate(text.split('\n')):
+        if line_number:
+            parts.append('<w:br/>')
+        for chunk_number, chunk in enumerate(line.split('\t')):
+            if chunk_number:
+                parts.append('<w:tab/>')
+            if chunk:
+                parts.append(f'<w:t xml:space="preserve">{escape(chunk)}</w:t>')
+    return ''.join(parts)
+
+
+# Shared generator: the stylesheet is built once per process
+report_generator = ReportGenerator()
+
+_render_cache: "OrderedDict[str, bytes]" = OrderedDict()
+_render_lock = threading.Lock()
+
+
+def report_fingerprint(report_data: Dict[str, Any], country: str, date_range: Dict[str, str],
+                       format: str) -> str:
+    """Hash identifying one rendering of a report; equal inputs render to the same document"""
+    key = json.dumps([report_data, country, date_range, format], sort_keys=True, default=str)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def report_filename(country: str, date_range: Dict[str, str], format: str) -> str:
+    """Download file name of a report"""
+    return f"NGO_Report_{country.replace(' ', '_')}_{date_range['start_date']}_to_{date_range['end_date']}.{format}"
+
+
+def render_report(report_data: Dict[str, Any], country: str, date_range: Dict[str, str], format: str) -> bytes:
+    """
+    Render a report as PDF or DOCX, memoized on its content
     
     Args:
         report_data: Report data dictionary
         country: Country name
         date_range: Date range dictionary
+        format: 'pdf' or 'docx'
+        
+    Returns:
+        Document bytes (the same bytes for repeated calls with equal arguments)
+    """
+    fingerprint = report_fingerprint(report_data, country, date_range, format)
+    document = cached_render(fingerprint)
+    if document is None:
+        document = render_uncached(report_data, country, date_range, format)
+        store_render(fingerprint, document)
+    return document
+
+
+def render_uncached(report_data: Dict[str, Any], country: str, date_range: Dict[str, str], format: str) -> bytes:
+    """Render a report with the shared generator, bypassing the memo (runs in render workers)"""
+    render = report_generator.generate_pdf if format == 'pdf' else report_generator.generate_docx
+    return render(report_data, country, date_range)
+
+
+def cached_render(fingerprint: str) -> Optional[bytes]:
+    """Memoized document for a report_fingerprint, if any"""
+    with _render_lock:
+        if fingerprint in _render_cache:
+            _render_cache.move_to_end(fingerprint)
+            return _render_cache[fingerprint]
+    return None
+
+
+def store_render(fingerprint: str, document: bytes) -> None:
+    """Memoize a rendered document, evicting the least recently used beyond RENDER_CACHE_SIZE"""
+    with _render_lock:
+        _render_cache[fingerprint] = document
+        while len(_render_cache) > RENDER_CACHE_SIZE:
+            _render_cache.popitem(last=False)
+
+
+def _download_report(report_data: Dict[str, Any], country: str, date_range: Dict[str, str], format: str,
+                     prepare_label: str, download_label: str, primary: bool) -> None:
     """
+    Download button that renders the report only once the user asks for it
+    
+    The first click renders the document into the artifact store and swaps in the
+    real download button, which stays for later reruns of the same report. Documents
+    already in the store (e.g. reopened from history) get the download button at once.
+    The other formats start rendering in the background on the first click, so their
+    Prepare buttons usually return at once.
+    """
+    # Imported here so the backend server can render reports without Streamlit
+    import streamlit as st
+    from artifact_store import artifact_store
+    from render_service import render_service
+
+    fingerprint = report_fingerprint(report_data, country, date_range, format)
+    requested = st.session_state.setdefault('requested_downloads', set())
+    if fingerprint not in requested and artifact_store.get(fingerprint, format) is None:
+        if not st.button(prepare_label, key=f"prepare_{format}", type="primary" if primary else "secondary"):
+            return
+        for other in REPORT_MIME_TYPES:
+            if other != format:
+                render_service.submit_file(report_data, country, date_range, other)
+    requested.add(fingerprint)
+    
     try:
-        generator = ReportGenerator()
-        pdf_bytes = generator.generate_pdf(report_data, country, date_range)
-        
-        filename = f"NGO_Report_{country.replace(' ', '_')}_{date_range['start_date']}_to_{date_range['end_date']}.pdf"
-        
-        st.download_button(
-            label="📄 Download PDF Report",
-            data=pdf_bytes,
-            file_name=filename,
-            mime="application/pdf",
-            type="primary"
-        )
+        with st.spinner(f"Rendering {format.upper()}..."):
+            path = render_service.render_file(report_data, country, date_range, format)
+        # Streamlit reads the whole file into its media file manager for the button; only
+        # the backend's /api/reports/{id}/download endpoint streams documents from disk
+        with open(path, 'rb') as document:
+            st.download_button(
+                label=download_label,
+                data=document,
+                file_name=report_filename(country, date_range, format),
+                mime=REPORT_MIME_TYPES[format],
+                type="primary" if primary else "secondary"
+            )
     except Exception as e:
-        st.error(f"Error generating PDF: {str(e)}")
+        st.error(f"Error generating {format.upper()}: {str(e)}")
+
+
+def download_pdf_report(report_data: Dict[str, Any], country: str, date_range: Dict[str, str]) -> None:
+    """
+    Download PDF report using Streamlit
+    
+    Args:
+        report_data: Report data dictionary
+        country: Country name
+        date_range: Date range dictionary
+    """
+    _download_report(report_data, country, date_range, 'pdf',
+                     "📄 Prepare PDF Report", "📄 Download PDF Report", primary=True)
 
 
 def download_docx_report(report_data: Dict[str, Any], country: str, date_range: Dict[str, str]) -> None:
@@ -256,17 +519,5 @@ def download_docx_report(report_data: Dict[str, Any], country: str, date_range:
         country: Country name
         date_range: Date range dictionary
     """
-    try:
-        generator = ReportGenerator()
-        docx_bytes = generator.generate_docx(report_data, country, date_range)
-        
-        filename = f"NGO_Report_{country.replace(' ', '_')}_{date_range['start_date']}_to_{date_range['end_date']}.docx"
-        
-        st.download_button(
-            label="📝 Download DOCX Report",
-            data=docx_bytes,
-            file_name=filename,
-            mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-        )
-    except Exception as e:
-        st.error(f"Error generating DOCX: {str(e)}")
+    _download_report(report_data, country, date_range, 'docx',
+                     "📝 Prepare DOCX Report", "📝 Download DOCX Report", primary=False)
@@ -0,0 +1,321 @@
+"""
+Report History for NGO Data Helpers
+Saved reports in SQLite, listed a page at a time with report bodies loaded on demand,
+with full-text search (FTS5) over titles and report content
+"""
+
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import uuid
+from contextlib import closing, contextmanager
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+from config import get_config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    seq INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    country_code TEXT NOT NULL,
+    country_name TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    end_date TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    preview TEXT NOT NULL,
+    chart_points INTEGER NOT NULL DEFAULT 0,
+    report_data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reports_created_at ON reports (created_at DESC, id);
+CREATE INDEX IF NOT EXISTS reports_country ON reports (country_code, created_at DESC);
+CREATE INDEX IF NOT EXISTS reports_date_range ON reports (start_date, end_date);
+"""
+
+# Full-text index of each report, keyed by reports.seq and kept in sync by add() and delete().
+# seq is an INTEGER PRIMARY KEY, so unlike an implicit rowid VACUUM never renumbers it.
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS reports_fts USING fts5(
+    title, country, dates, summary, key_events, trends, risks,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+# bm25 weights of the reports_fts columns: matches in the title or country rank highest
+FTS_WEIGHTS = (5.0, 5.0, 1.0, 2.0, 1.0, 1.0, 1.0)
+
+# Columns of a history listing; report_data is only read by get()
+SUMMARY_COLUMNS = "id, title, country_code, country_name, start_date, end_date, created_at, preview"
+
+PREVIEW_LENGTH = 150
+
+
+def fts_query(search: str) -> str:
+    """
+    FTS5 query matching every word of search as a prefix ('chol kass' finds 'cholera' in Kassala)
+
+    Words are quoted, so FTS5 operators and punctuation in the input are taken literally.
+    Returns '' if search has no words.
+    """
+    return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', search))
+
+
+def _index(connection: sqlite3.Connection, seq: int, title: str, country_name: str,
+           date_range: Dict[str, str], report_data: Dict[str, Any]) -> None:
+    """Add one report to the full-text index"""
+    def lines(items) -> str:
+        return '\n'.join(str(item) for item in items or [])
+    connection.execute(
+        "INSERT INTO reports_fts (rowid, title, country, dates, summary, key_events, trends, risks) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (seq, title, country_name, f"{date_range['start_date']} {date_range['end_date']}",
+         str(report_data.get('summary', '')), lines(report_data.get('key_events')),
+         lines(report_data.get('trends')), lines(report_data.get('risks'))))
+
+
+def _summary(row: sqlite3.Row) -> Dict[str, Any]:
+    summary = {
+        "id": row['id'],
+        "title": row['title'],
+        "country": {"code": row['country_code'], "name": row['country_name']},
+        "date_range": {"start_date": row['start_date'], "end_date": row['end_date']},
+        "created_at": row['created_at'],
+        "preview": row['preview'],
+    }
+    if 'snippet' in row.keys():
+        summary['snippet'] = row['snippet']
+    return summary
+
+
+class ReportHistory:
+    """
+    Persistent history of generated reports
+
+    Reports survive browser refreshes and restarts. Listings read only the indexed
+    summary columns, one page at a time (newest first), and the full report_data of
+    a report is decoded only when it is opened or exported. Each call uses its own
+    connection, so the store is safe to share between Streamlit sessions (threads)
+    and processes.
+
+    Searches use an FTS5 index over titles, countries, dates, summaries, events,
+    trends and risks, updated in the same transaction as each save or delete and
+    ranked by bm25. Without FTS5 in the SQLite build, searches fall back to
+    substring matching of country, title and dates.
+    """
+
+    def __init__(self, path: Optional[str] = None, page_size: Optional[int] = None):
+        config = get_config()
+        self.path = path or config['REPORT_HISTORY_DB'] or \
+            os.path.join(config['REPORTS_DIRECTORY'], 'history.sqlite3')
+        self.page_size = page_size or config['REPORT_HISTORY_PAGE_SIZE']
+        self._lock = threading.Lock()
+        self._ready = False
+        self.full_text = True
+
+    def _ensure_schema(self) -> None:
+        """Create the database, tables and full-text index on first use"""
+        if self._ready:
+            return
+        with self._lock:
+            if self._ready:
+                return
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with closing(sqlite3.connect(self.path, timeout=10)) as connection:
+                # WAL: readers are not blocked while a report is being saved
+                connection.execute("PRAGMA journal_mode=WAL")
+                self._migrate(connection)
+                connection.executescript(SCHEMA)
+                try:
+                    connection.executescript(FTS_SCHEMA)
+                    with connection:
+                        self._index_missing(connection)
+                except sqlite3.OperationalError as e:
+                    print(f"Full-text search unavailable, using substring search: {e}")
+                    self.full_text = False
+            self._ready = True
+
+    @contextmanager
+    def _connect(self):
+        """Connection (created with the schema on first use), committed on success"""
+        self._ensure_schema()
+        with closing(sqlite3.connect(self.path, timeout=10)) as connection:
+            connection.row_factory = sqlite3.Row
+            with connection:
+                yield connection
+
+    @staticmethod
+    def _migrate(connection: sqlite3.Connection) -> None:
+        """Give a reports table from before the seq column one, rebuilding the full-text index"""
+        columns = [row[1] for row in connection.execute("PRAGMA table_info(reports)")]
+        if not columns or 'seq' in columns:
+            return
+        copied = ', '.join(columns)
+        # One transaction; SCHEMA creates the new table here and its indexes on the caller's
+        # second run, once dropping the old table has freed their names. The full-text rows
+        # were keyed by the old implicit rowids, so that index is dropped for _index_missing to rebuild.
+        connection.executescript(
+            "BEGIN; ALTER TABLE reports RENAME TO reports_old;" + SCHEMA
+            + f"INSERT INTO reports ({copied}) SELECT {copied} FROM reports_old ORDER BY created_at;"
+            "DROP TABLE reports_old; DROP TABLE IF EXISTS reports_fts; COMMIT;")
+
+    @staticmethod
+    def _index_missing(connection: sqlite3.Connection) -> None:
+        """Index reports saved before the full-text index existed"""
+        rows = connection.execute(
+            "SELECT seq, title, country_name, start_date, end_date, report_data FROM reports "
+            "WHERE seq NOT IN (SELECT rowid FROM reports_fts)").fetchall()
+        for seq, title, country_name, start_date, end_date, report_data in rows:
+            _index(connection, seq, title, country_name, {"start_date": start_date, "end_date": end_date},
+                   json.loads(report_data))
+
+    def add(self, country: Dict[str, str], date_range: Dict[str, str], report_data: Dict[str, Any],
+            title: Optional[str] = None, created_at: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Save a generated report
+
+        Args:
+            country: Country dict with 'code' and 'name'
+            date_range: Date range dict with 'start_date' and 'end_date'
+            report_data: Report data dictionary
+            title: Display title (defaults to '<country> Report - <start> to <end>')
+            created_at: ISO timestamp (defaults to now)
+
+        Returns:
+            The saved report's summary (see page())
+        """
+        report_id = uuid.uuid4().hex
+        title = title or f"{country['name']} Report - {date_range['start_date']} to {date_range['end_date']}"
+        created_at = created_at or datetime.now().isoformat()
+        preview = str(report_data.get('summary', ''))[:PREVIEW_LENGTH]
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "INSERT INTO reports (id, title, country_code, country_name, start_date, end_date, created_at, "
+                "preview, chart_points, report_data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (report_id, title, country['code'], country['name'], date_range['start_date'],
+                 date_range['end_date'], created_at, preview, len(report_data.get('chart_data') or []),
+                 json.dumps(report_data, ensure_ascii=False)))
+            if self.full_text:
+                _index(connection, cursor.lastrowid, title, country['name'], date_range, report_data)
+        return {"id": report_id, "title": title, "country": {"code": country['code'], "name": country['name']},
+                "date_range": dict(date_range), "created_at": created_at, "preview": preview}
+
+    def page(self, page: int = 1, search: Optional[str] = None, country_code: Optional[str] = None,
+             page_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        One page of saved reports, newest first (best match first when searching)
+
+        Args:
+            page: 1-based page number (clamped to the last page)
+            search: Words to find (as prefixes) in the title, country, dates and report
+                content; results are then ranked by relevance instead of date
+            country_code: Only reports of this ISO2 country code
+            page_size: Reports per page (defaults to REPORT_HISTORY_PAGE_SIZE)
+
+        Returns:
+            Dict with 'reports' (summaries: 'id', 'title', 'country', 'date_range',
+            'created_at', 'preview', plus a matching 'snippet' when searching),
+            'total', 'page' and 'pages'
+        """
+        page_size = page_size or self.page_size
+        clause, params, order, full_text = self._filter(search, country_code)
+        columns = ', '.join(f"reports.{column.strip()}" for column in SUMMARY_COLUMNS.split(','))
+        if full_text:
+            columns += ", snippet(reports_fts, -1, '**', '**', '…', 16) AS snippet"
+
+        with self._connect() as connection:
+            total = connection.execute(f"SELECT COUNT(*) {clause}", params).fetchone()[0]
+            pages = max(math.ceil(total / page_size), 1)
+            page = min(max(page, 1), pages)
+            rows = connection.execute(
+                f"SELECT {columns} {clause} ORDER BY {order} LIMIT ? OFFSET ?",
+                params + [page_size, (page - 1) * page_size]).fetchall()
+        return {"reports": [_summary(row) for row in rows], "total": total, "page": page, "pages": pages}
+
+    def titles(self, search: Optional[str] = None, country_code: Optional[str] = None) -> List[Dict[str, str]]:
+        """
+        ID and title of every report matching search/country_code, in the order of page()
+
+        Reads no report bodies, so it is cheap for choosing reports across all pages
+        (e.g. for a bulk export); load the chosen ones with get_many().
+        """
+        clause, params, order, _ = self._filter(search, country_code)
+        with self._connect() as connection:
+            rows = connection.execute(f"SELECT reports.id, reports.title {clause} ORDER BY {order}",
+                                      params).fetchall()
+        return [{"id": row['id'], "title": row['title']} for row in rows]
+
+    def _filter(self, search: Optional[str], country_code: Optional[str]):
+        """(FROM/WHERE clause, parameters, ORDER BY clause, whether it is a full-text search)"""
+        self._ensure_schema()
+        conditions, params = [], []
+        query = fts_query(search) if search and self.full_text else ''
+        if query:
+            source = "reports_fts JOIN reports ON reports.seq = reports_fts.rowid"
+            conditions.append("reports_fts MATCH ?")
+            params.append(query)
+            weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+            order = f"bm25(reports_fts, {weights}), reports.created_at DESC"
+        else:
+            source = "reports"
+            order = "reports.created_at DESC, reports.id"
+            if search and not self.full_text:
+                # LIKE is case-insensitive for ASCII; '!' escapes the wildcards in the term
+                pattern = '%' + search.replace('!', '!!').replace('%', '!%').replace('_', '!_') + '%'
+                conditions.append("(reports.country_name LIKE ? ESCAPE '!' OR reports.title LIKE ? ESCAPE '!' "
+                                  "OR reports.start_date LIKE ? ESCAPE '!' OR reports.end_date LIKE ? ESCAPE '!')")
+                params += [pattern] * 4
+        if country_code:
+            conditions.append("reports.country_code = ?")
+            params.append(country_code)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        return f"FROM {source}{where}", params, order, bool(query)
+
+    def get(self, report_id: str) -> Optional[Dict[str, Any]]:
+        """
+        A saved report with its report_data
+
+        Returns:
+            The summary plus 'report_data', or None if there is no such report
+        """
+        reports = self.get_many([report_id])
+        return reports[0] if reports else None
+
+    def get_many(self, report_ids: List[str]) -> List[Dict[str, Any]]:
+        """Saved reports with their report_data, in the order of report_ids (unknown IDs are skipped)"""
+        if not report_ids:
+            return []
+        with self._connect() as connection:
+            rows = connection.execute(
+                f"SELECT {SUMMARY_COLUMNS}, report_data FROM reports WHERE id IN "
+                f"({', '.join('?' * len(report_ids))})", list(report_ids)).fetchall()
+        reports = {}
+        for row in rows:
+            reports[row['id']] = {**_summary(row), "report_data": json.loads(row['report_data'])}
+        return [reports[report_id] for report_id in report_ids if report_id in reports]
+
+    def delete(self, report_id: str) -> bool:
+        """Delete a saved report; returns False if it did not exist"""
+        with self._connect() as connection:
+            row = connection.execute("SELECT seq FROM reports WHERE id = ?", (report_id,)).fetchone()
+            if row is None:
+                return False
+            if self.full_text:
+                connection.execute("DELETE FROM reports_fts WHERE rowid = ?", (row[0],))
+            connection.execute("DELETE FROM reports WHERE seq = ?", (row[0],))
+            return True
+
+    def stats(self) -> Dict[str, int]:
+        """Total reports, distinct countries and average chart points, computed in SQL"""
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT country_code), COALESCE(AVG(chart_points), 0) FROM reports"
+            ).fetchone()
+        return {"total": row[0], "countries": row[1], "avg_data_points": int(row[2])}
+
+
+# Global history shared by the Streamlit sessions of this process
+report_history = ReportHistory()
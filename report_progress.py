@@ -0,0 +1,105 @@
+"""
+Report Progress for NGO Data Helpers
+Structured progress events and per-stage timings of report generation
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Any
+
+# Fine-grained stage -> progress step of API_CONTRACT.md
+STAGE_STEPS = {
+    'waiting': 'collecting',
+    'collecting': 'collecting',
+    'condensing': 'processing',
+    'chunking': 'processing',
+    'embedding': 'processing',
+    'retrieving': 'summarizing',
+    'mapping': 'summarizing',
+    'generating': 'summarizing',
+    'parsing': 'summarizing',
+    'ready': 'ready',
+}
+
+# Overall progress (percent) at the start and end of each stage
+STAGE_PROGRESS = {
+    'waiting': (0, 0),
+    'collecting': (0, 40),
+    'condensing': (40, 45),
+    'chunking': (45, 50),
+    'embedding': (50, 55),
+    'retrieving': (55, 60),
+    'mapping': (60, 80),
+    'generating': (80, 97),
+    'parsing': (97, 99),
+    'ready': (100, 100),
+}
+
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+
+class ProgressReporter:
+    """
+    Emits progress events to an optional callback and records stage durations
+
+    Every event is a dict with 'stage', 'step' (the contract's coarse step),
+    'status' ('running', 'completed' or 'failed'), 'progress' (0-100), 'message'
+    and 'elapsed' seconds since the report started, plus stage-specific details
+    such as 'source' or 'tokens'. Completed events also carry 'duration'.
+    """
+
+    def __init__(self, callback: Optional[ProgressCallback] = None):
+        self.callback = callback
+        self.started = time.perf_counter()
+        self.durations: Dict[str, float] = {}
+
+    def emit(self, stage: str, status: str = 'running', fraction: float = 0.0,
+             message: str = '', **detail) -> None:
+        """Send one event for stage, fraction (0-1) of the way through it"""
+        if self.callback is None:
+            return
+        low, high = STAGE_PROGRESS.get(stage, (0, 100))
+        event = {
+            "stage": stage,
+            "step": STAGE_STEPS.get(stage, 'processing'),
+            "status": status,
+            "progress": int(low + (high - low) * min(max(fraction, 0.0), 1.0)),
+            "message": message,
+            "elapsed": round(time.perf_counter() - self.started, 3),
+            **detail,
+        }
+        try:
+            self.callback(event)
+        except Exception as e:
+            # A broken listener must never fail the report itself
+            print(f"Error in progress callback: {e}")
+
+    @contextmanager
+    def stage(self, stage: str, message: str = '', key: Optional[str] = None, **detail):
+        """
+        Time a block as one stage, emitting 'running' on entry and 'completed' on exit
+
+        Args:
+            stage: Stage name (see STAGE_STEPS)
+            message: Human-readable description of the work
+            key: Name the duration is recorded under (defaults to stage); repeated keys accumulate
+        """
+        start = time.perf_counter()
+        self.emit(stage, 'running', 0.0, message, **detail)
+        try:
+            yield self
+        except Exception:
+            self.emit(stage, 'failed', 0.0, message, **detail)
+            raise
+        duration = time.perf_counter() - start
+        self.record(key or stage, duration)
+        self.emit(stage, 'completed', 1.0, message, duration=round(duration, 3), **detail)
+
+    def record(self, key: str, duration: float) -> None:
+        """Add a duration measured outside stage()"""
+        self.durations[key] = round(self.durations.get(key, 0.0) + duration, 3)
+
+    def finish(self) -> None:
+        """Emit the final 'ready' event"""
+        self.durations['total'] = round(time.perf_counter() - self.started, 3)
+        self.emit('ready', 'completed', 1.0, 'Report ready', durations=dict(self.durations))
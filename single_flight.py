@@ -0,0 +1,135 @@
+"""
+Single-Flight Deduplication for NGO Data Helpers
+Lets identical concurrent requests share one in-flight computation
+"""
+
+import copy
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# How often a waiter holding a cancel_token checks whether it was cancelled
+CANCEL_POLL_SECONDS = 0.1
+
+
+def report_key(country: str, start_date: str, end_date: str,
+               language: Optional[str] = None, model: Optional[str] = None) -> Tuple[str, ...]:
+    """
+    Normalized identity of a report request
+
+    Args:
+        country: Country name or code
+        start_date: Start date YYYY-MM-DD
+        end_date: End date YYYY-MM-DD
+        language: Requested language code
+        model: Identifier of the model that generates the report
+
+    Returns:
+        Hashable key; requests with equal keys produce the same report
+    """
+    return (
+        " ".join(country.split()).casefold(),
+        start_date.strip(),
+        end_date.strip(),
+        (language or 'en').strip().lower(),
+        model or '',
+    )
+
+
+class Detached(Exception):
+    """Raised to a waiter whose own cancel_token was cancelled before the shared call finished"""
+
+
+class _Call:
+    """One in-flight computation and the callers waiting on it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+        self.cancel_tokens = []
+
+    @property
+    def cancelled(self) -> bool:
+        """True once every attached caller has cancelled its own token (the token fn receives)"""
+        return all(token is not None and token.cancelled for token in list(self.cancel_tokens))
+
+
+class SingleFlight:
+    """
+    Run at most one computation per key at a time
+
+    The first caller for a key runs the function; callers arriving with the same
+    key while it runs block until it finishes and receive a copy of its result
+    (or its exception). If the first caller is interrupted by a BaseException that
+    is not an Exception, one of the waiting callers runs the function instead.
+    Nothing is cached once the computation completes.
+
+    Each caller may pass its own cancel_token (anything with a 'cancelled' property).
+    A waiter whose token is cancelled detaches with Detached; the function itself is
+    told to stop only once every attached caller has cancelled.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args,
+           on_wait: Optional[Callable[[], None]] = None, cancel_token=None, **kwargs) -> Tuple[Any, bool]:
+        """
+        Run fn(*args, cancel_token=..., **kwargs) unless an identical call is already in flight
+
+        Args:
+            key: Identity of the computation
+            fn: Function to run when no call with this key is in flight; its cancel_token
+                keyword reads cancelled once every attached caller has cancelled
+            on_wait: Called before blocking when attaching to an in-flight call
+            cancel_token: This caller's token; None means the caller never cancels
+
+        Returns:
+            (result, shared) where shared is True if the result came from another caller's run
+
+        Raises:
+            Detached: cancel_token was cancelled while waiting for another caller's run
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+                else:
+                    call.waiters += 1
+                call.cancel_tokens.append(cancel_token)
+            if leader:
+                break
+
+            if on_wait is not None:
+                on_wait()
+            while not call.done.wait(CANCEL_POLL_SECONDS if cancel_token is not None else None):
+                if cancel_token.cancelled:
+                    raise Detached("Cancelled while waiting for an identical call in flight")
+            if isinstance(call.error, Exception):
+                raise call.error
+            if call.error is None:
+                return copy.deepcopy(call.result), True
+            # The leader was interrupted without a result (e.g. a Streamlit rerun raised in its
+            # progress callback, which must not propagate to other callers): run it again
+            on_wait = None
+
+        try:
+            call.result = fn(*args, cancel_token=call, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        # Waiters copy call.result, so the leader gets its own copy if anyone attached
+        return (copy.deepcopy(call.result) if call.waiters else call.result), False
+
+    def in_flight(self) -> Dict[Hashable, int]:
+        """Keys currently being computed, with the number of attached waiters"""
+        with self._lock:
+            return {key: call.waiters for key, call in self._calls.items()}
@@ -0,0 +1,37 @@
+"""
+Tests for country lookup and per-source country spellings
+"""
+
+from country_registry import CountryRegistry
+
+COUNTRIES = [
+    {"code": "CD", "name": "Congo, The Democratic Republic of the"},
+    {"code": "TR", "name": "Türkiye"},
+    {"code": "KE", "name": "Kenya"},
+]
+
+
+def registry():
+    return CountryRegistry(loader=lambda: COUNTRIES, ttl_seconds=3600)
+
+
+def test_lookup_by_name_and_codes_is_case_insensitive():
+    countries = registry()
+    assert countries.get("kenya")["alpha_3"] == "KEN"
+    assert countries.get("ken")["code"] == "KE"
+    assert countries.get("cd")["name"] == "Congo, The Democratic Republic of the"
+    assert countries.get("Atlantis") is None
+
+
+def test_source_name_uses_each_sources_spelling():
+    countries = registry()
+    assert countries.source_name("CD", "acled") == "Democratic Republic of Congo"
+    assert countries.source_name("COD", "reliefweb") == "Democratic Republic of the Congo"
+    assert countries.source_name("Türkiye", "acled") == "Turkey"
+
+
+def test_source_name_falls_back_to_the_registry_name_or_the_query():
+    countries = registry()
+    assert countries.source_name("ke", "acled") == "Kenya"
+    assert countries.source_name("Kenya", "unknown source") == "Kenya"
+    assert countries.source_name("Atlantis", "reliefweb") == "Atlantis"
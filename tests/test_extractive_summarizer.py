@@ -0,0 +1,43 @@
+"""
+Tests for the extractive summarizer's token-budget selection
+"""
+
+from extractive_summarizer import estimate_tokens, select_sentences
+
+
+def test_selects_sentences_within_budget():
+    text = ". ".join(f"Sentence number {i} describes flooding in district {i}" for i in range(50)) + "."
+    selected = select_sentences(text, token_budget=60)
+    assert selected
+    assert len(selected) < len(text)
+    assert sum(estimate_tokens(sentence) for sentence in selected.split("\n")) <= 60
+
+
+def test_truncates_top_sentence_when_every_sentence_is_over_budget():
+    # Unpunctuated scraped text: each "sentence" is far longer than the budget
+    text = "\n".join(" ".join(f"word{i}_{j} cholera outbreak reported" for j in range(100)) for i in range(3))
+    selected = select_sentences(text, token_budget=50)
+    assert selected
+    assert len(selected) <= 50 * 4
+    assert any(selected == line[:len(selected)] for line in text.split("\n"))
+
+
+def test_truncated_sentence_stays_within_budget():
+    text = " ".join(f"word{i} cholera outbreak reported" for i in range(200))
+    selected = select_sentences(text, token_budget=50)
+    assert estimate_tokens(selected) <= 50
+
+
+def test_keeps_source_header_and_short_field_lines():
+    articles = "".join(
+        f"\nTitle: Floods {i}\nDate: 2024-03-{i + 1:02d}\n"
+        f"Article Content: Heavy rain displaced {i} thousand families in the northern districts. "
+        f"Aid agencies reported {i} new shelters and water points in camp number {i}.\n"
+        for i in range(20)
+    )
+    text = "These are multiple articles for Kenya from ReliefWeb API:" + articles
+    selected = select_sentences(text, token_budget=300)
+    lines = selected.split("\n")
+    assert lines[0] == "These are multiple articles for Kenya from ReliefWeb API:"
+    assert all(f"Date: 2024-03-{i + 1:02d}" in lines for i in range(20))
+    assert len(selected) < len(text)
@@ -0,0 +1,44 @@
+"""
+Tests for pre-generation schedule parsing, rolling windows and the report cache
+"""
+
+from datetime import date
+
+import pytest
+
+from pregeneration import ReportCache, in_hours, parse_hours, parse_windows, rolling_window
+
+
+def test_parse_windows_reads_days_and_max_age_hours():
+    assert parse_windows("30:12, 90:48") == [(30, 12 * 3600.0), (90, 48 * 3600.0)]
+    assert parse_windows("7") == [(7, 24 * 3600.0)]
+    assert parse_windows("") == []
+
+
+def test_parse_hours_and_in_hours_handle_midnight_wrap():
+    assert parse_hours("") is None
+    assert in_hours(3, None)
+    assert parse_hours("1-5") == (1, 5)
+    assert in_hours(1, (1, 5)) and in_hours(5, (1, 5)) and not in_hours(6, (1, 5))
+    night = parse_hours("22-3")
+    assert in_hours(23, night) and in_hours(0, night) and in_hours(3, night)
+    assert not in_hours(12, night)
+    assert in_hours(4, parse_hours("4")) and not in_hours(5, parse_hours("4"))
+
+
+def test_rolling_window_spans_exactly_the_given_days():
+    window = rolling_window(30, today=date(2024, 3, 31))
+    assert window == {"start_date": "2024-03-02", "end_date": "2024-03-31"}
+    assert rolling_window(1, today=date(2024, 3, 31))["start_date"] == "2024-03-31"
+
+
+def test_report_cache_is_keyed_by_country_identity_and_language(tmp_path):
+    cache = ReportCache(str(tmp_path))
+    window = rolling_window(30, today=date(2024, 3, 31))
+    cache.put("Kenya", window, "model", "rag", {"summary": "cached"}, max_age=3600)
+    assert cache.get("KEN", window, "model", "rag") == {"summary": "cached"}
+    assert cache.get("Kenya", window, "model", "rag", language="EN") == {"summary": "cached"}
+    assert cache.get("Kenya", window, "model", "rag", language="fr") is None
+    assert cache.get("Kenya", window, "other model", "rag") is None
+    assert cache.get("Kenya", window, "model", "rag", max_age=-1) is None
+    assert cache.age("Kenya", window, "model", "rag") == pytest.approx(0, abs=5)
@@ -0,0 +1,81 @@
+"""
+Tests for the token-bucket rate limiter and the report admission queue
+"""
+
+import threading
+
+import pytest
+
+from rate_limiter import AdmissionController, QueueFullError, RateLimiter, TokenBucket
+
+
+def test_token_bucket_allows_a_burst_then_the_refill_rate():
+    bucket = TokenBucket(capacity=2, rate=1.0)
+    now = bucket.updated
+    assert bucket.acquire(now=now) == 0.0
+    assert bucket.acquire(now=now) == 0.0
+    assert bucket.acquire(now=now) == pytest.approx(1.0)
+    assert bucket.acquire(now=now + 1.0) == 0.0
+
+
+def test_token_bucket_rejects_a_zero_rate():
+    with pytest.raises(ValueError):
+        TokenBucket(capacity=0, rate=0)
+
+
+def test_rate_limiter_counts_clients_separately_and_zero_disables_a_limit():
+    limiter = RateLimiter(requests_per_minute=1, reports_per_hour=0)
+    assert limiter.check("a")["allowed"]
+    denied = limiter.check("a")
+    assert not denied["allowed"] and denied["retry_after"] > 0
+    assert limiter.check("b")["allowed"]
+    assert all(limiter.check("a", "reports")["allowed"] for _ in range(5))
+
+
+def test_admission_starts_directly_when_a_slot_is_free_even_without_queue_room():
+    admission = AdmissionController(max_active=1, max_queue=0)
+    with admission.slot() as ticket:
+        assert admission.position(ticket) is None
+        with pytest.raises(QueueFullError):
+            admission.enqueue()
+    assert admission.snapshot()["active"] == 0
+
+
+def test_admission_serves_waiters_in_fifo_order():
+    admission = AdmissionController(max_active=1, max_queue=5, estimated_seconds=60)
+    running = admission.enqueue("running")
+    first, second = admission.enqueue("first"), admission.enqueue("second")
+    assert (admission.position(first), admission.position(second)) == (1, 2)
+    assert admission.estimated_wait(second) == pytest.approx(120.0)
+    admission.release(running)
+    assert admission.admit_waiting() == ["first"]
+    assert admission.position(second) == 1
+
+
+def test_slot_waits_for_a_free_slot_and_reports_its_position():
+    admission = AdmissionController(max_active=1, max_queue=5)
+    positions, entered = [], threading.Event()
+    holder = admission.enqueue()
+
+    def wait_for_slot():
+        with admission.slot(lambda position, estimate: positions.append(position)):
+            entered.set()
+
+    waiter = threading.Thread(target=wait_for_slot)
+    waiter.start()
+    assert not entered.wait(0.2)
+    admission.release(holder)
+    waiter.join(5)
+    assert entered.is_set() and positions == [1]
+
+
+def test_default_concurrency_follows_the_batch_size_with_continuous_batching(monkeypatch):
+    monkeypatch.setenv("MAX_CONCURRENT_REPORTS", "0")
+    monkeypatch.setenv("LLM_BACKEND", "transformers")
+    monkeypatch.setenv("LLM_MAX_BATCH_SIZE", "6")
+    monkeypatch.setenv("LLM_CONTINUOUS_BATCHING", "false")
+    assert AdmissionController().max_active == 1
+    monkeypatch.setenv("LLM_CONTINUOUS_BATCHING", "true")
+    assert AdmissionController().max_active == 6
+    monkeypatch.setenv("MAX_CONCURRENT_REPORTS", "2")
+    assert AdmissionController().max_active == 2
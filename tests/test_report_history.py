@@ -0,0 +1,92 @@
+"""
+Tests for the report history store: pagination, full-text search, delete and schema migration
+"""
+
+import json
+import sqlite3
+
+import pytest
+
+from report_history import FTS_SCHEMA, SCHEMA, ReportHistory
+
+DATES = {"start_date": "2024-01-01", "end_date": "2024-01-31"}
+
+
+def save(history, name, code, summary, created_at):
+    return history.add({"code": code, "name": name}, DATES, {"summary": summary}, created_at=created_at)
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = ReportHistory(str(tmp_path / "history.sqlite3"), page_size=2)
+    save(history, "Kenya", "KE", "Drought in the northern counties", "2024-02-01T00:00:00")
+    save(history, "Chad", "TD", "Flooding displaced thousands", "2024-02-02T00:00:00")
+    save(history, "Peru", "PE", "Election unrest in Lima", "2024-02-03T00:00:00")
+    return history
+
+
+def test_pages_are_newest_first_and_clamped(history):
+    first = history.page(1)
+    assert [r["country"]["name"] for r in first["reports"]] == ["Peru", "Chad"]
+    assert (first["total"], first["pages"]) == (3, 2)
+    last = history.page(99)
+    assert last["page"] == 2
+    assert [r["country"]["name"] for r in last["reports"]] == ["Kenya"]
+
+
+def test_full_text_search_matches_prefixes_of_report_content(history):
+    if not history.full_text:
+        pytest.skip("SQLite build without FTS5")
+    result = history.page(search="flood")
+    assert [r["country"]["name"] for r in result["reports"]] == ["Chad"]
+    assert "**" in result["reports"][0]["snippet"]
+    assert [t["id"] for t in history.titles(search="unrest")] == [r["id"] for r in history.page(search="Peru")["reports"]]
+
+
+def test_country_filter_and_titles_cover_every_page(history):
+    assert [r["country"]["name"] for r in history.page(country_code="KE")["reports"]] == ["Kenya"]
+    assert len(history.titles()) == 3
+
+
+def test_delete_removes_report_and_its_search_entry(history):
+    chad = history.page(search="Chad")["reports"][0]
+    assert history.delete(chad["id"])
+    assert not history.delete(chad["id"])
+    assert history.get(chad["id"]) is None
+    assert history.page(search="flooding")["total"] == 0
+    assert history.page()["total"] == 2
+
+
+def test_search_survives_vacuum(history):
+    kenya = history.page(search="drought")["reports"][0]
+    history.delete(history.page(search="Chad")["reports"][0]["id"])
+    with sqlite3.connect(history.path) as connection:
+        connection.execute("VACUUM")
+    assert [r["id"] for r in history.page(search="drought")["reports"]] == [kenya["id"]]
+
+
+def test_migrates_tables_without_seq_column(tmp_path):
+    path = str(tmp_path / "old.sqlite3")
+    connection = sqlite3.connect(path)
+    connection.executescript(SCHEMA.replace("    seq INTEGER PRIMARY KEY,\n    id TEXT NOT NULL UNIQUE,",
+                                            "    id TEXT PRIMARY KEY,"))
+    connection.execute(
+        "INSERT INTO reports (id, title, country_code, country_name, start_date, end_date, created_at, "
+        "preview, chart_points, report_data) VALUES ('old', 'Haiti Report', 'HT', 'Haiti', '2024-01-01', "
+        "'2024-01-31', '2024-02-01T00:00:00', '', 0, ?)", (json.dumps({"summary": "Cholera outbreak"}),))
+    try:
+        connection.executescript(FTS_SCHEMA)
+    except sqlite3.OperationalError:
+        pass
+    connection.commit()
+    connection.close()
+
+    history = ReportHistory(path)
+    assert history.get("old")["title"] == "Haiti Report"
+    if history.full_text:
+        assert [r["id"] for r in history.page(search="cholera")["reports"]] == ["old"]
+    with sqlite3.connect(path) as connection:
+        columns = [row[1] for row in connection.execute("PRAGMA table_info(reports)")]
+        indexes = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert columns[:2] == ["seq", "id"]
+    assert "reports_created_at" in indexes
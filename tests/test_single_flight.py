@@ -0,0 +1,121 @@
+"""
+Tests for single-flight deduplication of identical in-flight calls
+"""
+
+import threading
+
+from llm_backends import CancellationToken
+from single_flight import Detached, SingleFlight, report_key
+
+
+def start_leader(flight, key, result="report", cancel_token=None):
+    """Run a call that blocks until released; returns (release event, thread, outcome dict)"""
+    release, started, outcome = threading.Event(), threading.Event(), {}
+
+    def fn(cancel_token):
+        outcome["token"] = cancel_token
+        started.set()
+        release.wait(5)
+        return {"value": result}
+
+    def run():
+        outcome["result"] = flight.do(key, fn, cancel_token=cancel_token)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    started.wait(5)
+    return release, thread, outcome
+
+
+def attach(flight, key, cancel_token=None):
+    """Attach a waiter in a thread; returns (thread, outcome dict) once it is waiting"""
+    outcome, attached = {}, threading.Event()
+
+    def run():
+        try:
+            outcome["result"] = flight.do(key, lambda cancel_token: "ran twice",
+                                          on_wait=attached.set, cancel_token=cancel_token)
+        except Detached:
+            outcome["result"] = "detached"
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    attached.wait(5)
+    return thread, outcome
+
+
+def test_report_key_normalizes_country_and_language():
+    assert report_key(" south  Sudan", "2024-01-01", "2024-01-31") == \
+        report_key("South Sudan", "2024-01-01 ", "2024-01-31", "EN")
+    assert report_key("Chad", "2024-01-01", "2024-01-31", "fr") != report_key("Chad", "2024-01-01", "2024-01-31")
+
+
+def test_waiter_shares_a_copy_of_the_leaders_result():
+    flight = SingleFlight()
+    release, leader, leader_outcome = start_leader(flight, "k")
+    waiter, waiter_outcome = attach(flight, "k")
+    assert flight.in_flight() == {"k": 1}
+    release.set()
+    leader.join(5)
+    waiter.join(5)
+    assert leader_outcome["result"] == ({"value": "report"}, False)
+    assert waiter_outcome["result"] == ({"value": "report"}, True)
+    assert leader_outcome["result"][0] is not waiter_outcome["result"][0]
+    assert flight.in_flight() == {}
+
+
+def test_leader_exception_reaches_waiters():
+    flight = SingleFlight()
+    release, started = threading.Event(), threading.Event()
+    errors = []
+
+    def fn(cancel_token):
+        started.set()
+        release.wait(5)
+        raise ValueError("source down")
+
+    def run(on_wait=None):
+        try:
+            flight.do("k", fn, on_wait=on_wait)
+        except ValueError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=run)
+    leader.start()
+    started.wait(5)
+    attached = threading.Event()
+    waiter = threading.Thread(target=run, args=(attached.set,))
+    waiter.start()
+    attached.wait(5)
+    release.set()
+    leader.join(5)
+    waiter.join(5)
+    assert errors == ["source down", "source down"]
+
+
+def test_cancelled_waiter_detaches_without_stopping_the_leader():
+    flight = SingleFlight()
+    release, leader, leader_outcome = start_leader(flight, "k")
+    token = CancellationToken()
+    waiter, waiter_outcome = attach(flight, "k", token)
+    token.cancel()
+    waiter.join(5)
+    assert waiter_outcome["result"] == "detached"
+    assert not leader_outcome["token"].cancelled
+    release.set()
+    leader.join(5)
+    assert leader_outcome["result"] == ({"value": "report"}, False)
+
+
+def test_shared_token_cancels_once_every_caller_has_cancelled():
+    flight = SingleFlight()
+    leader_token, waiter_token = CancellationToken(), CancellationToken()
+    release, leader, leader_outcome = start_leader(flight, "k", cancel_token=leader_token)
+    waiter, _ = attach(flight, "k", waiter_token)
+    leader_token.cancel()
+    assert not leader_outcome["token"].cancelled
+    waiter_token.cancel()
+    assert leader_outcome["token"].cancelled
+    release.set()
+    leader.join(5)
+    waiter.join(5)
@@ -99,7 +99,7 @@ TRANSLATIONS = {
         'no_reports': 'No reports found',
         'no_reports_desc': 'Generate your first report to see it here!',
         'search_reports': 'Search reports:',
-        'search_placeholder': 'Search by country, date, or title...',
+        'search_placeholder': 'Search by country, date, title or report content (e.g. cholera)...',
         'no_matching_reports': 'No reports match your search criteria.',
         'country': 'Country',
         'date_range': 'Date Range',
@@ -112,6 +112,26 @@ TRANSLATIONS = {
         'countries_covered': 'Countries Covered',
         'avg_data_points': 'Avg Data Points',
         
+        # Report status
+        'report_truncated': 'This report was cut short because generation reached its time limit. Some sections may be incomplete.',
+        
+        # Rate limiting
+        'error_rate_limited': 'You have reached the hourly report limit. Please try again in {minutes} minutes.',
+        'status_queued': 'Queued at position {position}, about {seconds} seconds to start',
+        
+        # Bulk export
+        'bulk_export': 'Bulk Export',
+        'select_reports': 'Reports to export',
+        'export_formats': 'Formats',
+        'export_zip': 'Create ZIP',
+        'download_zip': 'Download ZIP',
+        'exporting_reports': 'Rendering and packing reports...',
+        
+        # History pagination
+        'previous_page': 'Previous',
+        'next_page': 'Next',
+        'page_of': 'Page {page} of {pages} ({total} reports)',
+        
         # Common
         'dismiss': 'Dismiss',
         'back': 'Back',
@@ -216,7 +236,7 @@ TRANSLATIONS = {
         'no_reports': 'No se encontraron informes',
         'no_reports_desc': '¡Genera tu primer informe para verlo aquí!',
         'search_reports': 'Buscar informes:',
-        'search_placeholder': 'Buscar por país, fecha o título...',
+        'search_placeholder': 'Buscar por país, fecha, título o contenido (p. ej. cólera)...',
         'no_matching_reports': 'Ningún informe coincide con tus criterios de búsqueda.',
         'country': 'País',
         'date_range': 'Rango de Fechas',
@@ -229,6 +249,26 @@ TRANSLATIONS = {
         'countries_covered': 'Países Cubiertos',
         'avg_data_points': 'Puntos de Datos Promedio',
         
+        # Report status
+        'report_truncated': 'Este informe se interrumpió porque la generación alcanzó su límite de tiempo. Algunas secciones pueden estar incompletas.',
+        
+        # Rate limiting
+        'error_rate_limited': 'Has alcanzado el límite de informes por hora. Inténtalo de nuevo en {minutes} minutos.',
+        'status_queued': 'En cola en la posición {position}, unos {seconds} segundos para empezar',
+        
+        # Bulk export
+        'bulk_export': 'Exportación Masiva',
+        'select_reports': 'Informes a exportar',
+        'export_formats': 'Formatos',
+        'export_zip': 'Crear ZIP',
+        'download_zip': 'Descargar ZIP',
+        'exporting_reports': 'Generando y empaquetando informes...',
+        
+        # History pagination
+        'previous_page': 'Anterior',
+        'next_page': 'Siguiente',
+        'page_of': 'Página {page} de {pages} ({total} informes)',
+        
         # Common
         'dismiss': 'Descartar',
         'back': 'Atrás',
@@ -333,7 +373,7 @@ TRANSLATIONS = {
         'no_reports': 'Aucun rapport trouvé',
         'no_reports_desc': 'Générez votre premier rapport pour le voir ici !',
         'search_reports': 'Rechercher des rapports :',
-        'search_placeholder': 'Rechercher par pays, date ou titre...',
+        'search_placeholder': 'Rechercher par pays, date, titre ou contenu (ex. choléra)...',
         'no_matching_reports': 'Aucun rapport ne correspond à vos critères de recherche.',
         'country': 'Pays',
         'date_range': 'Plage de Dates',
@@ -346,6 +386,26 @@ TRANSLATIONS = {
         'countries_covered': 'Pays Couverts',
         'avg_data_points': 'Points de Données Moyens',
         
+        # Report status
+        'report_truncated': 'Ce rapport a été interrompu car la génération a atteint sa limite de temps. Certaines sections peuvent être incomplètes.',
+        
+        # Rate limiting
+        'error_rate_limited': 'Vous avez atteint la limite de rapports par heure. Veuillez réessayer dans {minutes} minutes.',
+        'status_queued': 'En file d’attente à la position {position}, environ {seconds} secondes avant le début',
+        
+        # Bulk export
+        'bulk_export': 'Exportation Groupée',
+        'select_reports': 'Rapports à exporter',
+        'export_formats': 'Formats',
+        'export_zip': 'Créer le ZIP',
+        'download_zip': 'Télécharger le ZIP',
+        'exporting_reports': 'Génération et compression des rapports...',
+        
+        # History pagination
+        'previous_page': 'Précédent',
+        'next_page': 'Suivant',
+        'page_of': 'Page {page} sur {pages} ({total} rapports)',
+        
         # Common
         'dismiss': 'Rejeter',
         'back': 'Retour',
@@ -450,7 +510,7 @@ TRANSLATIONS = {
         'no_reports': 'لم يتم العثور على تقارير',
         'no_reports_desc': 'قم بإنشاء تقريرك الأول لتراه هنا!',
         'search_reports': 'البحث في التقارير:',
-        'search_placeholder': 'البحث بالبلد أو التاريخ أو العنوان...',
+        'search_placeholder': 'البحث بالبلد أو التاريخ أو العنوان أو المحتوى (مثل الكوليرا)...',
         'no_matching_reports': 'لا توجد تقارير تطابق معايير البحث الخاصة بك.',
         'country': 'البلد',
         'date_range': 'نطاق التاريخ',
@@ -463,6 +523,26 @@ TRANSLATIONS = {
         'countries_covered': 'البلدان المغطاة',
         'avg_data_points': 'متوسط نقاط البيانات',
         
+        # Report status
+        'report_truncated': 'تم اختصار هذا التقرير لأن الإنشاء وصل إلى الحد الزمني. قد تكون بعض الأقسام غير مكتملة.',
+        
+        # Rate limiting
+        'error_rate_limited': 'لقد بلغت الحد الأقصى للتقارير في الساعة. يرجى المحاولة مرة أخرى بعد {minutes} دقيقة.',
+        'status_queued': 'في قائمة الانتظار بالمركز {position}، حوالي {seconds} ثانية للبدء',
+        
+        # Bulk export
+        'bulk_export': 'تصدير جماعي',
+        'select_reports': 'التقارير المراد تصديرها',
+        'export_formats': 'التنسيقات',
+        'export_zip': 'إنشاء ملف ZIP',
+        'download_zip': 'تحميل ملف ZIP',
+        'exporting_reports': 'جارٍ إنشاء التقارير وضغطها...',
+        
+        # History pagination
+        'previous_page': 'السابق',
+        'next_page': 'التالي',
+        'page_of': 'الصفحة {page} من {pages} ({total} تقارير)',
+        
         # Common
         'dismiss': 'رفض',
         'back': 'رجوع',